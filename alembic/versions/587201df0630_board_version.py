@@ -0,0 +1,67 @@
+"""board version
+
+Revision ID: 587201df0630
+Revises: 1798f2aef822
+Create Date: 2026-10-18 11:40:07.284512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '587201df0630'
+down_revision: Union[str, None] = '1798f2aef822'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Таблица -> выражение, дающее board_id строки (ROW заменяется на NEW/OLD)
+BOARD_ID_OF = {
+    'statuses': 'ROW.board_id',
+    'tasks': 'ROW.board_id',
+    'board_access': 'ROW.board_id',
+    'comments': '(SELECT board_id FROM tasks WHERE task_id = ROW.task_id)',
+    'tags': '(SELECT board_id FROM tasks WHERE task_id = ROW.task_id)',
+    'attachments': (
+        '(SELECT tasks.board_id FROM comments JOIN tasks ON tasks.task_id = comments.task_id '
+        'WHERE comments.comment_id = ROW.comment_id)'
+    ),
+}
+EVENTS = {'insert': ('NEW',), 'update': ('NEW', 'OLD'), 'delete': ('OLD',)}
+
+
+def _trigger_name(table: str, event: str) -> str:
+    return f'trg_{table}_{event}_board_version'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('boards', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+    for table, board_id in BOARD_ID_OF.items():
+        for event, rows in EVENTS.items():
+            board_ids = ', '.join(board_id.replace('ROW', row) for row in rows)
+            op.execute(
+                f'CREATE TRIGGER {_trigger_name(table, event)} AFTER {event.upper()} ON {table} '
+                f'BEGIN UPDATE boards SET version = version + 1 WHERE board_id IN ({board_ids}); END'
+            )
+
+    op.execute(
+        f'CREATE TRIGGER {_trigger_name("boards", "update")} AFTER UPDATE OF user_id, title, description ON boards '
+        'BEGIN UPDATE boards SET version = version + 1 WHERE board_id = NEW.board_id; END'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(f'DROP TRIGGER IF EXISTS {_trigger_name("boards", "update")}')
+
+    for table in BOARD_ID_OF:
+        for event in EVENTS:
+            op.execute(f'DROP TRIGGER IF EXISTS {_trigger_name(table, event)}')
+
+    with op.batch_alter_table('boards') as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,101 @@
+"""tag catalog
+
+Revision ID: 7bee69b1dd91
+Revises: c4543d5b0b8f
+Create Date: 2026-10-18 13:05:21.640118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7bee69b1dd91'
+down_revision: Union[str, None] = 'c4543d5b0b8f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Триггеры версии доски (см. 587201df0630) для новых таблиц и для прежней tags
+TASK_BOARD_ID = '(SELECT board_id FROM tasks WHERE task_id = ROW.task_id)'
+EVENTS = {'insert': ('NEW',), 'update': ('NEW', 'OLD'), 'delete': ('OLD',)}
+
+
+def _create_version_triggers(table: str, board_id: str) -> None:
+    for event, rows in EVENTS.items():
+        board_ids = ', '.join(board_id.replace('ROW', row) for row in rows)
+        op.execute(
+            f'CREATE TRIGGER trg_{table}_{event}_board_version AFTER {event.upper()} ON {table} '
+            f'BEGIN UPDATE boards SET version = version + 1 WHERE board_id IN ({board_ids}); END'
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Триггеры старой tags уходят вместе с таблицей
+    op.drop_index('ix_tags_task_id', table_name='tags')
+    op.rename_table('tags', 'tags_old')
+
+    op.create_table('tags',
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.Column('board_id', sa.Integer(), nullable=False),
+    sa.Column('label', sa.String(length=50), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['board_id'], ['boards.board_id'], ),
+    sa.PrimaryKeyConstraint('tag_id'),
+    sa.UniqueConstraint('board_id', 'label', name='unique_board_tag_label')
+    )
+    op.create_table('task_tags',
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.tag_id'], ),
+    sa.ForeignKeyConstraint(['task_id'], ['tasks.task_id'], ),
+    sa.PrimaryKeyConstraint('task_id', 'tag_id')
+    )
+    op.create_index('ix_task_tags_tag_id_task_id', 'task_tags', ['tag_id', 'task_id'], unique=False)
+
+    # Одинаковые метки задач одной доски становятся одним тегом каталога
+    op.execute(
+        'INSERT INTO tags (board_id, label, created_at) '
+        'SELECT tasks.board_id, tags_old.label, min(tags_old.created_at) '
+        'FROM tags_old JOIN tasks ON tasks.task_id = tags_old.task_id '
+        'GROUP BY tasks.board_id, tags_old.label'
+    )
+    op.execute(
+        'INSERT OR IGNORE INTO task_tags (task_id, tag_id) '
+        'SELECT tags_old.task_id, tags.tag_id '
+        'FROM tags_old JOIN tasks ON tasks.task_id = tags_old.task_id '
+        'JOIN tags ON tags.board_id = tasks.board_id AND tags.label = tags_old.label'
+    )
+    op.drop_table('tags_old')
+
+    _create_version_triggers('tags', 'ROW.board_id')
+    _create_version_triggers('task_tags', TASK_BOARD_ID)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.rename_table('tags', 'tags_new')
+
+    op.create_table('tags',
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.Column('task_id', sa.Integer(), nullable=False),
+    sa.Column('label', sa.String(length=50), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['task_id'], ['tasks.task_id'], ),
+    sa.PrimaryKeyConstraint('tag_id')
+    )
+    op.execute(
+        'INSERT INTO tags (task_id, label, created_at) '
+        'SELECT task_tags.task_id, tags_new.label, tags_new.created_at '
+        'FROM task_tags JOIN tags_new ON tags_new.tag_id = task_tags.tag_id'
+    )
+
+    op.drop_index('ix_task_tags_tag_id_task_id', table_name='task_tags')
+    op.drop_table('task_tags')
+    op.drop_table('tags_new')
+    op.create_index('ix_tags_task_id', 'tags', ['task_id'], unique=False)
+
+    _create_version_triggers('tags', TASK_BOARD_ID)
@@ -0,0 +1,98 @@
+"""search index
+
+Revision ID: c4543d5b0b8f
+Revises: 587201df0630
+Create Date: 2026-10-18 12:31:54.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4543d5b0b8f'
+down_revision: Union[str, None] = '587201df0630'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# rowid строки индекса: задачи - четные, комментарии - нечетные, чтобы триггеры
+# находили свою строку по rowid, а не полным проходом по FTS-таблице
+TASK_ROWID = '{row}.task_id * 2'
+COMMENT_ROWID = '{row}.comment_id * 2 + 1'
+COMMENT_BOARD = '(SELECT \'b\' || board_id FROM tasks WHERE task_id = {row}.task_id)'
+
+TRIGGERS = {
+    'tasks_insert': (
+        'AFTER INSERT ON tasks',
+        "INSERT INTO search_index(rowid, title, body, board, task_id, comment_id) "
+        f"VALUES ({TASK_ROWID.format(row='NEW')}, NEW.title, coalesce(NEW.description, ''), "
+        "'b' || NEW.board_id, NEW.task_id, NULL);",
+    ),
+    'tasks_update': (
+        'AFTER UPDATE OF title, description, board_id ON tasks',
+        "UPDATE search_index SET title = NEW.title, body = coalesce(NEW.description, ''), board = 'b' || NEW.board_id "
+        f"WHERE rowid = {TASK_ROWID.format(row='NEW')};"
+        "UPDATE search_index SET board = 'b' || NEW.board_id "
+        f"WHERE NEW.board_id IS NOT OLD.board_id AND rowid IN (SELECT {COMMENT_ROWID.format(row='comments')} "
+        "FROM comments WHERE task_id = NEW.task_id);",
+    ),
+    'tasks_delete': (
+        'AFTER DELETE ON tasks',
+        f"DELETE FROM search_index WHERE rowid = {TASK_ROWID.format(row='OLD')};"
+        f"DELETE FROM search_index WHERE rowid IN (SELECT {COMMENT_ROWID.format(row='comments')} "
+        "FROM comments WHERE task_id = OLD.task_id);",
+    ),
+    'comments_insert': (
+        'AFTER INSERT ON comments',
+        "INSERT INTO search_index(rowid, title, body, board, task_id, comment_id) "
+        f"VALUES ({COMMENT_ROWID.format(row='NEW')}, '', NEW.content, {COMMENT_BOARD.format(row='NEW')}, "
+        "NEW.task_id, NEW.comment_id);",
+    ),
+    'comments_update': (
+        'AFTER UPDATE OF content, task_id ON comments',
+        f"UPDATE search_index SET body = NEW.content, board = {COMMENT_BOARD.format(row='NEW')}, task_id = NEW.task_id "
+        f"WHERE rowid = {COMMENT_ROWID.format(row='NEW')};",
+    ),
+    'comments_delete': (
+        'AFTER DELETE ON comments',
+        f"DELETE FROM search_index WHERE rowid = {COMMENT_ROWID.format(row='OLD')};",
+    ),
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # board хранит токен b<board_id>: фильтр по доске выполняется самим FTS-индексом.
+    # Префиксный индекс на 3 символа - под SearchCRUD.MIN_PREFIX_LENGTH
+    op.execute(
+        "CREATE VIRTUAL TABLE search_index USING fts5("
+        "title, body, board, task_id UNINDEXED, comment_id UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '3')"
+    )
+    # Заголовок весит больше текста, токен доски в ранжировании не участвует
+    op.execute("INSERT INTO search_index(search_index, rank) VALUES ('rank', 'bm25(10.0, 1.0, 0.0)')")
+
+    op.execute(
+        "INSERT INTO search_index(rowid, title, body, board, task_id, comment_id) "
+        f"SELECT {TASK_ROWID.format(row='tasks')}, title, coalesce(description, ''), 'b' || board_id, task_id, NULL "
+        "FROM tasks"
+    )
+    op.execute(
+        "INSERT INTO search_index(rowid, title, body, board, task_id, comment_id) "
+        f"SELECT {COMMENT_ROWID.format(row='comments')}, '', comments.content, 'b' || tasks.board_id, "
+        "comments.task_id, comments.comment_id "
+        "FROM comments JOIN tasks ON tasks.task_id = comments.task_id"
+    )
+
+    for name, (event, body) in TRIGGERS.items():
+        op.execute(f'CREATE TRIGGER trg_{name}_search_index {event} BEGIN {body} END')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name in TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS trg_{name}_search_index')
+
+    op.execute('DROP TABLE IF EXISTS search_index')
@@ -0,0 +1,40 @@
+"""attachment storage
+
+Revision ID: f4c0189a0346
+Revises: 7bee69b1dd91
+Create Date: 2026-10-18 03:16:56.458623
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c0189a0346'
+down_revision: Union[str, None] = '7bee69b1dd91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('attachments', sa.Column('filename', sa.String(length=255), nullable=True))
+    op.add_column('attachments', sa.Column('content_type', sa.String(length=100), nullable=True))
+    op.add_column('attachments', sa.Column('size', sa.Integer(), nullable=True))
+    op.add_column('attachments', sa.Column('sha256', sa.String(length=64), nullable=True))
+    op.drop_index('ix_attachments_comment_id', table_name='attachments')
+    op.create_index('ix_attachments_comment_id_created_at', 'attachments', ['comment_id', 'created_at', 'attachment_id'], unique=False)
+    op.create_index('ix_attachments_sha256', 'attachments', ['sha256'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_attachments_sha256', table_name='attachments')
+    op.drop_index('ix_attachments_comment_id_created_at', table_name='attachments')
+    op.create_index('ix_attachments_comment_id', 'attachments', ['comment_id'], unique=False)
+    op.drop_column('attachments', 'sha256')
+    op.drop_column('attachments', 'size')
+    op.drop_column('attachments', 'content_type')
+    op.drop_column('attachments', 'filename')
@@ -0,0 +1,159 @@
+# Хранилище вложений: файл лежит на диске под sha256 содержимого, одинаковые файлы хранятся один раз
+import hashlib
+import mimetypes
+import os
+import tempfile
+from typing import AsyncIterator, NamedTuple, Optional
+from urllib.parse import quote
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+
+ATTACHMENTS_DIR = os.getenv("ATTACHMENTS_DIR", "./attachments")
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", 100 * 2**20))
+# Префикс internal location в nginx (например /protected/): файл отдает nginx через
+# X-Accel-Redirect с sendfile и Range, без него - FileResponse
+ATTACHMENTS_ACCEL_REDIRECT = os.getenv("ATTACHMENTS_ACCEL_REDIRECT")
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+# Ключи session.info: файлы, судьбу которых решает commit или rollback сессии
+STORED_FILES = "attachments_stored"
+REMOVED_FILES = "attachments_removed"
+
+
+class AttachmentTooLarge(ValueError):
+    pass
+
+
+class StoredFile(NamedTuple):
+    sha256: str
+    size: int
+    temp_path: str
+
+
+def blob_path(sha256: str) -> str:
+    # Путь относительно ATTACHMENTS_DIR, два уровня каталогов - чтобы в одном не копились миллионы файлов
+    return os.path.join(sha256[:2], sha256[2:4], sha256)
+
+
+def full_path(file_path: str) -> str:
+    return os.path.join(ATTACHMENTS_DIR, file_path)
+
+
+def clean_filename(filename: str) -> str:
+    # Имя только для Content-Disposition, путь клиента отбрасывается
+    return os.path.basename(filename.replace("\\", "/")).strip()[:255] or "file"
+
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+
+    return f'attachment; filename="{filename}"'
+
+
+def content_type_of(content_type: Optional[str], filename: str) -> str:
+    # Клиенты часто шлют octet-stream для всего подряд, тогда тип угадывается по имени
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if not content_type or content_type == DEFAULT_CONTENT_TYPE:
+        content_type = mimetypes.guess_type(filename)[0] or DEFAULT_CONTENT_TYPE
+
+    return content_type[:100]
+
+
+def _write(file, chunk: bytes):
+    file.write(chunk)
+
+
+def _sync_and_close(file):
+    # Имя файла в хранилище - обещание его содержимого: после сбоя не должно остаться усеченного файла
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
+
+
+async def receive(chunks: AsyncIterator[bytes], max_bytes: int = ATTACHMENT_MAX_BYTES) -> StoredFile:
+    """Пишет поток во временный файл хранилища, попутно считая sha256 и размер"""
+    temp_dir = os.path.join(ATTACHMENTS_DIR, "tmp")
+    os.makedirs(temp_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+    file = os.fdopen(fd, "wb")
+    digest, size = hashlib.sha256(), 0
+
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_bytes:
+                raise AttachmentTooLarge(f"File is larger than {max_bytes} bytes")
+            digest.update(chunk)
+            await run_in_threadpool(_write, file, chunk)
+
+        await run_in_threadpool(_sync_and_close, file)
+    except BaseException:
+        file.close()
+        os.unlink(temp_path)
+        raise
+
+    return StoredFile(sha256=digest.hexdigest(), size=size, temp_path=temp_path)
+
+
+def store(info: dict, stored: StoredFile) -> str:
+    """
+    Переносит временный файл на место по хешу. Файл с тем же хешем заменяется
+    атомарно и с тем же содержимым, поэтому ссылки на него остаются верными.
+    Новый файл удаляется, если сессия откатится: строка, ради которой он лег, не сохранится.
+    """
+    file_path = blob_path(stored.sha256)
+    path = full_path(file_path)
+    existed = os.path.exists(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(stored.temp_path, path)
+
+    if not existed:
+        info.setdefault(STORED_FILES, []).append(file_path)
+
+    return file_path
+
+
+def discard(stored: StoredFile):
+    try:
+        os.unlink(stored.temp_path)
+    except FileNotFoundError:
+        pass
+
+
+def remove(file_path: str):
+    try:
+        os.unlink(full_path(file_path))
+    except FileNotFoundError:
+        pass
+
+
+def remove_on_commit(info: dict, file_path: str):
+    """
+    Файл удалится после commit сессии: при удалении до commit неудачный commit
+    оставил бы строку, которая ссылается на уже удаленный файл.
+    """
+    info.setdefault(REMOVED_FILES, []).append(file_path)
+
+
+@event.listens_for(Session, "after_commit")
+def _remove_committed(session: Session):
+    session.info.pop(STORED_FILES, None)
+    for file_path in session.info.pop(REMOVED_FILES, ()):
+        remove(file_path)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _remove_rolled_back(session: Session, transaction):
+    # Не after_soft_rollback: после неудачного commit get_db только закрывает сессию, и rollback-событий нет.
+    # До конца внешней транзакции списки доживают, только если commit не прошел
+    if transaction.parent is not None:
+        return
+
+    session.info.pop(REMOVED_FILES, None)
+    for file_path in session.info.pop(STORED_FILES, ()):
+        remove(file_path)
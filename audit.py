@@ -0,0 +1,206 @@
+# Журнал действий пользователей (UserActionLogModel): события копятся в очереди и пишутся пачками в фоне
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from models import UserActionLogModel
+
+
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 500))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", 1.0))
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", 10000))
+# block - запрос ждет места в очереди, drop - событие отбрасывается и считается в dropped
+AUDIT_OVERFLOW = os.getenv("AUDIT_OVERFLOW", "block")
+AUDIT_MAX_RETRIES = 5
+
+# Ключи session.info: события сессии до commit и после него
+PENDING_EVENTS = "audit_pending"
+COMMITTED_EVENTS = "audit_committed"
+
+logger = logging.getLogger(__name__)
+
+
+class AuditEvent(NamedTuple):
+    user_id: int
+    action: str
+    details: Dict[str, Any]
+    # Время действия, а не записи: запись отстает на время пачки
+    created_at: datetime
+
+    def row(self) -> dict:
+        description = json.dumps({"action": self.action, **self.details}, ensure_ascii=False, default=str)
+        return {"user_id": self.user_id, "action_description": description, "created_at": self.created_at}
+
+
+def record(info: dict, user_id: int, action: str, /, **details):
+    """Событие сессии: в очередь оно попадет, только если изменения сессии будут закоммичены"""
+    created_at = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    info.setdefault(PENDING_EVENTS, []).append(AuditEvent(user_id, action, details, created_at))
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_events(session: Session):
+    pending = session.info.pop(PENDING_EVENTS, None)
+    if pending:
+        session.info.setdefault(COMMITTED_EVENTS, []).extend(pending)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _rollback_events(session: Session, transaction):
+    # Как attachments: после неудачного commit rollback-событий нет, а конец внешней транзакции есть.
+    # После успешного commit события уже перенесены в COMMITTED_EVENTS
+    if transaction.parent is None:
+        session.info.pop(PENDING_EVENTS, None)
+
+
+_EXPIRED = object()
+
+
+async def _get(queue: asyncio.Queue, timeout: float):
+    try:
+        return queue.get_nowait()
+    except asyncio.QueueEmpty:
+        pass
+    if timeout <= 0:
+        return _EXPIRED
+
+    try:
+        async with asyncio.timeout(timeout):
+            return await queue.get()
+    except TimeoutError:
+        return _EXPIRED
+
+
+class AuditLog:
+    """
+    Фоновая запись событий: пачка уходит одним INSERT, когда набралось batch_size
+    событий или прошло flush_interval секунд с первого события пачки.
+
+    Очередь ограничена queue_size: при overflow=block публикующий запрос ждет места,
+    при drop событие теряется. Гарантии: stop() дописывает все принятые события,
+    при падении процесса теряется не больше queue_size + batch_size событий.
+    Без start() (скрипты, TestClient без lifespan) события пишутся сразу движком engine.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+        queue_size: int = AUDIT_QUEUE_SIZE,
+        overflow: str = AUDIT_OVERFLOW,
+    ):
+        if overflow not in ("block", "drop"):
+            raise ValueError(f"Unknown audit overflow policy: {overflow}")
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.engine: Optional[AsyncEngine] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        self._queue = asyncio.Queue(self.queue_size)
+        self._task = asyncio.create_task(self._run(self._queue), name="audit-log")
+
+    async def stop(self):
+        if self._task is None:
+            return
+
+        # Новые события с этого момента пишутся сразу, очередь дописывается до конца
+        queue, task = self._queue, self._task
+        self._queue = self._task = None
+        await queue.put(None)
+        await task
+
+        rest = []
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is not None:
+                rest.append(item)
+        if rest:
+            await self._write(rest)
+
+    async def publish(self, events: Iterable[AuditEvent]):
+        events = list(events)
+        if not events:
+            return
+
+        if self._queue is None:
+            if self.engine is not None:
+                await self._write(events)
+            return
+
+        for audit_event in events:
+            if self.overflow == "drop":
+                try:
+                    self._queue.put_nowait(audit_event)
+                except asyncio.QueueFull:
+                    self.dropped += 1
+                    continue
+            else:
+                await self._queue.put(audit_event)
+            self.enqueued += 1
+
+    async def _run(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            batch: List[AuditEvent] = []
+            item = await queue.get()
+            deadline = loop.time() + self.flush_interval
+
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                item = await _get(queue, deadline - loop.time())
+                if item is _EXPIRED:
+                    break
+            else:
+                # None в очереди - сигнал stop()
+                stopping = True
+
+            if batch:
+                await self._write(batch)
+
+    async def _write(self, batch: List[AuditEvent]):
+        rows = [audit_event.row() for audit_event in batch]
+
+        for attempt in range(AUDIT_MAX_RETRIES):
+            try:
+                async with self.engine.begin() as conn:
+                    await conn.execute(insert(UserActionLogModel), rows)
+            except Exception:
+                # Пока пачка повторяется, очередь растет, и ограничение queue_size тормозит запросы
+                logger.warning("Audit batch write failed, attempt %d", attempt + 1, exc_info=True)
+                await asyncio.sleep(0.1 * 2**attempt)
+            else:
+                self.written += len(batch)
+                self.batches += 1
+                return
+
+        self.failed += len(batch)
+        logger.error("Audit batch of %d events is lost", len(batch))
+
+
+audit_log = AuditLog()
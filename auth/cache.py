@@ -0,0 +1,92 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Set
+
+from sqlalchemy import event
+
+from models import UserModel
+from schemas import UserSchema
+from .config import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS
+
+
+class _Entry(NamedTuple):
+    signing_input: str
+    identity: UserSchema
+    expires_at: float
+
+
+class TokenCache:
+    """
+    LRU-кэш проверенных JWT: подпись токена -> пользователь.
+
+    Запись живет не дольше TTL и не дольше exp самого токена, поэтому
+    кэш никогда не продлевает жизнь токена.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[UserSchema]:
+        signing_input, _, signature = token.rpartition(".")
+
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is None:
+                return None
+
+            if entry.signing_input != signing_input or entry.expires_at <= time.time():
+                self._pop(signature)
+                return None
+
+            self._entries.move_to_end(signature)
+            return entry.identity
+
+    def set(self, token: str, identity: UserSchema, exp: Optional[float] = None):
+        signing_input, _, signature = token.rpartition(".")
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+
+        with self._lock:
+            self._pop(signature)
+            self._entries[signature] = _Entry(signing_input, identity, expires_at)
+            self._by_user.setdefault(identity.user_id, set()).add(signature)
+
+            while len(self._entries) > self.maxsize:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for signature in list(self._by_user.get(user_id, ())):
+                self._pop(signature)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _pop(self, signature: str):
+        entry = self._entries.pop(signature, None)
+        if entry is None:
+            return
+
+        signatures = self._by_user.get(entry.identity.user_id)
+        if signatures is not None:
+            signatures.discard(signature)
+            if not signatures:
+                del self._by_user[entry.identity.user_id]
+
+
+token_cache = TokenCache()
+
+
+# Любое изменение или удаление пользователя через ORM сбрасывает его токены
+@event.listens_for(UserModel, "after_update")
+@event.listens_for(UserModel, "after_delete")
+def _invalidate_user_tokens(mapper, connection, target: UserModel):
+    token_cache.invalidate_user(target.user_id)
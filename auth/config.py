@@ -1,3 +1,5 @@
+import os
+
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 
@@ -7,9 +9,21 @@ SECRET_KEY = "your_secret_key"  # Измените на более безопа
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Кэш проверенных токенов в get_current_user
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL_SECONDS = 300
+
 
 # Инициализация шифрования паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# При смене стоимости bcrypt старые хэши пересчитываются при следующем входе пользователя
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Пул для bcrypt: thread, process или inline (в event loop, только для сравнения в бенчмарке)
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Сколько операций может ждать свободного воркера, сверх этого /token и /register отвечают 503
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "64"))
 
 # OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
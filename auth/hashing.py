@@ -0,0 +1,90 @@
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from .config import PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_QUEUE_SIZE, PASSWORD_HASH_WORKERS, pwd_context
+
+
+# Функции уровня модуля, чтобы их можно было передать в ProcessPoolExecutor
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Выполняет bcrypt в отдельном ограниченном пуле, не занимая event loop и общий threadpool.
+
+    Одновременно в работе и очереди может быть не больше workers + queue_size операций,
+    остальные сразу получают 503, чтобы шторм логинов не копил бесконечную очередь.
+    """
+
+    def __init__(
+        self,
+        executor: str = PASSWORD_HASH_EXECUTOR,
+        workers: int = PASSWORD_HASH_WORKERS,
+        queue_size: int = PASSWORD_HASH_QUEUE_SIZE,
+    ):
+        if executor not in ("thread", "process", "inline"):
+            raise ValueError(f"Unknown password hash executor: {executor}")
+
+        self.executor = executor
+        self.workers = workers
+        self.limit = workers + queue_size
+        self._pool: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_pool(self) -> Executor:
+        # Пул создается лениво: процессы не должны стартовать при импорте модуля
+        with self._lock:
+            if self._pool is None:
+                if self.executor == "process":
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return self._pool
+
+    async def _run(self, fn, *args):
+        if self.executor == "inline":
+            return fn(*args)
+
+        with self._lock:
+            if self._pending >= self.limit:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many authentication requests",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_pool(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(_verify_and_update, plain_password, hashed_password)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+password_hasher = PasswordHasher()
@@ -1,24 +1,21 @@
+import time
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import scoped_session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
-from typing import Annotated, Literal
+from typing import Literal
 
-from db import get_db
-from .config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, pwd_context, oauth2_scheme
+from db import DbSession
+from metrics import metrics
+from .cache import token_cache
+from .hashing import password_hasher
+from .config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, oauth2_scheme
 from models import UserModel
 from schemas import UserSchema, UserWithPasswordSchema
 
 
 # Authentication functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-
 def create_access_token(data: dict, expires_delta=None):
     to_encode = data.copy()
     if expires_delta:
@@ -30,10 +27,10 @@ def create_access_token(data: dict, expires_delta=None):
     return encoded_jwt
 
 
-def get_user_by_username(
-    db: Annotated[scoped_session, Depends(get_db)], username: str, type_: Literal["schema", "model"] = "schema"
+async def get_user_by_username(
+    db: DbSession, username: str, type_: Literal["schema", "model"] = "schema"
 ) -> UserModel | UserWithPasswordSchema | None:
-    user = db.query(UserModel).filter(UserModel.username == username).first()
+    user = await db.scalar(select(UserModel).where(UserModel.username == username))
 
     if user:
         if type_ == "model":
@@ -42,31 +39,51 @@ def get_user_by_username(
         return UserWithPasswordSchema.model_validate(user)
 
 
-def get_user_by_id(db: Annotated[scoped_session, Depends(get_db)], user_id: int) -> UserSchema | None:
-    user = db.query(UserModel).filter(UserModel.user_id == user_id).first()
+async def get_user_by_id(db: DbSession, user_id: int) -> UserSchema | None:
+    user = await db.scalar(select(UserModel).where(UserModel.user_id == user_id))
 
     if user:
         return UserSchema.model_validate(user)
 
 
 # Authenticate user
-def authenticate_user(
-    db: Annotated[scoped_session, Depends(get_db)], username: str, password: str
+async def authenticate_user(
+    db: DbSession, username: str, password: str
 ) -> UserSchema | None:
-    user = get_user_by_username(db, username)
+    user = await get_user_by_username(db, username)
+
+    if not user:
+        return None
+
+    started = time.perf_counter()
+    valid, new_hash = await password_hasher.verify_and_update(password, user.password)
+    metrics.bcrypt.observe(time.perf_counter() - started)
 
-    if not user or not verify_password(password, user.password):
+    if not valid:
         return None
 
+    # Стоимость bcrypt изменилась - сохраняем пересчитанный хэш, пароль известен только сейчас
+    if new_hash is not None:
+        await db.execute(update(UserModel).where(UserModel.user_id == user.user_id).values(password=new_hash))
+
     assert isinstance(user, UserSchema), "User should be an instance of UserSchema"
 
     return user
 
 
 async def get_current_user(
-    db: Annotated[scoped_session, Depends(get_db)],
+    db: DbSession,
     token: str = Depends(oauth2_scheme),
-) -> UserModel:
+) -> UserSchema:
+    return await get_user_by_token(db, token)
+
+
+async def get_user_by_token(db: AsyncSession, token: str) -> UserSchema:
+    # Отдельно от зависимости: WebSocket передает токен не только в заголовке Authorization
+    identity = token_cache.get(token)
+    if identity is not None:
+        return identity
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -80,11 +97,14 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = get_user_by_username(db=db, username=username, type_="model")
+    user = await get_user_by_username(db=db, username=username, type_="model")
 
     if user is None:
         raise credentials_exception
 
     assert isinstance(user, UserModel), "User should be an instance of UserModel"
 
-    return user
+    identity = UserSchema.model_validate(user)
+    token_cache.set(token, identity, exp=payload.get("exp"))
+
+    return identity
@@ -1,16 +1,15 @@
 from datetime import timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import scoped_session
 
-from db import get_db
+from db import DbSession
 from .helpers import (
     authenticate_user,
     get_current_user,
-    get_password_hash,
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES,
 )
+from .hashing import password_hasher
 from schemas import UserSchema, UserCreateSchema, UserWithPasswordSchema
 from models import UserModel
 from init import app
@@ -18,8 +17,8 @@ from init import app
 
 # Token route
 @app.post("/token")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: scoped_session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(db: DbSession, form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -34,17 +33,17 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: scoped_session =
 
 # Protect routes with authentication
 @app.get("/users/me", response_model=UserSchema)
-async def read_users_me(user: UserModel = Depends(get_current_user)):
+async def read_users_me(user: UserSchema = Depends(get_current_user)):
     return UserSchema.model_validate(user)
 
 
 # Registration route
 @app.post("/register", response_model=UserSchema)
-def register_user(user: UserCreateSchema, db: scoped_session = Depends(get_db)):
-    hashed_password = get_password_hash(user.password)
+async def register_user(user: UserCreateSchema, db: DbSession):
+    hashed_password = await password_hasher.hash(user.password)
     db_user = UserModel(username=user.username, password=hashed_password)  # Use hashed password
 
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    # created_at приходит из INSERT ... RETURNING, commit выполнит get_db
+    await db.flush()
     return db_user
@@ -0,0 +1,157 @@
+"""
+Задержка HTTP-маршрутов и блокировка event loop: sync и async путь к БД.
+
+Приложение вызывается in-process через ASGI, как в benchmarks.load. Во временную БД
+заводятся пользователи с доской, статусом и задачами, затем --requests
+запросов к /users/me, /boards/, /boards/{id} и /boards/{id}/tasks/ выполняются
+--concurrency воркерами. Параллельно крутится heartbeat-корутина: задержка ее тиков
+показывает, насколько обработка запросов блокирует event loop для остальных.
+
+"До" и "после" - два прогона одного скрипта: --app-root указывает на дерево, из которого
+импортируется приложение, например на ревизию до перехода на AsyncSession:
+
+    git worktree add /tmp/before d2b927a
+    python -m benchmarks.async_db --app-root /tmp/before --requests 2000 --concurrency 50
+    python -m benchmarks.async_db --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEARTBEAT_INTERVAL = 0.001
+PASSWORD = "bench-password"
+
+
+def load_app(app_root: str):
+    """Схема создается миграциями дерева app_root, БД - data.db во временном каталоге"""
+    from migrations import migrate
+
+    directory = tempfile.mkdtemp()
+    # Ранние ревизии берут путь к БД только из ./data.db, новые - из DATABASE_URL
+    os.chdir(directory)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'data.db')}"
+    os.environ["ATTACHMENTS_DIR"] = os.path.join(directory, "attachments")
+    sys.path.insert(0, app_root)
+
+    migrate(os.environ["DATABASE_URL"], app_root)
+
+    from app import app
+
+    return app
+
+
+async def populate(client, users: int, tasks: int) -> list:
+    """
+    (заголовки, board_id) на пользователя. Пользователи и доски создаются через API, статусы
+    и задачи - вставкой моделями дерева app_root: ранние ревизии создают их, но отвечают на POST 500.
+    """
+    from sqlalchemy import create_engine, insert
+
+    from models import StatusModel, TaskModel
+
+    sessions = []
+    for u in range(users):
+        credentials = {"username": f"user{u}", "password": PASSWORD}
+        (await client.post("/register", json=credentials)).raise_for_status()
+        token = (await client.post("/token", data=credentials)).raise_for_status().json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        board = await client.post("/boards/", json={"user_id": 0, "title": f"board {u}"}, headers=headers)
+        sessions.append((headers, board.raise_for_status().json()["board_id"]))
+
+    engine = create_engine(os.environ["DATABASE_URL"])
+    with engine.begin() as conn:
+        for _, board_id in sessions:
+            status_id = conn.execute(insert(StatusModel).values(board_id=board_id, name="todo")).inserted_primary_key[0]
+            conn.execute(
+                insert(TaskModel), [{"board_id": board_id, "status_id": status_id, "title": f"task {t}"} for t in range(tasks)]
+            )
+    engine.dispose()
+
+    return sessions
+
+
+async def heartbeat(stop: asyncio.Event, lags: list):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        lags.append(loop.time() - started - HEARTBEAT_INTERVAL)
+
+
+def percentile(values: list, q: float) -> float:
+    return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 3)
+
+
+async def run(app, requests: int, concurrency: int, users: int, tasks: int) -> dict:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        sessions = await populate(client, users, tasks)
+        paths = ["/users/me", "/boards/", "/boards/{board_id}", "/boards/{board_id}/tasks/"]
+        latencies = {path: [] for path in paths}
+        statuses = {}
+        pending = iter(range(requests))
+
+        async def worker():
+            for i in pending:
+                headers, board_id = sessions[i % len(sessions)]
+                path = paths[i % len(paths)]
+                started = time.perf_counter()
+                response = await client.get(path.format(board_id=board_id), headers=headers)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    latencies[path].append(time.perf_counter() - started)
+
+        stop, lags = asyncio.Event(), []
+        beat = asyncio.create_task(heartbeat(stop, lags))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await beat
+
+    everything = sorted(latency for values in latencies.values() for latency in values)
+    lags.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput_rps": round(requests / elapsed, 1),
+        "latency_p50_ms": percentile(everything, 0.5),
+        "latency_p99_ms": percentile(everything, 0.99),
+        "routes": {
+            path: {"p50_ms": percentile(sorted(values), 0.5), "p99_ms": percentile(sorted(values), 0.99)}
+            for path, values in latencies.items() if values
+        },
+        "loop_lag_mean_ms": round(statistics.fmean(lags) * 1000, 3) if lags else None,
+        "loop_lag_max_ms": round(lags[-1] * 1000, 3) if lags else None,
+        "heartbeats": len(lags),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-root", default=ROOT, help="дерево, из которого импортируется приложение")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--tasks", type=int, default=20, help="задач на доску")
+    args = parser.parse_args()
+
+    app_root = os.path.abspath(args.app_root)
+    app = load_app(app_root)
+    result = asyncio.run(run(app, args.requests, args.concurrency, args.users, args.tasks))
+    print(json.dumps({"app_root": app_root, **result}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Журнал действий: цена записи для мутаций и гарантии фоновой очереди.
+
+throughput - обновления задач через TaskCRUD.update в режимах none (без журнала),
+sync (строка журнала в транзакции каждой мутации) и batched (AuditLog).
+Проверки durability:
+- drain: все принятые события записаны после stop();
+- crash: процесс с очередью убивается SIGKILL, потеряно не больше queue_size + batch_size;
+- backpressure: пока БД заблокирована, publish при block ждет, при drop теряет сверх очереди,
+  а после снятия блокировки все принятые события дописываются.
+
+    python -m benchmarks.audit_log --mutations 5000 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+import audit  # noqa: E402
+from audit import COMMITTED_EVENTS, AuditLog  # noqa: E402
+from auth.helpers import get_user_by_username  # noqa: E402
+from migrations import migrate  # noqa: E402
+from crud import CRUD, BoardCRUD  # noqa: E402
+from db import SQLITE_PROFILES, engine_options, set_sqlite_pragmas  # noqa: E402
+from models import BoardModel, StatusModel, TaskModel, UserActionLogModel, UserModel  # noqa: E402
+from schemas import TaskUpdateSchema  # noqa: E402
+
+
+def new_db(tasks: int) -> str:
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'audit.db')}"
+    migrate(url)
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(insert(UserModel).values(username="bench", password="x"))
+        conn.execute(insert(BoardModel).values(user_id=1, title="bench"))
+        conn.execute(insert(StatusModel).values(board_id=1, name="todo"))
+        conn.execute(insert(TaskModel), [{"board_id": 1, "status_id": 1, "title": f"task {i}"} for i in range(tasks)])
+    engine.dispose()
+    return url
+
+
+def async_engine_for(url: str):
+    async_url = url.replace("sqlite://", "sqlite+aiosqlite://")
+    engine = create_async_engine(async_url, **engine_options(async_url))
+    set_sqlite_pragmas(engine.sync_engine, SQLITE_PROFILES["production"])
+    return engine
+
+
+def count_rows(url: str) -> int:
+    with sqlite3.connect(url.removeprefix("sqlite:///")) as conn:
+        return conn.execute("SELECT count(*) FROM user_action_logs").fetchone()[0]
+
+
+def sync_log_action(self, action: str, board_id: int, **details):
+    # "До": строка журнала вставляется в той же транзакции, что и сама мутация
+    info = {}
+    audit.record(info, self.current_user.user_id, action, board_id=board_id, **details)
+    self.db.add(UserActionLogModel(**info[audit.PENDING_EVENTS][0].row()))
+
+
+async def throughput(mode: str, mutations: int, concurrency: int, tasks: int) -> dict:
+    url = new_db(tasks)
+    engine = async_engine_for(url)
+    sessions = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    log = AuditLog()
+    log.engine = engine
+    log_action = CRUD.log_action
+
+    if mode == "none":
+        CRUD.log_action = lambda self, *args, **kwargs: None
+    elif mode == "sync":
+        CRUD.log_action = sync_log_action
+    else:
+        log.start()
+
+    async with sessions() as db:
+        user = await get_user_by_username(db, "bench")
+
+    counter = iter(range(mutations))
+    latencies = []
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            # Жизненный цикл get_db: commit, затем события сессии в очередь
+            async with sessions() as db:
+                await BoardCRUD(db=db, current_user=user).task.update(1, 1 + i % tasks, TaskUpdateSchema(title=f"t{i}"))
+                await db.commit()
+            await log.publish(db.info.pop(COMMITTED_EVENTS, ()))
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    stop_started = time.perf_counter()
+    await log.stop()
+    stop_elapsed = time.perf_counter() - stop_started
+    CRUD.log_action = log_action
+    await engine.dispose()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "mutations_per_sec": round(mutations / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+        "audit_rows": count_rows(url),
+        "audit_batches": log.batches if mode == "batched" else None,
+        "stop_ms": round(stop_elapsed * 1000, 1),
+    }
+
+
+def event(i: int) -> audit.AuditEvent:
+    return audit.AuditEvent(1, "bench.event", {"seq": i}, datetime.now())
+
+
+async def check_drain(events: int) -> dict:
+    url = new_db(1)
+    engine = async_engine_for(url)
+    log = AuditLog(batch_size=100, flush_interval=60)
+    log.engine = engine
+    log.start()
+
+    await log.publish(event(i) for i in range(events))
+    await log.stop()
+    await engine.dispose()
+
+    rows = count_rows(url)
+    return {"check": "drain", "published": events, "written": rows, "ok": rows == events}
+
+
+async def crash_child(url: str, queue_size: int, batch_size: int):
+    engine = async_engine_for(url)
+    log = AuditLog(batch_size=batch_size, flush_interval=0.05, queue_size=queue_size)
+    log.engine = engine
+    log.start()
+
+    i = 0
+    while True:
+        await log.publish(event(i) for i in range(i, i + 50))
+        i += 50
+        print(i, flush=True)
+        await asyncio.sleep(0)
+
+
+def check_crash(queue_size: int, batch_size: int, seconds: float) -> dict:
+    url = new_db(1)
+    command = [sys.executable, "-m", "benchmarks.audit_log", "--crash-child", url, "--queue-size", str(queue_size), "--batch-size", str(batch_size)]
+    child = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+    enqueued, deadline = 0, time.monotonic() + seconds
+    for line in child.stdout:
+        enqueued = int(line)
+        if time.monotonic() >= deadline:
+            break
+    child.send_signal(signal.SIGKILL)
+    child.wait()
+
+    rows = count_rows(url)
+    # После последней строки ребенок мог успеть принять еще одну порцию из 50 событий
+    lost = enqueued + 50 - rows
+    return {
+        "check": "crash",
+        "enqueued_at_least": enqueued,
+        "written": rows,
+        "lost_at_most": lost,
+        "bound": queue_size + batch_size,
+        "ok": lost <= queue_size + batch_size + 50,
+    }
+
+
+async def check_backpressure(overflow: str, queue_size: int, extra: int) -> dict:
+    url = new_db(1)
+    engine = async_engine_for(url)
+    log = AuditLog(batch_size=queue_size, flush_interval=0.01, queue_size=queue_size, overflow=overflow)
+    log.engine = engine
+
+    locker = sqlite3.connect(url.removeprefix("sqlite:///"), isolation_level=None)
+    locker.execute("BEGIN EXCLUSIVE")
+    log.start()
+
+    # Писатель ждет блокировку (busy_timeout) и повторяет пачку, очередь заполняется следующими событиями
+    total = 2 * queue_size + extra
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(log.publish(event(i) for i in range(total)), timeout=0.5)
+        blocked = False
+    except TimeoutError:
+        blocked = True
+    publish_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    locker.execute("ROLLBACK")
+    locker.close()
+    await log.stop()
+    await engine.dispose()
+
+    rows = count_rows(url)
+    accepted = log.enqueued
+    if overflow == "block":
+        ok = blocked and rows == accepted
+    else:
+        ok = not blocked and log.dropped > 0 and rows == accepted and accepted + log.dropped == total
+
+    return {
+        "check": f"backpressure_{overflow}",
+        "published": total,
+        "publish_blocked": blocked,
+        "publish_ms": publish_ms,
+        "accepted": accepted,
+        "dropped": log.dropped,
+        "written": rows,
+        "ok": ok,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mutations", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--queue-size", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--crash-seconds", type=float, default=2.0)
+    parser.add_argument("--crash-child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.crash_child:
+        asyncio.run(crash_child(args.crash_child, args.queue_size, args.batch_size))
+        return
+
+    results = {
+        "throughput": [
+            asyncio.run(throughput(mode, args.mutations, args.concurrency, args.tasks))
+            for mode in ("none", "sync", "batched")
+        ],
+        "durability": [
+            asyncio.run(check_drain(10 * args.queue_size)),
+            check_crash(args.queue_size, args.batch_size, args.crash_seconds),
+            asyncio.run(check_backpressure("block", args.queue_size, 100)),
+            asyncio.run(check_backpressure("drop", args.queue_size, 100)),
+        ],
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Лента изменений доски: цена простаивающих подписок SSE и задержка раздачи события.
+
+Открывается --connections потоков GET /boards/1/events (приложение вызывается напрямую
+через ASGI), затем одна мутация POST /boards/1/tasks/bulk, и замеряется время, за которое
+событие дошло до всех подписчиков. Отдельно проверяется, что подписки не держат
+соединений пула БД и что после отключения клиентов брокер пуст.
+
+    python -m benchmarks.board_events --connections 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmRSS is not available")
+
+
+def seed(url: str):
+    from sqlalchemy import create_engine, insert
+
+    from migrations import migrate
+    from models import BoardModel, StatusModel, UserModel
+
+    migrate(url)
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(insert(UserModel).values(username="bench", password="x"))
+        conn.execute(insert(BoardModel).values(user_id=1, title="bench"))
+        conn.execute(insert(StatusModel).values(board_id=1, name="todo"))
+    engine.dispose()
+
+
+def scope(method: str, path: str, token: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"bench"),
+            (b"authorization", f"Bearer {token}".encode()),
+            (b"content-type", b"application/json"),
+        ],
+        "client": ("bench", 0),
+        "server": ("bench", 80),
+    }
+
+
+async def request(app, method: str, path: str, token: str, body: bytes = b"") -> int:
+    status, sent = [None], [False]
+
+    async def receive():
+        if not sent[0]:
+            sent[0] = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status[0] = message["status"]
+
+    await app(scope(method, path, token), receive, send)
+    return status[0]
+
+
+async def subscribe(app, token: str, connected: asyncio.Event, received: list, disconnect: asyncio.Event):
+    sent = [False]
+
+    async def receive():
+        if not sent[0]:
+            sent[0] = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        body = message.get("body", b"")
+        if body.startswith(b"retry:"):
+            connected.set()
+        elif b"event: task.create_many" in body:
+            received.append(time.perf_counter())
+
+    await app(scope("GET", "/boards/1/events", token), receive, send)
+
+
+async def run(connections: int) -> dict:
+    from app import app
+    from auth.helpers import create_access_token
+    from board_events import board_events
+    from db import async_engine
+
+    token = create_access_token({"sub": "bench"})
+    # Прогрев: импорты, пул и кэш токена не должны попасть в цену подписок
+    await request(app, "GET", "/boards/1", token)
+
+    baseline = rss_mb()
+    received, disconnect = [], asyncio.Event()
+    started = time.perf_counter()
+    streams = []
+    for _ in range(connections):
+        connected = asyncio.Event()
+        streams.append(asyncio.create_task(subscribe(app, token, connected, received, disconnect)))
+        await connected.wait()
+    connect_elapsed = time.perf_counter() - started
+    subscribed_rss = rss_mb()
+    subscribers = board_events.subscribers
+    pool_checked_out = async_engine.pool.checkedout()
+
+    body = json.dumps([{"title": "event", "status_id": 1}]).encode()
+    published = time.perf_counter()
+    status = await request(app, "POST", "/boards/1/tasks/bulk", token, body)
+    while len(received) < connections and time.perf_counter() - published < 30:
+        await asyncio.sleep(0.001)
+    latencies = sorted(at - published for at in received)
+
+    disconnect.set()
+    await asyncio.gather(*streams)
+
+    return {
+        "connections": connections,
+        "connect_per_sec": round(connections / connect_elapsed, 1),
+        "subscribers": subscribers,
+        "pool_checked_out": pool_checked_out,
+        "rss_growth_mb": round(subscribed_rss - baseline, 1),
+        "kb_per_connection": round((subscribed_rss - baseline) * 1024 / connections, 2),
+        "mutation_status": status,
+        "delivered": len(received),
+        "fanout_p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+        "fanout_max_ms": round(latencies[-1] * 1000, 2) if latencies else None,
+        "subscribers_after_disconnect": board_events.subscribers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=5000)
+    args = parser.parse_args()
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ["DATABASE_URL"] = url
+    seed(url)
+
+    print(json.dumps(asyncio.run(run(args.connections)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
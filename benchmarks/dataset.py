@@ -0,0 +1,378 @@
+"""
+Синтетическая БД production-размера: схема из миграций alembic, данные - Core bulk insert.
+
+Распределения похожи на живые: число досок у пользователя, задач на доске и комментариев
+у задачи подчиняется закону Ципфа (--skew), поэтому рядом с тысячами маленьких досок есть
+несколько огромных. Время создания растет вместе с id, статусы и теги на доске свои,
+популярность тегов тоже неравномерная, тексты собираются из словаря и находятся поиском.
+Строки вставляются пачками через executemany, commit раз в --transaction-rows строк.
+Один и тот же --seed дает одну и ту же БД.
+
+    python -m benchmarks.dataset big.db --users 10000 --boards 20000 --tasks 2000000 --comments 5000000 --seed 1
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from array import array
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Callable, Dict, Iterator, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, insert, text  # noqa: E402
+
+from auth.config import pwd_context  # noqa: E402
+from migrations import migrate  # noqa: E402
+from db import SQLITE_PROFILES, set_sqlite_pragmas  # noqa: E402
+from models import (  # noqa: E402
+    BoardAccessModel,
+    BoardModel,
+    CommentModel,
+    StatusModel,
+    TagModel,
+    TaskModel,
+    TaskTagModel,
+    UserModel,
+)
+
+
+PASSWORD = "password"
+BCRYPT_SALT_ALPHABET = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+# Данные все равно пересоздаются с нуля, поэтому на время генерации fsync не нужен
+GENERATOR_PRAGMAS = {**SQLITE_PROFILES["production"], "synchronous": "OFF"}
+
+WORDS = (
+    "api auth backend bug build cache ci cleanup client config crash css data database deadline deploy design docs "
+    "email error export feature fix flaky form frontend import index integration invoice latency layout leak login "
+    "memory metrics migration mobile monitoring notification onboarding page payment performance permission query "
+    "queue refactor release report request review search security server session settings signup slow sql storage "
+    "sync test timeout token ui update upload user validation webhook widget"
+).split()
+STATUS_NAMES = ("Backlog", "To do", "In progress", "Review", "Testing", "Blocked", "Done", "Archived")
+TAG_LABELS = (
+    "bug", "feature", "urgent", "backend", "frontend", "design", "tech-debt", "docs", "security", "performance",
+    "infra", "mobile", "customer", "q1", "q2", "q3", "q4", "blocked", "good-first-issue", "wontfix",
+)
+
+
+class Zipf:
+    """Случайный индекс 0..n-1 с весом 1 / (rank + 1) ** skew: первые индексы выпадают чаще всех"""
+
+    def __init__(self, rng: random.Random, n: int, skew: float):
+        self.rng = rng
+        self.cumulative = list(accumulate(1 / (rank + 1) ** skew for rank in range(n)))
+        self.total = self.cumulative[-1]
+
+    def __call__(self) -> int:
+        return bisect(self.cumulative, self.rng.random() * self.total)
+
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.now = datetime(2026, 1, 1)
+        self.start = self.now - timedelta(days=args.days)
+        self.span = (self.now - self.start).total_seconds()
+
+        # Для связей запоминаются только компактные массивы: доска задачи, статусы и теги досок
+        self.board_owner = array("i")
+        self.board_created = array("d")
+        self.board_statuses: List[range] = []
+        self.board_tags: List[range] = []
+        self.task_board = array("i")
+        self.task_created = array("d")
+
+    def created_at(self, n: int, total: int) -> datetime:
+        # id растет вместе со временем создания, как у строк, вставленных по ходу жизни сервиса
+        return self.start + timedelta(seconds=self.span * (n + self.rng.random()) / total)
+
+    def words(self, low: int, high: int) -> str:
+        return " ".join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+
+    def password_hash(self) -> str:
+        # Соль из seed, чтобы и хэш пароля совпадал между прогонами; последний символ - с нулевыми битами заполнения
+        rng = random.Random(self.args.seed)
+        salt = "".join(rng.choice(BCRYPT_SALT_ALPHABET) for _ in range(21)) + rng.choice(".Oeu")
+        return pwd_context.hash(PASSWORD, salt=salt)
+
+    def users(self) -> Iterator[dict]:
+        password = self.password_hash()
+        for user_id in range(1, self.args.users + 1):
+            yield {
+                "user_id": user_id,
+                "username": f"user{user_id}",
+                "password": password,
+                "created_at": self.created_at(user_id - 1, self.args.users),
+            }
+
+    def boards(self) -> Iterator[dict]:
+        owner = Zipf(self.rng, self.args.users, self.args.skew)
+        for board_id in range(1, self.args.boards + 1):
+            user_id = owner() + 1
+            created_at = self.created_at(board_id - 1, self.args.boards)
+            self.board_owner.append(user_id)
+            self.board_created.append(created_at.timestamp())
+            yield {
+                "board_id": board_id,
+                "user_id": user_id,
+                "title": self.words(1, 4).capitalize(),
+                "description": self.words(5, 20) if self.rng.random() < 0.5 else None,
+                "created_at": created_at,
+            }
+
+    def board_later(self, board_id: int) -> datetime:
+        # Момент между созданием доски и "сейчас": время явно, иначе server_default сделает БД недетерминированной
+        created = self.board_created[board_id - 1]
+        return datetime.fromtimestamp(created + (self.now.timestamp() - created) * self.rng.random())
+
+    def statuses(self) -> Iterator[dict]:
+        status_id = 0
+        for board_id in range(1, self.args.boards + 1):
+            count = self.rng.randint(3, len(STATUS_NAMES))
+            self.board_statuses.append(range(status_id + 1, status_id + count + 1))
+            created_at = datetime.fromtimestamp(self.board_created[board_id - 1])
+            for name in STATUS_NAMES[:count]:
+                status_id += 1
+                yield {"status_id": status_id, "board_id": board_id, "name": name, "created_at": created_at}
+
+    def tags(self) -> Iterator[dict]:
+        tag_id = 0
+        for board_id in range(1, self.args.boards + 1):
+            count = self.rng.randint(0, self.args.tags_per_board)
+            self.board_tags.append(range(tag_id + 1, tag_id + count + 1))
+            for label in self.rng.sample(TAG_LABELS, min(count, len(TAG_LABELS))):
+                tag_id += 1
+                yield {"tag_id": tag_id, "board_id": board_id, "label": label, "created_at": self.board_later(board_id)}
+            for extra in range(len(TAG_LABELS), count):
+                tag_id += 1
+                yield {"tag_id": tag_id, "board_id": board_id, "label": f"label-{extra}", "created_at": self.board_later(board_id)}
+
+    def accesses(self) -> Iterator[dict]:
+        access_id = 0
+        for board_id in range(1, self.args.boards + 1):
+            owner = self.board_owner[board_id - 1]
+            shared = {self.rng.randrange(self.args.users) + 1 for _ in range(int(self.rng.expovariate(1 / self.args.shares)))}
+            for user_id in sorted(shared - {owner}):
+                access_id += 1
+                yield {
+                    "access_id": access_id,
+                    "board_id": board_id,
+                    "user_id": user_id,
+                    "full_access": self.rng.random() < 0.7,
+                    "granted_at": self.board_later(board_id),
+                }
+
+    def tasks(self, task_tags: list) -> Iterator[dict]:
+        board = Zipf(self.rng, self.args.boards, self.args.skew)
+        # Доски упорядочены по популярности случайно, иначе самые большие доски были бы самыми старыми
+        popular = list(range(1, self.args.boards + 1))
+        self.rng.shuffle(popular)
+
+        for task_id in range(1, self.args.tasks + 1):
+            board_id = popular[board()]
+            created_at = self.created_at(task_id - 1, self.args.tasks)
+            self.task_board.append(board_id)
+            self.task_created.append(created_at.timestamp())
+
+            statuses = self.board_statuses[board_id - 1]
+            # Большая часть задач уже закрыта: вес статуса растет к концу списка
+            status_id = statuses[min(len(statuses) - 1, int(len(statuses) * self.rng.random() ** 0.5))]
+
+            tags = self.board_tags[board_id - 1]
+            if tags:
+                labels = {tags[min(int(self.rng.paretovariate(1.2)) - 1, len(tags) - 1)] for _ in range(self.rng.randint(0, 3))}
+                task_tags.extend({"task_id": task_id, "tag_id": tag_id} for tag_id in labels)
+
+            yield {
+                "task_id": task_id,
+                "board_id": board_id,
+                "status_id": status_id,
+                "title": self.words(2, 8).capitalize(),
+                "description": self.words(10, 60) if self.rng.random() < 0.6 else None,
+                "created_at": created_at,
+            }
+
+    def comments(self) -> Iterator[dict]:
+        task = Zipf(self.rng, self.args.tasks, self.args.skew)
+        # Как и доски, обсуждаемые задачи раскиданы по времени
+        popular = list(range(1, self.args.tasks + 1))
+        self.rng.shuffle(popular)
+        now = self.now.timestamp()
+
+        for comment_id in range(1, self.args.comments + 1):
+            task_id = popular[task()]
+            created = self.task_created[task_id - 1]
+            # Автор - владелец доски или случайный участник
+            user_id = self.board_owner[self.task_board[task_id - 1] - 1] if self.rng.random() < 0.5 else self.rng.randrange(self.args.users) + 1
+            yield {
+                "comment_id": comment_id,
+                "task_id": task_id,
+                "user_id": user_id,
+                "content": self.words(3, 40),
+                "created_at": datetime.fromtimestamp(created + (now - created) * self.rng.random() ** 3),
+            }
+
+
+def batches(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load(engine, model, rows: Iterator[dict], args, counts: Dict[str, int], flush: Callable = None):
+    """
+    Пачки по --batch-rows строк, commit каждые --transaction-rows: большие транзакции
+    не платят за commit на каждую пачку, но и не копят гигантский WAL.
+    flush вызывается после каждой пачки - так вместе с задачами пишутся их теги.
+    """
+    table = model.__table__
+    statement = insert(table)
+    conn = engine.connect()
+    transaction = conn.begin()
+    in_transaction = 0
+    try:
+        for batch in batches(rows, args.batch_rows):
+            conn.execute(statement, batch)
+            counts[table.name] = counts.get(table.name, 0) + len(batch)
+            in_transaction += len(batch)
+            if flush is not None:
+                in_transaction += flush(conn)
+            if in_transaction >= args.transaction_rows:
+                transaction.commit()
+                transaction = conn.begin()
+                in_transaction = 0
+        transaction.commit()
+    finally:
+        conn.close()
+
+
+def suspend_schema_objects(engine) -> List[str]:
+    """
+    Снимает триггеры и вторичные индексы и возвращает их DDL. Построчные триггеры (версия доски,
+    поисковый индекс) в разы медленнее самих вставок, а индекс дешевле построить один раз в конце.
+    """
+    with engine.begin() as conn:
+        objects = conn.execute(
+            text("SELECT type, name, sql FROM sqlite_master WHERE type IN ('trigger', 'index') AND sql IS NOT NULL")
+        ).all()
+        for kind, name, _ in objects:
+            conn.execute(text(f'DROP {kind.upper()} "{name}"'))
+
+    # Индексы создаются раньше триггеров: триггеры пересоздаются уже на заполненных таблицах
+    return [sql for kind, _, sql in sorted(objects, key=lambda row: row[0] != "index")]
+
+
+def restore_schema_objects(engine, ddl: List[str]):
+    with engine.begin() as conn:
+        # То же заполнение, что и в миграции c4543d5b0b8f (search index), одной вставкой на таблицу.
+        # boards.version остается 0: версия нужна только для ETag и растет с первой правкой
+        conn.execute(text(
+            "INSERT INTO search_index(rowid, title, body, board, task_id, comment_id) "
+            "SELECT task_id * 2, title, coalesce(description, ''), 'b' || board_id, task_id, NULL FROM tasks"
+        ))
+        conn.execute(text(
+            "INSERT INTO search_index(rowid, title, body, board, task_id, comment_id) "
+            "SELECT comments.comment_id * 2 + 1, '', comments.content, 'b' || tasks.board_id, "
+            "comments.task_id, comments.comment_id "
+            "FROM comments JOIN tasks ON tasks.task_id = comments.task_id"
+        ))
+        for sql in ddl:
+            conn.execute(text(sql))
+
+
+def generate(args) -> dict:
+    url = f"sqlite:///{args.path}"
+    migrate(url)
+    engine = create_engine(url)
+    set_sqlite_pragmas(engine, GENERATOR_PRAGMAS)
+    generator = Generator(args)
+    counts: Dict[str, int] = {}
+    task_tags: List[dict] = []
+
+    def flush_task_tags(conn) -> int:
+        if not task_tags:
+            return 0
+        conn.execute(insert(TaskTagModel.__table__), task_tags)
+        written = len(task_tags)
+        counts["task_tags"] = counts.get("task_tags", 0) + written
+        task_tags.clear()
+        return written
+
+    started = time.perf_counter()
+    ddl = suspend_schema_objects(engine)
+    load(engine, UserModel, generator.users(), args, counts)
+    load(engine, BoardModel, generator.boards(), args, counts)
+    load(engine, StatusModel, generator.statuses(), args, counts)
+    load(engine, TagModel, generator.tags(), args, counts)
+    load(engine, BoardAccessModel, generator.accesses(), args, counts)
+    load(engine, TaskModel, generator.tasks(task_tags), args, counts, flush=flush_task_tags)
+    load(engine, CommentModel, generator.comments(), args, counts)
+    restore_schema_objects(engine, ddl)
+    elapsed = time.perf_counter() - started
+
+    analyze_started = time.perf_counter()
+    if args.analyze:
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    engine.dispose()
+
+    rows = sum(counts.values())
+    return {
+        "path": args.path,
+        "seed": args.seed,
+        "rows": counts,
+        "total_rows": rows,
+        "elapsed_s": round(elapsed, 2),
+        "rows_per_sec": round(rows / elapsed),
+        "analyze_s": round(time.perf_counter() - analyze_started, 2),
+        "size_mb": round(os.path.getsize(args.path) / 2**20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="файл SQLite; существующий перезаписывается только с --force")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--boards", type=int, default=2000)
+    parser.add_argument("--tasks", type=int, default=200000)
+    parser.add_argument("--comments", type=int, default=500000)
+    parser.add_argument("--tags-per-board", type=int, default=12, help="максимум тегов в каталоге доски")
+    parser.add_argument("--shares", type=float, default=2, help="в среднем пользователей с доступом к доске")
+    parser.add_argument("--skew", type=float, default=1.0, help="показатель Ципфа: 0 - равномерно, больше - сильнее перекос")
+    parser.add_argument("--days", type=int, default=730, help="за сколько дней до 2026-01-01 начинается история")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch-rows", type=int, default=5000)
+    parser.add_argument("--transaction-rows", type=int, default=200000)
+    parser.add_argument("--no-analyze", dest="analyze", action="store_false", help="не собирать статистику планировщика")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    if min(args.users, args.boards) < 1 or min(args.tasks, args.comments) < 0:
+        parser.error("--users and --boards must be positive, --tasks and --comments non-negative")
+    if args.comments and not args.tasks:
+        parser.error("--comments need at least one task")
+
+    if os.path.exists(args.path):
+        if not args.force:
+            parser.error(f"{args.path} exists, use --force to overwrite it")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.path + suffix):
+                os.remove(args.path + suffix)
+
+    print(json.dumps(generate(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
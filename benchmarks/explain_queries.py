@@ -0,0 +1,127 @@
+"""
+EXPLAIN QUERY PLAN для горячих запросов CRUD.
+
+Создает временную БД через миграции alembic, наполняет ее небольшим набором
+данных, выполняет методы CRUD и для каждого выполненного ими SQL печатает
+план SQLite. Так проверяется, что запросы идут по индексам, а не SCAN.
+
+    python -m benchmarks.explain_queries
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, insert  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from auth.helpers import get_user_by_username  # noqa: E402
+from crud import BoardCRUD  # noqa: E402
+from migrations import migrate  # noqa: E402
+from models import (  # noqa: E402
+    AttachmentModel,
+    BoardAccessModel,
+    BoardModel,
+    CommentModel,
+    StatusModel,
+    TagModel,
+    TaskModel,
+    TaskTagModel,
+    UserModel,
+)
+
+
+def seed(url: str):
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(insert(UserModel), [{"username": f"user{i}", "password": "x"} for i in range(1, 11)])
+        conn.execute(insert(BoardModel), [{"user_id": 1 + i % 10, "title": f"board{i}"} for i in range(1, 51)])
+        conn.execute(insert(StatusModel), [{"board_id": 1 + i % 50, "name": f"status{i}"} for i in range(200)])
+        conn.execute(
+            insert(TaskModel),
+            [{"board_id": 1 + i % 50, "status_id": 1 + i % 200, "title": f"task{i}"} for i in range(5000)],
+        )
+        conn.execute(
+            insert(CommentModel),
+            [{"task_id": 1 + i % 5000, "user_id": 1 + i % 10, "content": f"comment{i}"} for i in range(10000)],
+        )
+        conn.execute(insert(AttachmentModel), [{"comment_id": 1 + i % 10000, "file_path": f"f{i}"} for i in range(2000)])
+        conn.execute(insert(TagModel), [{"board_id": 1 + i % 50, "label": f"tag{i // 50}"} for i in range(1000)])
+        # Задача i доски b получает теги этой же доски: tag_id = b + 50 * k
+        conn.execute(
+            insert(TaskTagModel),
+            [{"task_id": 1 + i, "tag_id": 1 + i % 50 + 50 * k} for i in range(5000) for k in range(i % 3)],
+        )
+        conn.execute(
+            insert(BoardAccessModel),
+            [{"board_id": 1 + i % 50, "user_id": 1 + (i + 1 + i // 50) % 10, "full_access": True} for i in range(100)],
+        )
+    engine.dispose()
+
+
+async def capture(url: str) -> list:
+    engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+    captured, current = [], {"name": None}
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        captured.append((current["name"], statement, parameters))
+
+    async with async_sessionmaker(bind=engine, expire_on_commit=False)() as db:
+        # user1 owns board 10, tasks 10, 60, ... belong to it
+        user = await get_user_by_username(db, "user1", type_="model")
+        crud = BoardCRUD(db=db, current_user=user)
+        first_page = await crud.task.get_all(board_id=10, limit=10)
+
+        calls = [
+            ("get_user_by_username", lambda: get_user_by_username(db, "user2", type_="model")),
+            ("get_permission", lambda: crud.get_permission(2)),
+            ("BoardCRUD.get_all", lambda: crud.get_all(limit=10)),
+            ("BoardCRUD.get", lambda: crud.get(10)),
+            ("StatusCRUD.get_all", lambda: crud.status.get_all(board_id=10)),
+            ("TaskCRUD.get_all", lambda: crud.task.get_all(board_id=10, limit=10)),
+            ("TaskCRUD.get_all cursor", lambda: crud.task.get_all(board_id=10, limit=10, cursor=first_page.next_cursor)),
+            ("TaskCRUD.get", lambda: crud.task.get(board_id=10, task_id=10)),
+            ("CommentCRUD.get_all", lambda: crud.task.comment.get_all(board_id=10, task_id=10)),
+            ("BoardAccessCRUD.get_all", lambda: crud.access.get_all(board_id=10)),
+            ("SearchCRUD.search", lambda: crud.search.search(board_id=10, q="comment task")),
+            ("TagCRUD.get_all", lambda: crud.task.tag.get_all(board_id=10)),
+            ("TaskCRUD.get_by_tags all", lambda: crud.task.get_by_tags(board_id=10, labels=["tag0", "tag1"])),
+            ("TaskCRUD.get_by_tags any", lambda: crud.task.get_by_tags(board_id=10, labels=["tag0", "tag1"], match="any")),
+        ]
+        for name, call in calls:
+            current["name"] = name
+            await call()
+
+    await engine.dispose()
+    return [entry for entry in captured if entry[0] is not None]
+
+
+def explain(path: str, captured: list):
+    conn = sqlite3.connect(path)
+    conn.execute("ANALYZE")
+
+    for name, statement, parameters in captured:
+        print(f"-- {name}")
+        print(re.sub(r"\?(, \?){3,}", "?, ...", " ".join(statement.split())))
+        for _, parent, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters):
+            print(f"   {'  ' if parent else ''}{detail}")
+        print()
+
+    conn.close()
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), "explain.db")
+    url = f"sqlite:///{path}"
+    migrate(url)
+    seed(url)
+    explain(path, asyncio.run(capture(url)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Пиковая память при выгрузке большой доски: GET /boards/{id} против потокового экспорта.
+
+Для каждого размера доски создается БД через миграции alembic, затем каждый режим
+запускается в отдельном процессе. Пик берется из VmHWM: в отличие от ru_maxrss он
+не наследуется от родителя через exec. mmap SQLite в дочерних процессах выключен,
+иначе прочитанные страницы файла БД попадают в RSS. Кэш страниц SQLite остается:
+рост пика у экспорта упирается в его cache_size (64 МБ в production), с
+--cache-size -2000 остается только буфер самого потока.
+Приложение вызывается напрямую через ASGI, а тело ответа читается по частям и
+отбрасывается (httpx.ASGITransport буферизует ответ целиком и исказил бы замер).
+
+    python -m benchmarks.export_memory --sizes 10000,50000 --comments-per-task 2
+    python -m benchmarks.export_memory --sizes 150000 --mode export --cache-size -2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = {
+    "read_board": ("/boards/1", b""),
+    "export": ("/boards/1/export", b""),
+    "export_gzip": ("/boards/1/export", b"gzip=true"),
+}
+CHUNK = 50000
+
+
+def peak_rss_mb() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    raise RuntimeError("VmHWM is not available")
+
+
+def seed(url: str, tasks: int, comments_per_task: int):
+    from sqlalchemy import create_engine, insert
+
+    from migrations import migrate
+    from models import AttachmentModel, BoardModel, CommentModel, StatusModel, TagModel, TaskModel, TaskTagModel, UserModel
+
+    migrate(url)
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(insert(UserModel).values(username="bench", password="x"))
+        conn.execute(insert(BoardModel).values(user_id=1, title="bench"))
+        conn.execute(insert(StatusModel), [{"board_id": 1, "name": f"status{i}"} for i in range(5)])
+        conn.execute(insert(TagModel), [{"board_id": 1, "label": f"tag{i}"} for i in range(20)])
+
+    for offset in range(0, tasks, CHUNK):
+        ids = range(offset + 1, min(offset + CHUNK, tasks) + 1)
+        with engine.begin() as conn:
+            conn.execute(
+                insert(TaskModel),
+                [{"board_id": 1, "status_id": 1 + i % 5, "title": f"task {i}", "description": "x" * 200} for i in ids],
+            )
+            conn.execute(insert(TaskTagModel), [{"task_id": i, "tag_id": 1 + i % 20} for i in ids])
+            conn.execute(
+                insert(CommentModel),
+                [{"task_id": i, "user_id": 1, "content": f"comment {i}-{k} " + "y" * 100} for i in ids for k in range(comments_per_task)],
+            )
+            conn.execute(insert(AttachmentModel), [{"comment_id": i, "file_path": f"files/{i}.bin"} for i in ids[::10]])
+    engine.dispose()
+
+
+async def consume(app, path: str, query_string: bytes, token: str) -> dict:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string,
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("bench", 0),
+        "server": ("bench", 80),
+    }
+    requested, disconnected = [False], asyncio.Event()
+    stats = {"status": None, "bytes": 0, "chunks": 0, "first_byte": None}
+
+    async def receive():
+        if not requested[0]:
+            requested[0] = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            stats["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            if stats["first_byte"] is None:
+                stats["first_byte"] = time.perf_counter()
+            stats["bytes"] += len(message.get("body", b""))
+            stats["chunks"] += 1
+
+    await app(scope, receive, send)
+    disconnected.set()
+    return stats
+
+
+def child(mode: str) -> dict:
+    from app import app
+    from auth.helpers import create_access_token
+
+    token = create_access_token({"sub": "bench"})
+    path, query_string = MODES[mode]
+    baseline = peak_rss_mb()
+
+    started = time.perf_counter()
+    stats = asyncio.run(consume(app, path, query_string, token))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "status": stats["status"],
+        "response_mb": round(stats["bytes"] / 2**20, 1),
+        "chunks": stats["chunks"],
+        "first_byte_ms": round((stats["first_byte"] - started) * 1000, 1) if stats["first_byte"] else None,
+        "total_s": round(elapsed, 2),
+        "baseline_rss_mb": baseline,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_growth_mb": round(peak_rss_mb() - baseline, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,50000", help="число задач на доске, через запятую")
+    parser.add_argument("--comments-per-task", type=int, default=2)
+    parser.add_argument("--mode", action="append", choices=list(MODES))
+    parser.add_argument("--cache-size", help="PRAGMA cache_size для приложения, по умолчанию из профиля")
+    parser.add_argument("--child", choices=list(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child)))
+        return
+
+    results = []
+    for tasks in map(int, args.sizes.split(",")):
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+        seed(url, tasks, args.comments_per_task)
+
+        for mode in args.mode or MODES:
+            env = dict(os.environ, DATABASE_URL=url, DB_SQLITE_MMAP_SIZE="0")
+            if args.cache_size:
+                env["DB_SQLITE_CACHE_SIZE"] = args.cache_size
+            command = [sys.executable, "-m", "benchmarks.export_memory", "--child", mode]
+            output = subprocess.run(command, cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+            results.append({"tasks": tasks, "comments": tasks * args.comments_per_task, **json.loads(output.strip().splitlines()[-1])})
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,550 @@
+"""
+Нагрузочный прогон всех маршрутов routes.py и auth/routes.py: приложение вызывается in-process через ASGI.
+
+Во временную БД засеваются данные заданной формы (пользователи, доски на пользователя,
+статусы, задачи и теги на доску, комментарии на задачу), затем --requests запросов
+смешанной нагрузки выполняются --concurrency воркерами. Доля пишущих запросов - --write-ratio,
+каждый маршрут попадает в план хотя бы раз. План строится из --seed, поэтому два прогона
+с одинаковыми флагами выполняют одни и те же запросы.
+
+Для маршрута и для прогона целиком считаются p50/p95/p99, запросы в секунду и запросы
+к БД на запрос (только выполненные самим запросом, фоновая запись журнала не входит).
+Задержки и запросы к БД считаются только по ответам 2xx; остальные идут в errors, маршруты
+с ними перечисляются в failed_routes, и прогон завершается с кодом 1 (если не задан --allow-errors).
+Результат - JSON; с --baseline к нему добавляется сравнение с прошлым прогоном.
+Ленты /boards/{board_id}/events не завершаются сами и меряются в benchmarks.board_events.
+
+    python -m benchmarks.load --requests 5000 --concurrency 20 --output after.json --baseline before.json
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = "password"
+ATTACHMENT_BODY = b"x" * 4096
+# Маршруты, которые этот прогон не вызывает
+SKIPPED_ROUTES = {("GET", "/boards/{board_id}/events"), ("WEBSOCKET", "/boards/{board_id}/events")}
+
+# Счетчик запросов к БД текущего HTTP-запроса: контекст наследуют задачи и greenlet'ы SQLAlchemy
+statements: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("statements", default=None)
+
+
+class Shape(NamedTuple):
+    users: int
+    boards: int
+    statuses: int
+    tasks: int
+    comments: int
+    tags: int
+    task_tags: int
+
+
+class Call(NamedTuple):
+    route: str
+    user: int
+    method: str
+    url: str
+    options: dict
+
+
+class Plan:
+    """
+    Идентификаторы засеянных строк вычисляются из формы данных, а строки, которые
+    расходуют удаляющие маршруты, выделяются при построении плана и засеваются вместе с остальными.
+    """
+
+    def __init__(self, shape: Shape, seed: int):
+        self.shape = shape
+        self.rng = random.Random(seed)
+        self.spare: Dict[str, list] = {
+            "user": [], "board": [], "status": [], "task": [], "tag": [], "task_tag": [], "access": [], "attachment": [],
+        }
+
+    @property
+    def board_count(self) -> int:
+        return self.shape.users * self.shape.boards
+
+    def owner(self, board_id: int) -> int:
+        return (board_id - 1) // self.shape.boards + 1
+
+    def status(self, board_id: int, index: int) -> int:
+        return (board_id - 1) * self.shape.statuses + index + 1
+
+    def task(self, board_id: int, index: int) -> int:
+        return (board_id - 1) * self.shape.tasks + index + 1
+
+    def comment(self, task_id: int, index: int) -> int:
+        return (task_id - 1) * self.shape.comments + index + 1
+
+    def tag(self, board_id: int, index: int) -> int:
+        return (board_id - 1) * self.shape.tags + index + 1
+
+    def task_tag_indexes(self, task_index: int) -> List[int]:
+        return sorted({(task_index + k) % self.shape.tags for k in range(self.shape.task_tags)})
+
+    def random_task(self, board_id: int) -> int:
+        return self.task(board_id, self.rng.randrange(self.shape.tasks))
+
+    def allocate(self, kind: str, offset: int, row: dict) -> int:
+        rows = self.spare[kind]
+        rows.append(row)
+        return offset + len(rows)
+
+    def spare_board(self, user: int) -> int:
+        return self.allocate("board", self.board_count, {"user_id": user})
+
+    def spare_status(self, board_id: int) -> int:
+        return self.allocate("status", self.board_count * self.shape.statuses, {"board_id": board_id})
+
+    def spare_task(self, board_id: int) -> int:
+        return self.allocate("task", self.board_count * self.shape.tasks, {"board_id": board_id})
+
+    def spare_tag(self, board_id: int, task_id: Optional[int] = None) -> int:
+        tag_id = self.allocate("tag", self.board_count * self.shape.tags, {"board_id": board_id})
+        if task_id is not None:
+            self.spare["task_tag"].append({"task_id": task_id, "tag_id": tag_id})
+        return tag_id
+
+    def spare_user(self) -> int:
+        return self.allocate("user", self.shape.users, {})
+
+    def spare_access(self, board_id: int) -> int:
+        # Доступ к доске есть у следующего пользователя, запасной выдается еще одному
+        return self.allocate("access", self.board_count, {"board_id": board_id})
+
+    def spare_attachment(self, board_id: int) -> int:
+        # Вложения загружаются через API: сначала по одному на доску, затем запасные
+        return self.allocate("attachment", self.board_count, {"board_id": board_id})
+
+
+class Route(NamedTuple):
+    name: str
+    method: str
+    path: str
+    write: bool
+    weight: float
+    # (план, владелец, доска, номер запроса) -> (путь, параметры httpx)
+    build: Callable
+
+
+def tasks_path(board_id: int, task_id: int) -> str:
+    return f"/boards/{board_id}/tasks/{task_id}"
+
+
+def first_attachment_path(plan: Plan, board_id: int) -> str:
+    task_id = plan.task(board_id, 0)
+    return f"{tasks_path(board_id, task_id)}/comments/{plan.comment(task_id, 0)}/attachments/"
+
+
+def linked_tag_path(plan: Plan, board_id: int) -> str:
+    task_id = plan.random_task(board_id)
+    return f"{tasks_path(board_id, task_id)}/tags/{plan.spare_tag(board_id, task_id)}"
+
+
+def shared_board(plan: Plan, board_id: int) -> int:
+    # Доска, доступ к которой владелец board_id получил от предыдущего пользователя
+    return (board_id - 1 - plan.shape.boards) % plan.board_count + 1
+
+
+ROUTES = [
+    # auth/routes.py
+    Route("login", "POST", "/token", False, 0.1, lambda p, u, b, i: (
+        "/token", {"data": {"username": f"user{u}", "password": PASSWORD}})),
+    Route("read_users_me", "GET", "/users/me", False, 1, lambda p, u, b, i: ("/users/me", {})),
+    Route("register_user", "POST", "/register", True, 0.1, lambda p, u, b, i: (
+        "/register", {"json": {"username": f"new{i}", "password": PASSWORD}})),
+    # routes.py
+    Route("create_board_access", "POST", "/boards/{board_id}/accesses/", True, 1, lambda p, u, b, i: (
+        f"/boards/{b}/accesses/", {"json": {"user_id": p.spare_user()}})),
+    Route("read_board_accesses", "GET", "/boards/{board_id}/accesses/", False, 1, lambda p, u, b, i: (
+        f"/boards/{b}/accesses/", {})),
+    Route("delete_board_access", "DELETE", "/boards/{board_id}/accesses/", True, 1, lambda p, u, b, i: (
+        f"/boards/{b}/accesses/", {"params": {"access_id": p.spare_access(b)}})),
+    Route("create_board", "POST", "/boards/", True, 1, lambda p, u, b, i: (
+        "/boards/", {"json": {"user_id": u, "title": f"board {i}"}})),
+    Route("read_boards", "GET", "/boards/", False, 1, lambda p, u, b, i: ("/boards/", {})),
+    Route("read_board", "GET", "/boards/{board_id}", False, 1, lambda p, u, b, i: (f"/boards/{b}", {})),
+    Route("read_board_shared", "GET", "/boards/{board_id}", False, 1, lambda p, u, b, i: (
+        f"/boards/{shared_board(p, b)}", {})),
+    Route("export_board", "GET", "/boards/{board_id}/export", False, 0.2, lambda p, u, b, i: (
+        f"/boards/{b}/export", {})),
+    Route("import_board", "POST", "/boards/{board_id}/import", True, 0.2, lambda p, u, b, i: (
+        f"/boards/{b}/import", {
+            "params": {"format": "csv"},
+            "content": "title,status,tags\n" + "".join(f"import {i}-{k},status0,tag0\n" for k in range(20)),
+        })),
+    Route("delete_board", "DELETE", "/boards/{board_id}", True, 0.5, lambda p, u, b, i: (
+        f"/boards/{p.spare_board(u)}", {})),
+    Route("update_board", "PUT", "/boards/{board_id}", True, 1, lambda p, u, b, i: (
+        f"/boards/{b}", {"json": {"user_id": u, "title": f"board {i}"}})),
+    Route("create_status", "POST", "/boards/{board_id}/statuses/", True, 0.5, lambda p, u, b, i: (
+        f"/boards/{b}/statuses/", {"json": {"name": f"status {i}"}})),
+    Route("read_statuses", "GET", "/boards/{board_id}/statuses/", False, 1, lambda p, u, b, i: (
+        f"/boards/{b}/statuses/", {})),
+    Route("read_status", "GET", "/boards/{board_id}/statuses/{status_id}", False, 1, lambda p, u, b, i: (
+        f"/boards/{b}/statuses/{p.status(b, p.rng.randrange(p.shape.statuses))}", {})),
+    Route("delete_status_by_id", "DELETE", "/boards/{board_id}/statuses/{status_id}", True, 0.5, lambda p, u, b, i: (
+        f"/boards/{b}/statuses/{p.spare_status(b)}", {})),
+    Route("update_status", "PUT", "/boards/{board_id}/statuses/{status_id}", True, 0.5, lambda p, u, b, i: (
+        f"/boards/{b}/statuses/{p.status(b, 0)}", {"json": {"name": "status0"}})),
+    Route("create_task", "POST", "/boards/{board_id}/tasks/", True, 2, lambda p, u, b, i: (
+        f"/boards/{b}/tasks/", {"json": {"title": f"task {i}", "status_id": p.status(b, 0)}})),
+    Route("create_tasks_bulk", "POST", "/boards/{board_id}/tasks/bulk", True, 0.5, lambda p, u, b, i: (
+        f"/boards/{b}/tasks/bulk", {"json": [{"title": f"bulk {i}-{k}", "status_id": p.status(b, 0)} for k in range(10)]})),
+    Route("update_tasks_batch", "PATCH", "/boards/{board_id}/tasks/batch", True, 0.5, lambda p, u, b, i: (
+        f"/boards/{b}/tasks/batch", {"json": [{"task_id": p.random_task(b), "title": f"batch {i}"} for _ in range(10)]})),
+    Route("read_tasks", "GET", "/boards/{board_id}/tasks/", False, 3, lambda p, u, b, i: (
+        f"/boards/{b}/tasks/", {"params": {"limit": 50}})),
+    Route("read_tasks_fields", "GET", "/boards/{board_id}/tasks/", False, 1, lambda p, u, b, i: (
+        f"/boards/{b}/tasks/", {"params": {"limit": 50, "fields": "task_id,title,status_id"}})),
+    Route("read_task", "GET", "/boards/{board_id}/tasks/{task_id}", False, 2, lambda p, u, b, i: (
+        tasks_path(b, p.random_task(b)), {})),
+    Route("delete_task", "DELETE", "/boards/{board_id}/tasks/{task_id}", True, 0.5, lambda p, u, b, i: (
+        tasks_path(b, p.spare_task(b)), {})),
+    Route("update_task", "PUT", "/boards/{board_id}/tasks/{task_id}", True, 2, lambda p, u, b, i: (
+        tasks_path(b, p.random_task(b)), {"json": {"title": f"task {i}"}})),
+    Route("create_comment", "POST", "/boards/{board_id}/tasks/{task_id}/comments/", True, 2, lambda p, u, b, i: (
+        f"{tasks_path(b, p.random_task(b))}/comments/", {"json": {"content": f"comment {i}"}})),
+    Route("read_comments", "GET", "/boards/{board_id}/tasks/{task_id}/comments/", False, 2, lambda p, u, b, i: (
+        f"{tasks_path(b, p.random_task(b))}/comments/", {})),
+    Route(
+        "upload_attachment", "POST", "/boards/{board_id}/tasks/{task_id}/comments/{comment_id}/attachments/",
+        True, 0.2, lambda p, u, b, i: (first_attachment_path(p, b), {
+            "params": {"filename": f"file{i}.txt"},
+            "content": ATTACHMENT_BODY + str(i).encode(),
+        }),
+    ),
+    Route(
+        "read_attachments", "GET", "/boards/{board_id}/tasks/{task_id}/comments/{comment_id}/attachments/",
+        False, 1, lambda p, u, b, i: (first_attachment_path(p, b), {}),
+    ),
+    Route(
+        "download_attachment", "GET",
+        "/boards/{board_id}/tasks/{task_id}/comments/{comment_id}/attachments/{attachment_id}",
+        False, 1, lambda p, u, b, i: (f"{first_attachment_path(p, b)}{b}", {}),
+    ),
+    Route(
+        "delete_attachment", "DELETE",
+        "/boards/{board_id}/tasks/{task_id}/comments/{comment_id}/attachments/{attachment_id}",
+        True, 0.2, lambda p, u, b, i: (f"{first_attachment_path(p, b)}{p.spare_attachment(b)}", {}),
+    ),
+    Route("add_task_tag", "POST", "/boards/{board_id}/tasks/{task_id}/tags/", True, 1, lambda p, u, b, i: (
+        f"{tasks_path(b, p.random_task(b))}/tags/", {"json": {"label": f"tag{p.rng.randrange(p.shape.tags)}"}})),
+    Route("remove_task_tag", "DELETE", "/boards/{board_id}/tasks/{task_id}/tags/{tag_id}", True, 0.5, lambda p, u, b, i: (
+        linked_tag_path(p, b), {})),
+    Route("create_tag", "POST", "/boards/{board_id}/tags/", True, 0.5, lambda p, u, b, i: (
+        f"/boards/{b}/tags/", {"json": {"label": f"new{i}"}})),
+    Route("read_tags", "GET", "/boards/{board_id}/tags/", False, 1, lambda p, u, b, i: (f"/boards/{b}/tags/", {})),
+    Route("read_tasks_by_tags", "GET", "/boards/{board_id}/tags/tasks", False, 1, lambda p, u, b, i: (
+        f"/boards/{b}/tags/tasks", {"params": {"tag": ["tag0", "tag1"], "match": "any", "limit": 50}})),
+    Route("delete_tag", "DELETE", "/boards/{board_id}/tags/{tag_id}", True, 0.5, lambda p, u, b, i: (
+        f"/boards/{b}/tags/{p.spare_tag(b)}", {})),
+    Route("search_board", "GET", "/boards/{board_id}/search", False, 1, lambda p, u, b, i: (
+        f"/boards/{b}/search", {"params": {"q": f"task {p.rng.randrange(p.shape.tasks)}"}})),
+    Route("read_metrics", "GET", "/metrics", False, 0.1, lambda p, u, b, i: ("/metrics", {})),
+]
+
+
+def uncovered_routes(app) -> List[str]:
+    """Маршруты приложения, которых нет ни в ROUTES, ни в SKIPPED_ROUTES: прогон должен покрывать все"""
+    from fastapi.routing import APIRoute, APIWebSocketRoute
+
+    covered = {(route.method, route.path) for route in ROUTES} | SKIPPED_ROUTES
+    missing = []
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            methods = route.methods
+        elif isinstance(route, APIWebSocketRoute):
+            methods = {"WEBSOCKET"}
+        else:
+            continue
+        missing += [f"{method} {route.path}" for method in sorted(methods) if (method, route.path) not in covered]
+    return missing
+
+
+def build_plan(shape: Shape, requests: int, write_ratio: float, seed: int) -> tuple:
+    plan = Plan(shape, seed)
+    routes = []
+    for write, count in ((False, requests - round(requests * write_ratio)), (True, round(requests * write_ratio))):
+        group = [route for route in ROUTES if route.write == write]
+        total = sum(route.weight for route in group)
+        if count:
+            routes += [route for route in group for _ in range(max(1, round(count * route.weight / total)))]
+    plan.rng.shuffle(routes)
+
+    calls = []
+    for i, route in enumerate(routes):
+        user = plan.rng.randrange(shape.users) + 1
+        board_id = (user - 1) * shape.boards + plan.rng.randrange(shape.boards) + 1
+        url, options = route.build(plan, user, board_id, i)
+        calls.append(Call(route.name, user, route.method, url, options))
+    return plan, calls
+
+
+def seed(url: str, plan: Plan):
+    from sqlalchemy import create_engine, insert
+
+    from auth.config import pwd_context
+    from migrations import migrate
+    from models import BoardAccessModel, BoardModel, CommentModel, StatusModel, TagModel, TaskModel, TaskTagModel, UserModel
+
+    shape, spare = plan.shape, plan.spare
+    boards = range(1, plan.board_count + 1)
+    password = pwd_context.hash(PASSWORD)
+
+    migrate(url)
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        users = shape.users + len(spare["user"])
+        conn.execute(insert(UserModel), [{"user_id": u, "username": f"user{u}", "password": password} for u in range(1, users + 1)])
+        conn.execute(insert(BoardModel), [
+            {"board_id": b, "user_id": plan.owner(b), "title": f"board {b}", "description": f"board {b} of user{plan.owner(b)}"}
+            for b in boards
+        ] + [
+            {"board_id": plan.board_count + n, "user_id": row["user_id"], "title": "spare", "description": None} for n, row in enumerate(spare["board"], 1)
+        ])
+        conn.execute(insert(StatusModel), [
+            {"status_id": plan.status(b, s), "board_id": b, "name": f"status{s}"} for b in boards for s in range(shape.statuses)
+        ] + [
+            {"status_id": plan.board_count * shape.statuses + n, "board_id": row["board_id"], "name": "spare"}
+            for n, row in enumerate(spare["status"], 1)
+        ])
+        conn.execute(insert(TaskModel), [
+            {
+                "task_id": plan.task(b, t),
+                "board_id": b,
+                "status_id": plan.status(b, t % shape.statuses),
+                "title": f"task {t}",
+                "description": f"task {t} of board {b}",
+            }
+            for b in boards for t in range(shape.tasks)
+        ] + [
+            {"task_id": plan.board_count * shape.tasks + n, "board_id": row["board_id"], "status_id": plan.status(row["board_id"], 0), "title": "spare", "description": None}
+            for n, row in enumerate(spare["task"], 1)
+        ])
+        conn.execute(insert(CommentModel), [
+            {"comment_id": plan.comment(task_id, c), "task_id": task_id, "user_id": plan.owner(b), "content": f"comment {c} on task {task_id}"}
+            for b in boards for task_id in (plan.task(b, t) for t in range(shape.tasks)) for c in range(shape.comments)
+        ])
+        conn.execute(insert(TagModel), [
+            {"tag_id": plan.tag(b, g), "board_id": b, "label": f"tag{g}"} for b in boards for g in range(shape.tags)
+        ] + [
+            {"tag_id": plan.board_count * shape.tags + n, "board_id": row["board_id"], "label": f"spare{n}"}
+            for n, row in enumerate(spare["tag"], 1)
+        ])
+        conn.execute(insert(TaskTagModel), [
+            {"task_id": plan.task(b, t), "tag_id": plan.tag(b, g)}
+            for b in boards for t in range(shape.tasks) for g in plan.task_tag_indexes(t)
+        ] + spare["task_tag"])
+        # Каждая доска открыта следующему пользователю, запасные доступы - отдельным пользователям
+        accesses = [{"access_id": b, "board_id": b, "user_id": plan.owner(b) % shape.users + 1} for b in boards if shape.users > 1]
+        conn.execute(insert(UserModel), [
+            {"user_id": users + n, "username": f"user{users + n}", "password": password} for n in range(1, len(spare["access"]) + 1)
+        ])
+        conn.execute(insert(BoardAccessModel), accesses + [
+            {"access_id": plan.board_count + n, "board_id": row["board_id"], "user_id": users + n}
+            for n, row in enumerate(spare["access"], 1)
+        ])
+    engine.dispose()
+
+
+async def upload_attachments(client, plan: Plan, tokens: Dict[int, dict]):
+    # По одному вложению на доску (id = board_id), затем запасные для delete_attachment
+    boards = list(range(1, plan.board_count + 1)) + [row["board_id"] for row in plan.spare["attachment"]]
+    for n, board_id in enumerate(boards, 1):
+        response = await client.post(
+            first_attachment_path(plan, board_id),
+            params={"filename": f"seed{n}.txt"},
+            content=ATTACHMENT_BODY,
+            headers=tokens[plan.owner(board_id)],
+        )
+        if response.status_code != 200 or response.json()["attachment_id"] != n:
+            raise RuntimeError(f"Attachment seeding failed: {response.status_code} {response.text}")
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 3)
+
+
+def succeeded(status_code: int) -> bool:
+    return 200 <= status_code < 300
+
+
+def summary(latencies: list, queries: list, statuses: dict, elapsed: float) -> dict:
+    """latencies и queries - только успешных ответов: путь ошибки не должен попадать в задержки"""
+    latencies = sorted(latencies)
+    requests = sum(statuses.values())
+    return {
+        "requests": requests,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "errors": sum(count for code, count in statuses.items() if not succeeded(code)),
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else None,
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+async def run(plan: Plan, calls: List[Call], concurrency: int) -> dict:
+    import httpx
+    from sqlalchemy import event
+
+    from app import app
+    from audit import audit_log
+    from auth.helpers import create_access_token
+    from db import async_engine
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        counter = statements.get()
+        if counter is not None:
+            counter[0] += 1
+
+    users = plan.shape.users + len(plan.spare["user"])
+    tokens = {u: {"Authorization": f"Bearer {create_access_token({'sub': f'user{u}'})}"} for u in range(1, users + 1)}
+    routes = {route.name: route for route in ROUTES}
+    samples: Dict[str, list] = {route.name: [] for route in ROUTES}
+
+    # Журнал действий пишется фоном, как под lifespan приложения
+    audit_log.start()
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await upload_attachments(client, plan, tokens)
+        # Прогрев: кэш токенов и пул соединений
+        for u in range(1, plan.shape.users + 1):
+            await client.get("/users/me", headers=tokens[u])
+
+        pending = iter(calls)
+
+        async def worker():
+            for call in pending:
+                counter = [0]
+                statements.set(counter)
+                started = time.perf_counter()
+                response = await client.request(call.method, call.url, headers=tokens[call.user], **call.options)
+                samples[call.route].append((time.perf_counter() - started, counter[0], response.status_code))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    await audit_log.stop()
+
+    def stats(rows: list) -> dict:
+        statuses = {}
+        for _, _, code in rows:
+            statuses[code] = statuses.get(code, 0) + 1
+        ok = [row for row in rows if succeeded(row[2])]
+        return summary([row[0] for row in ok], [row[1] for row in ok], statuses, elapsed)
+
+    return {
+        "total": {**stats([row for rows in samples.values() for row in rows]), "elapsed_s": round(elapsed, 3)},
+        "routes": {
+            name: {"method": routes[name].method, "path": routes[name].path, "write": routes[name].write, **stats(rows)}
+            for name, rows in samples.items() if rows
+        },
+    }
+
+
+def ratio(current, baseline):
+    if current is None or not baseline:
+        return None
+    return round(current / baseline, 3)
+
+
+def compare(result: dict, baseline: dict) -> dict:
+    """Отношение новое/старое для задержек и rps, разница - для запросов к БД"""
+    def diff(current: dict, previous: dict) -> dict:
+        delta = {f"{key}_ratio": ratio(current[key], previous.get(key)) for key in ("p50_ms", "p95_ms", "p99_ms", "rps")}
+        if current["queries_per_request"] is not None and previous.get("queries_per_request") is not None:
+            delta["queries_delta"] = round(current["queries_per_request"] - previous["queries_per_request"], 2)
+        return delta
+
+    return {
+        "total": diff(result["total"], baseline["total"]),
+        "routes": {
+            name: diff(stats, baseline["routes"][name])
+            for name, stats in result["routes"].items() if name in baseline["routes"]
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--boards", type=int, default=3, help="досок на пользователя")
+    parser.add_argument("--statuses", type=int, default=5, help="статусов на доску")
+    parser.add_argument("--tasks", type=int, default=200, help="задач на доску")
+    parser.add_argument("--comments", type=int, default=3, help="комментариев на задачу")
+    parser.add_argument("--tags", type=int, default=10, help="тегов на доску")
+    parser.add_argument("--task-tags", type=int, default=2, help="тегов на задачу")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="файл для JSON результата")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--allow-errors", action="store_true", help="не завершаться с кодом 1 при ответах не 2xx")
+    args = parser.parse_args()
+
+    shape = Shape(args.users, args.boards, args.statuses, args.tasks, args.comments, args.tags, args.task_tags)
+    if min(shape) < 1:
+        parser.error("every data shape option must be at least 1")
+    if not 0 <= args.write_ratio <= 1:
+        parser.error("--write-ratio must be between 0 and 1")
+
+    directory = tempfile.mkdtemp()
+    url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    os.environ["DATABASE_URL"] = url
+    os.environ["ATTACHMENTS_DIR"] = os.path.join(directory, "attachments")
+
+    from app import app
+
+    missing = uncovered_routes(app)
+    if missing:
+        print(f"Routes without a benchmark scenario: {', '.join(missing)}", file=sys.stderr)
+
+    plan, calls = build_plan(shape, args.requests, args.write_ratio, args.seed)
+    seed(url, plan)
+
+    result = {
+        "config": {**shape._asdict(), **{key: getattr(args, key) for key in ("requests", "write_ratio", "concurrency", "seed")}},
+        **asyncio.run(run(plan, calls, args.concurrency)),
+        "uncovered": missing,
+    }
+    result["failed_routes"] = {
+        name: {code: count for code, count in stats["statuses"].items() if not succeeded(int(code))}
+        for name, stats in result["routes"].items() if stats["errors"]
+    }
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            result["comparison"] = compare(result, json.load(baseline))
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+
+    if result["failed_routes"]:
+        failed = ", ".join(f"{name} {statuses}" for name, statuses in result["failed_routes"].items())
+        print(f"Routes with non-2xx responses: {failed}", file=sys.stderr)
+        if not args.allow_errors:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Шторм логинов: N одновременных POST /token и параллельный зонд GET /users/me.
+
+Для каждого режима PASSWORD_HASH_EXECUTOR приложение поднимается в отдельном
+процессе (настройки читаются при импорте) и гоняется in-process через ASGI.
+Латентность зонда показывает, насколько bcrypt мешает остальным эндпоинтам.
+
+    python -m benchmarks.login_storm --logins 200 --rounds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = ("inline", "thread", "process")
+PROBE_INTERVAL = 0.005
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 3)
+
+
+async def storm(args) -> dict:
+    import httpx
+
+    from app import app
+    from auth.config import pwd_context
+    from auth.hashing import password_hasher
+    from auth.helpers import create_access_token
+    from db import SessionLocal, engine
+    from models import Base, UserModel
+
+    Base.metadata.create_all(engine)
+    hashed = pwd_context.hash("password")
+    with SessionLocal() as db:
+        db.add_all(UserModel(username=f"user{i}", password=hashed) for i in range(args.users))
+        db.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'user0'})}"}
+    login_latencies, probe_latencies, rejected = [], [], [0]
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.get("/users/me", headers=headers)
+
+        async def login(i: int):
+            started = time.perf_counter()
+            response = await client.post("/token", data={"username": f"user{i % args.users}", "password": "password"})
+            if response.status_code == 503:
+                rejected[0] += 1
+            else:
+                login_latencies.append(time.perf_counter() - started)
+
+        async def probe():
+            # Время сна входит в замер: при заблокированном event loop зонд просыпается поздно
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(PROBE_INTERVAL)
+                await client.get("/users/me", headers=headers)
+                probe_latencies.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+        prober = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+    password_hasher.shutdown()
+
+    return {
+        "executor": os.environ["PASSWORD_HASH_EXECUTOR"],
+        "rounds": args.rounds,
+        "logins": args.logins,
+        "rejected_503": rejected[0],
+        "logins_per_sec": round(len(login_latencies) / elapsed, 1),
+        "login_p50_ms": percentile(login_latencies, 0.5),
+        "login_p99_ms": percentile(login_latencies, 0.99),
+        "probe_requests": len(probe_latencies),
+        "probe_p50_ms": percentile(probe_latencies, 0.5),
+        "probe_p99_ms": percentile(probe_latencies, 0.99),
+        "probe_max_ms": percentile(probe_latencies, 1.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--executor", action="append", choices=MODES)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(storm(args))))
+        return
+
+    results = []
+    for executor in args.executor or MODES:
+        env = dict(
+            os.environ,
+            PASSWORD_HASH_EXECUTOR=executor,
+            BCRYPT_ROUNDS=str(args.rounds),
+            PASSWORD_HASH_QUEUE_SIZE=str(args.logins),
+            DATABASE_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        )
+        command = [sys.executable, "-m", "benchmarks.login_storm", "--child"]
+        command += ["--logins", str(args.logins), "--users", str(args.users), "--rounds", str(args.rounds)]
+        output = subprocess.run(command, cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
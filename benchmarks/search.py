@@ -0,0 +1,168 @@
+"""
+Полнотекстовый поиск по доске (FTS5) на большом корпусе.
+
+Создает временную БД через миграции alembic и наполняет ее задачами и
+комментариями из синтетического словаря с распределением Ципфа. Вставка идет
+через триггеры индекса, поэтому ее скорость показывает цену поддержки индекса.
+Затем SearchCRUD.search выполняется для частых, редких, составных и
+префиксных запросов, для сравнения - тот же поиск через LIKE.
+
+    python -m benchmarks.search --tasks 1000000 --boards 1000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, create_engine, insert, select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from auth.helpers import get_user_by_username  # noqa: E402
+from migrations import migrate  # noqa: E402
+from crud import BoardCRUD  # noqa: E402
+from db import SQLITE_PROFILES, engine_options, set_sqlite_pragmas  # noqa: E402
+from models import BoardModel, CommentModel, StatusModel, TaskModel, UserModel  # noqa: E402
+
+CHUNK = 50000
+VOCABULARY = 20000
+
+
+def percentile(values: list, q: float):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 3)
+
+
+def words(rng: random.Random) -> list:
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    return sorted({"".join(rng.choices(alphabet, k=rng.randint(4, 10))) for _ in range(VOCABULARY)})
+
+
+def seed(url: str, args, vocabulary: list, rng: random.Random) -> dict:
+    engine = create_engine(url, **engine_options(url))
+    set_sqlite_pragmas(engine, SQLITE_PROFILES["production"])
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+    def sentence(length: int) -> str:
+        return " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=length))
+
+    with engine.begin() as conn:
+        conn.execute(insert(UserModel).values(username="bench", password="x"))
+        conn.execute(insert(BoardModel), [{"user_id": 1, "title": f"board{i}"} for i in range(args.boards)])
+        conn.execute(insert(StatusModel), [{"board_id": 1 + i, "name": "todo"} for i in range(args.boards)])
+
+    started = time.perf_counter()
+    for offset in range(0, args.tasks, CHUNK):
+        rows = [
+            {"board_id": 1 + i % args.boards, "status_id": 1 + i % args.boards, "title": sentence(4), "description": sentence(20)}
+            for i in range(offset, min(offset + CHUNK, args.tasks))
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(TaskModel), rows)
+
+    comments = int(args.tasks * args.comments_per_task)
+    for offset in range(0, comments, CHUNK):
+        rows = [
+            {"task_id": 1 + rng.randrange(args.tasks), "user_id": 1, "content": sentence(15)}
+            for _ in range(offset, min(offset + CHUNK, comments))
+        ]
+        with engine.begin() as conn:
+            conn.execute(insert(CommentModel), rows)
+    elapsed = time.perf_counter() - started
+
+    with engine.connect() as conn:
+        page_size = conn.execute(text("PRAGMA page_size")).scalar()
+        pages = conn.execute(text("SELECT count(*) FROM dbstat WHERE name LIKE 'search_index%'")).scalar()
+    engine.dispose()
+
+    return {
+        "tasks": args.tasks,
+        "comments": comments,
+        "boards": args.boards,
+        "insert_rows_per_sec": round((args.tasks + comments) / elapsed, 1),
+        "index_mb": round(pages * page_size / 2**20, 1),
+    }
+
+
+async def measure(url: str, args, vocabulary: list, rng: random.Random) -> list:
+    engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+    set_sqlite_pragmas(engine.sync_engine, SQLITE_PROFILES["production"])
+    sessions = async_sessionmaker(bind=engine, expire_on_commit=False)
+    async with sessions() as db:
+        user = await get_user_by_username(db, "bench", type_="model")
+
+    # Частое слово - голова распределения, редкое - хвост
+    kinds = {
+        "frequent": lambda: vocabulary[rng.randrange(5)],
+        "rare": lambda: vocabulary[rng.randrange(len(vocabulary) // 2, len(vocabulary))],
+        "two_terms": lambda: f"{vocabulary[rng.randrange(50)]} {vocabulary[rng.randrange(50, 500)]}",
+        "prefix": lambda: vocabulary[rng.randrange(50)][:3],
+    }
+
+    async def fts(db, board_id: int, q: str):
+        return await BoardCRUD(db=db, current_user=user).search.search(board_id=board_id, q=q, limit=20)
+
+    async def like(db, board_id: int, q: str):
+        crud = BoardCRUD(db=db, current_user=user)
+        await crud.check_access(board_id)
+        conditions = [TaskModel.title.contains(term) | TaskModel.description.contains(term) for term in q.split()]
+        return (
+            await db.execute(
+                select(TaskModel.task_id)
+                .where(TaskModel.board_id == board_id, and_(*conditions))
+                .order_by(TaskModel.task_id)
+                .limit(20)
+            )
+        ).all()
+
+    results = []
+    for kind, make_query in kinds.items():
+        for method, search in (("fts", fts), ("like", like)):
+            latencies, hits = [], 0
+            for _ in range(args.queries):
+                board_id, q = 1 + rng.randrange(args.boards), make_query()
+                async with sessions() as db:
+                    started = time.perf_counter()
+                    hits += len(await search(db, board_id, q))
+                    latencies.append(time.perf_counter() - started)
+
+            results.append(
+                {
+                    "query": kind,
+                    "method": method,
+                    "avg_hits": round(hits / args.queries, 1),
+                    "p50_ms": percentile(latencies, 0.5),
+                    "p99_ms": percentile(latencies, 0.99),
+                }
+            )
+
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--comments-per-task", type=float, default=0.5)
+    parser.add_argument("--boards", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = words(rng)
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search.db')}"
+    migrate(url)
+
+    corpus = seed(url, args, vocabulary, rng)
+    print(json.dumps({"corpus": corpus, "queries": asyncio.run(measure(url, args, vocabulary, rng))}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Конкурентная запись в SQLite при разных профилях PRAGMA из db.SQLITE_PROFILES.
+
+Каждый поток пишет задачи короткими транзакциями (одна вставка - один commit,
+как в CRUD) и параллельно читает список задач доски. Для каждого профиля
+печатаются пропускная способность, латентность коммита и число ошибок
+"database is locked".
+
+    python -m benchmarks.sqlite_profiles --writers 8 --writes 200
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from db import SQLITE_PROFILES, engine_options, set_sqlite_pragmas  # noqa: E402
+from models import Base, BoardModel, TaskModel, UserModel  # noqa: E402
+
+
+def run(profile: str, writers: int, writes: int) -> dict:
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = create_engine(url, **engine_options(url))
+    set_sqlite_pragmas(engine, SQLITE_PROFILES[profile])
+    Base.metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        conn.execute(insert(UserModel).values(username="bench", password="x"))
+        conn.execute(insert(BoardModel).values(user_id=1, title="bench"))
+
+    latencies, locked, lock = [], [0], threading.Lock()
+
+    def writer(n: int):
+        for i in range(writes):
+            started = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(TaskModel).values(board_id=1, title=f"task {n}-{i}"))
+            except OperationalError:
+                with lock:
+                    locked[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+            try:
+                with engine.connect() as conn:
+                    conn.execute(select(TaskModel.task_id).where(TaskModel.board_id == 1).limit(20)).all()
+            except OperationalError:
+                with lock:
+                    locked[0] += 1
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    latencies.sort()
+    return {
+        "profile": profile,
+        "writers": writers,
+        "committed": len(latencies),
+        "locked_errors": locked[0],
+        "writes_per_sec": round(len(latencies) / elapsed, 1),
+        "commit_p50_ms": round(latencies[len(latencies) // 2] * 1000, 3) if latencies else None,
+        "commit_p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 3) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--profile", action="append", choices=sorted(SQLITE_PROFILES))
+    args = parser.parse_args()
+
+    results = [run(profile, args.writers, args.writes) for profile in args.profile or sorted(SQLITE_PROFILES)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Цена записи по эндпоинтам: commit и обращения к БД на один запрос.
+
+Для каждого пишущего эндпоинта из routes.py и auth/routes.py выполняется --repeat
+запросов, и на запрос считаются:
+- commits - commit соединения (DBAPI);
+- write_commits - commit транзакций, в которых была запись: только они платят за fsync;
+- statements - запросы к БД (round trip для каждого execute);
+- p50_ms - задержка запроса.
+Журнал действий пишется фоном с большим интервалом, чтобы его пачки не попали в замер.
+
+    python -m benchmarks.write_path --repeat 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class Counters:
+    def __init__(self):
+        self.commits = 0
+        self.write_commits = 0
+        self.statements = 0
+
+    def listen(self, engine):
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            self.statements += 1
+            if not statement.lstrip().upper().startswith(("SELECT", "PRAGMA")):
+                conn.info["wrote"] = True
+
+        @event.listens_for(engine, "commit")
+        def commit(conn):
+            self.commits += 1
+            if conn.info.pop("wrote", False):
+                self.write_commits += 1
+
+        @event.listens_for(engine, "rollback")
+        def rollback(conn):
+            conn.info.pop("wrote", None)
+
+    def snapshot(self) -> tuple:
+        return self.commits, self.write_commits, self.statements
+
+
+def endpoints(board_id: int):
+    """(название, метод, путь или функция от номера запроса, тело или функция от номера запроса)"""
+    b = f"/boards/{board_id}"
+    return [
+        ("register", "POST", "/register", lambda i: {"username": f"user{i}", "password": "pw"}),
+        ("create_board", "POST", "/boards/", lambda i: {"user_id": 0, "title": f"board {i}"}),
+        ("update_board", "PUT", b, lambda i: {"user_id": 1, "title": f"bench {i}"}),
+        ("create_status", "POST", f"{b}/statuses/", lambda i: {"name": f"status {i}"}),
+        ("update_status", "PUT", f"{b}/statuses/1", lambda i: {"name": f"todo {i}"}),
+        ("create_task", "POST", f"{b}/tasks/", lambda i: {"title": f"task {i}", "status_id": 1}),
+        ("create_tasks_bulk", "POST", f"{b}/tasks/bulk", lambda i: [{"title": f"bulk {i}-{k}", "status_id": 1} for k in range(10)]),
+        ("update_tasks_batch", "PATCH", f"{b}/tasks/batch", lambda i: [{"task_id": 1 + k, "title": f"batch {i}"} for k in range(10)]),
+        ("update_task", "PUT", f"{b}/tasks/1", lambda i: {"title": f"renamed {i}"}),
+        ("create_comment", "POST", f"{b}/tasks/1/comments/", lambda i: {"content": f"comment {i}"}),
+        ("create_tag", "POST", f"{b}/tags/", lambda i: {"label": f"label{i % 5}"}),
+        ("add_task_tag", "POST", f"{b}/tasks/2/tags/", lambda i: {"label": f"label{i % 5}"}),
+        ("remove_task_tag", "DELETE", lambda i: f"{b}/tasks/2/tags/{1 + i % 5}", None),
+        ("delete_task", "DELETE", lambda i: f"{b}/tasks/{1000 + i}", None),
+    ]
+
+
+async def run(repeat: int) -> list:
+    import httpx
+    from sqlalchemy import create_engine, insert
+
+    from app import app
+    from audit import audit_log
+    from auth.helpers import create_access_token
+    from migrations import migrate
+    from db import DATABASE_URL, async_engine
+    from models import BoardModel, StatusModel, TagModel, TaskModel, TaskTagModel, UserModel
+
+    migrate(DATABASE_URL)
+    engine = create_engine(DATABASE_URL)
+    with engine.begin() as conn:
+        conn.execute(insert(UserModel).values(username="bench", password="x"))
+        conn.execute(insert(BoardModel).values(user_id=1, title="bench"))
+        conn.execute(insert(StatusModel).values(board_id=1, name="todo"))
+        conn.execute(insert(TaskModel), [{"board_id": 1, "status_id": 1, "title": f"task {i}"} for i in range(1000 + repeat)])
+        conn.execute(insert(TagModel), [{"board_id": 1, "label": f"label{i}"} for i in range(5)])
+        conn.execute(insert(TaskTagModel), [{"task_id": 2, "tag_id": 1 + i} for i in range(5)])
+    engine.dispose()
+
+    counters = Counters()
+    counters.listen(async_engine.sync_engine)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench'})}"}
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    results = []
+
+    audit_log.flush_interval, audit_log.batch_size = 3600, 10**9
+    audit_log.start()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Прогрев: кэш токена и пул соединений
+        await client.get("/boards/1/statuses/", headers=headers)
+
+        for name, method, path, body in endpoints(1):
+            statuses, latencies = {}, []
+            before = counters.snapshot()
+
+            for i in range(repeat):
+                url = path(i) if callable(path) else path
+                started = time.perf_counter()
+                response = await client.request(method, url, headers=headers, json=body(i) if body else None)
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            commits, write_commits, statements = (after - start for after, start in zip(counters.snapshot(), before))
+            latencies.sort()
+            results.append({
+                "endpoint": name,
+                "method": method,
+                "statuses": statuses,
+                "commits": round(commits / repeat, 2),
+                "write_commits": round(write_commits / repeat, 2),
+                "statements": round(statements / repeat, 2),
+                "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+            })
+    await audit_log.stop()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    print(json.dumps(asyncio.run(run(args.repeat)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# Кэш статусов и заголовков досок в памяти процесса: статусы меняются редко, а нужны почти каждому ответу с задачами
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from models import StatusModel
+
+
+BOARD_CACHE_SIZE = int(os.getenv("BOARD_CACHE_SIZE", 10000))
+# Доска с большим числом статусов не кэшируется, чтобы одна доска не заняла весь кэш
+BOARD_CACHE_MAX_STATUSES = int(os.getenv("BOARD_CACHE_MAX_STATUSES", 500))
+# Запись сбрасывается при записи через CRUD этого процесса; изменения из других
+# воркеров и скриптов становятся видны не позже чем через TTL, а читателю, уже знающему
+# версию доски (boards.version), - сразу: запись с другой версией считается промахом
+BOARD_CACHE_TTL_SECONDS = float(os.getenv("BOARD_CACHE_TTL_SECONDS", 60))
+
+# Ключ session.info: доски, записи которых сбрасываются после commit сессии
+DIRTY_BOARDS = "board_cache_dirty"
+
+HEADER = "header"
+STATUSES = "statuses"
+
+
+class BoardHeader(NamedTuple):
+    board_id: int
+    user_id: int
+    title: str
+    description: Optional[str]
+    created_at: datetime
+
+
+class StatusRow(NamedTuple):
+    status_id: int
+    board_id: int
+    name: str
+    created_at: datetime
+    # created_at в том виде, в котором хранится в БД, - для курсора пагинации
+    cursor_created_at: str
+
+    def model(self) -> StatusModel:
+        # Отсоединенный объект с состоянием "как из БД": session.merge(load=False) кладет его в identity map без SELECT
+        status = StatusModel(status_id=self.status_id, board_id=self.board_id, name=self.name, created_at=self.created_at)
+        make_transient_to_detached(status)
+        return status
+
+
+class _Entry(NamedTuple):
+    value: Any
+    # boards.version, прочитанная тем же запросом, что и value
+    version: int
+    expires_at: float
+
+
+class BoardCache:
+    """
+    LRU-кэш на maxsize записей (заголовок доски и ее статусы - отдельные записи).
+
+    generation растет при каждом сбросе: значение, прочитанное из БД до сброса,
+    в кэш уже не попадет (set с устаревшим generation игнорируется). get с version
+    отдает только запись той же версии доски: ответ, помеченный ETag этой версии,
+    не соберется из кэша другого воркера или из записи, которую after_commit еще не сбросил.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = BOARD_CACHE_SIZE,
+        ttl: float = BOARD_CACHE_TTL_SECONDS,
+        max_statuses: int = BOARD_CACHE_MAX_STATUSES,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_statuses = max_statuses
+        self.generation = 0
+        self._entries: "OrderedDict[Tuple[str, int], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits: Dict[str, int] = {HEADER: 0, STATUSES: 0}
+        self.misses: Dict[str, int] = {HEADER: 0, STATUSES: 0}
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, kind: str, board_id: int, version: Optional[int] = None):
+        key = (kind, board_id)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic() or version not in (None, entry.version):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses[kind] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits[kind] += 1
+            return entry.value
+
+    def set(self, kind: str, board_id: int, value, version: int, generation: int):
+        if kind == STATUSES and len(value) > self.max_statuses:
+            return
+
+        with self._lock:
+            if generation != self.generation:
+                return
+
+            self._entries[(kind, board_id)] = _Entry(value, version, time.monotonic() + self.ttl)
+            self._entries.move_to_end((kind, board_id))
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_header(self, board_id: int, version: Optional[int] = None) -> Optional[BoardHeader]:
+        return self.get(HEADER, board_id, version)
+
+    def get_statuses(self, board_id: int, version: Optional[int] = None) -> Optional[Tuple[StatusRow, ...]]:
+        return self.get(STATUSES, board_id, version)
+
+    def invalidate(self, board_id: int):
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            self._entries.pop((HEADER, board_id), None)
+            self._entries.pop((STATUSES, board_id), None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+
+board_cache = BoardCache()
+
+
+def invalidate_on_commit(info: dict, board_id: int):
+    """
+    Запись доски сбросится после commit сессии: сброс до commit позволил бы
+    параллельному запросу снова закэшировать еще не измененные данные.
+    """
+    info.setdefault(DIRTY_BOARDS, set()).add(board_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    for board_id in session.info.pop(DIRTY_BOARDS, ()):
+        board_cache.invalidate(board_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back(session: Session, previous_transaction):
+    session.info.pop(DIRTY_BOARDS, None)
@@ -0,0 +1,186 @@
+# Лента изменений доски: закоммиченные события CRUD (audit.py) раздаются подписчикам SSE и WebSocket в процессе
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Dict, Iterable, Optional, Set
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from audit import AuditEvent
+
+
+BOARD_EVENTS_QUEUE_SIZE = int(os.getenv("BOARD_EVENTS_QUEUE_SIZE", 256))
+# Комментарий SSE раз в keepalive секунд: прокси не закрывают молчащее соединение,
+# а отвалившийся клиент обнаруживается на записи
+BOARD_EVENTS_KEEPALIVE = float(os.getenv("BOARD_EVENTS_KEEPALIVE", 15))
+SSE_MEDIA_TYPE = "text/event-stream"
+SSE_RETRY_MS = 3000
+
+
+class BoardEvent:
+    """Событие кодируется один раз и одним объектом ложится в очереди всех подписчиков доски"""
+
+    __slots__ = ("id", "action", "data", "final", "_sse")
+
+    def __init__(self, id: int, action: str, data: dict, final: bool = False):
+        self.id = id
+        self.action = action
+        self.data = json.dumps(data, ensure_ascii=False, default=str)
+        # После финального события поток закрывается: клиент переподключается и перечитывает доску
+        self.final = final
+        self._sse: Optional[bytes] = None
+
+    @property
+    def sse(self) -> bytes:
+        if self._sse is None:
+            self._sse = f"id: {self.id}\nevent: {self.action}\ndata: {self.data}\n\n".encode()
+        return self._sse
+
+
+class Subscriber:
+    __slots__ = ("board_id", "user_id", "queue")
+
+    def __init__(self, board_id: int, user_id: int, queue_size: int):
+        self.board_id = board_id
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[BoardEvent]:
+        # None - за timeout секунд событий не было
+        try:
+            async with asyncio.timeout(timeout):
+                return await self.queue.get()
+        except TimeoutError:
+            return None
+
+
+class BoardEventBroker:
+    """
+    Раздача событий в пределах процесса: у каждого подписчика своя очередь на queue_size
+    событий. Публикация не ждет никого: подписчик с полной очередью отключается событием
+    reset, а не теряет события молча. Подписка стоит очередь и задачу обработчика
+    соединения, ни соединения БД, ни таймеров сверх keepalive она не держит.
+    """
+
+    def __init__(self, queue_size: int = BOARD_EVENTS_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._boards: Dict[int, Set[Subscriber]] = {}
+        self._last_id = 0
+
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    @property
+    def subscribers(self) -> int:
+        return sum(len(subscribers) for subscribers in self._boards.values())
+
+    def subscribe(self, board_id: int, user_id: int) -> Subscriber:
+        subscriber = Subscriber(board_id, user_id, self.queue_size)
+        self._boards.setdefault(board_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self._boards.get(subscriber.board_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._boards[subscriber.board_id]
+
+    def publish(self, events: Iterable[AuditEvent]):
+        for audit_event in events:
+            board_id = audit_event.details.get("board_id")
+            subscribers = self._boards.get(board_id)
+            if not subscribers:
+                continue
+
+            data = {
+                "action": audit_event.action,
+                "actor_id": audit_event.user_id,
+                "created_at": audit_event.created_at,
+                **audit_event.details,
+            }
+            board_event = self._event(audit_event.action, data)
+            self.published += 1
+
+            for subscriber in list(subscribers):
+                try:
+                    subscriber.queue.put_nowait(board_event)
+                    self.delivered += 1
+                except asyncio.QueueFull:
+                    self.dropped += 1
+                    self.close(subscriber, "slow_consumer")
+
+            # Права проверяются при подключении, поэтому лишившийся доступа подписчик отключается
+            if audit_event.action == "board.delete":
+                for subscriber in list(self._boards.get(board_id, ())):
+                    self.close(subscriber, "board_deleted")
+            elif audit_event.action == "access.delete":
+                for subscriber in list(self._boards.get(board_id, ())):
+                    if subscriber.user_id == audit_event.details.get("user_id"):
+                        self.close(subscriber, "access_revoked")
+
+    def close(self, subscriber: Subscriber, reason: str):
+        """Отписывает и оставляет в очереди только финальное событие reset"""
+        self.unsubscribe(subscriber)
+
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(self._event("reset", {"action": "reset", "reason": reason}, final=True))
+
+    def _event(self, action: str, data: dict, final: bool = False) -> BoardEvent:
+        self._last_id += 1
+        return BoardEvent(self._last_id, action, data, final)
+
+
+async def sse_stream(
+    broker: BoardEventBroker, subscriber: Subscriber, keepalive: float = BOARD_EVENTS_KEEPALIVE
+) -> AsyncIterator[bytes]:
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+
+        while True:
+            board_event = await subscriber.get(keepalive)
+            if board_event is None:
+                yield b": keepalive\n\n"
+                continue
+
+            yield board_event.sse
+            if board_event.final:
+                return
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+async def _read_until_disconnect(websocket: WebSocket, broker: BoardEventBroker, subscriber: Subscriber):
+    # Сообщения клиента не нужны, но их надо читать, чтобы заметить закрытие соединения
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broker.close(subscriber, "disconnected")
+
+
+async def websocket_stream(websocket: WebSocket, broker: BoardEventBroker, subscriber: Subscriber):
+    # Keepalive у WebSocket на стороне сервера (ping в uvicorn), поэтому get без таймаута
+    await websocket.accept()
+    reader = asyncio.create_task(_read_until_disconnect(websocket, broker, subscriber))
+
+    try:
+        while True:
+            board_event = await subscriber.get()
+            if board_event.final:
+                if not reader.done():
+                    await websocket.send_text(board_event.data)
+                    await websocket.close()
+                return
+
+            await websocket.send_text(board_event.data)
+    finally:
+        reader.cancel()
+        broker.unsubscribe(subscriber)
+
+
+board_events = BoardEventBroker()
@@ -0,0 +1,131 @@
+# Потоковый экспорт доски в NDJSON
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Iterable
+
+from sqlalchemy import Select, select
+
+from db import async_engine
+from models import (
+    AttachmentModel,
+    BoardModel,
+    CommentModel,
+    StatusModel,
+    TagModel,
+    TaskModel,
+    TaskTagModel,
+    UserModel,
+)
+
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def export_queries(board_id: int) -> Iterable[tuple[str, Select]]:
+    """
+    Тип записи -> запрос. Порядок сортировки совпадает с порядком индексов,
+    поэтому SQLite отдает строки по мере чтения, без временной сортировки.
+    """
+    board_tasks = TaskModel.board_id == board_id
+
+    yield "board", select(
+        BoardModel.board_id, BoardModel.title, BoardModel.description, BoardModel.created_at
+    ).where(BoardModel.board_id == board_id)
+
+    yield "status", (
+        select(StatusModel.status_id, StatusModel.name, StatusModel.created_at)
+        .where(StatusModel.board_id == board_id)
+        .order_by(StatusModel.created_at, StatusModel.status_id)
+    )
+
+    yield "tag", (
+        select(TagModel.tag_id, TagModel.label, TagModel.created_at)
+        .where(TagModel.board_id == board_id)
+        .order_by(TagModel.label)
+    )
+
+    yield "task", (
+        select(TaskModel.task_id, TaskModel.status_id, TaskModel.title, TaskModel.description, TaskModel.created_at)
+        .where(board_tasks)
+        .order_by(TaskModel.created_at, TaskModel.task_id)
+    )
+
+    yield "task_tag", (
+        select(TaskTagModel.task_id, TaskTagModel.tag_id)
+        .join(TagModel, TagModel.tag_id == TaskTagModel.tag_id)
+        .where(TagModel.board_id == board_id)
+        .order_by(TagModel.label, TaskTagModel.task_id)
+    )
+
+    yield "comment", (
+        select(
+            CommentModel.comment_id,
+            CommentModel.task_id,
+            UserModel.username,
+            CommentModel.content,
+            CommentModel.created_at,
+        )
+        .join(TaskModel, TaskModel.task_id == CommentModel.task_id)
+        .join(UserModel, UserModel.user_id == CommentModel.user_id)
+        .where(board_tasks)
+        .order_by(TaskModel.created_at, TaskModel.task_id, CommentModel.created_at, CommentModel.comment_id)
+    )
+
+    yield "attachment", (
+        select(
+            AttachmentModel.attachment_id,
+            AttachmentModel.comment_id,
+            AttachmentModel.file_path,
+            AttachmentModel.filename,
+            AttachmentModel.content_type,
+            AttachmentModel.size,
+            AttachmentModel.sha256,
+            AttachmentModel.created_at,
+        )
+        .join(CommentModel, CommentModel.comment_id == AttachmentModel.comment_id)
+        .join(TaskModel, TaskModel.task_id == CommentModel.task_id)
+        .where(board_tasks)
+        .order_by(TaskModel.created_at, TaskModel.task_id, CommentModel.created_at, CommentModel.comment_id)
+    )
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _line(kind: str, row) -> bytes:
+    return json.dumps({"type": kind, **row}, ensure_ascii=False, default=_default).encode() + b"\n"
+
+
+async def export_board(board_id: int, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """
+    NDJSON доски по частям: в памяти одновременно не больше batch_size строк.
+
+    Все запросы идут в одной читающей транзакции, поэтому экспорт - согласованный
+    снимок доски, даже если ее параллельно меняют.
+    """
+    async with async_engine.connect() as conn:
+        await conn.exec_driver_sql("BEGIN")
+        try:
+            for kind, stmt in export_queries(board_id):
+                result = await conn.stream(stmt.execution_options(yield_per=batch_size))
+                async for partition in result.mappings().partitions():
+                    yield b"".join(_line(kind, row) for row in partition)
+        finally:
+            await conn.rollback()
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    yield compressor.flush()
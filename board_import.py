@@ -0,0 +1,546 @@
+# Потоковый импорт доски из NDJSON (формат экспорта) или CSV
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+from sqlalchemy import exists, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import AttachmentModel, BoardModel, CommentModel, StatusModel, TagModel, TaskModel, TaskTagModel, UserModel
+from schemas import ImportFormat, ImportLineErrorSchema, ImportResultSchema
+
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+# Строка длиннее лимита пропускается целиком, иначе одна строка без переводов займет всю память
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", 1 << 20))
+# Сколько ошибок попадает в ответ, остальные только считаются
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", 1000))
+CHUNK_SIZE = 1 << 16
+
+# Колонки CSV, теги в колонке tags через запятую
+CSV_COLUMNS = ("title", "description", "status", "tags", "created_at")
+
+
+class ImportLineError(ValueError):
+    pass
+
+
+Record = Union[dict, ImportLineError]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Union[str, ImportLineError]]]:
+    """Строки тела по мере получения: в памяти только недочитанный хвост"""
+    number, tail, too_long = 0, b"", False
+
+    async for chunk in chunks:
+        *lines, tail = (tail + chunk).split(b"\n")
+
+        for line in lines:
+            number += 1
+            if too_long:
+                too_long = False
+                yield number, ImportLineError(f"Line is longer than {IMPORT_MAX_LINE_BYTES} bytes")
+                continue
+            try:
+                yield number, line.rstrip(b"\r").decode()
+            except UnicodeDecodeError:
+                yield number, ImportLineError("Line is not valid UTF-8")
+
+        if len(tail) > IMPORT_MAX_LINE_BYTES:
+            tail, too_long = b"", True
+
+    if too_long:
+        yield number + 1, ImportLineError(f"Line is longer than {IMPORT_MAX_LINE_BYTES} bytes")
+    elif tail:
+        try:
+            yield number + 1, tail.rstrip(b"\r").decode()
+        except UnicodeDecodeError:
+            yield number + 1, ImportLineError("Line is not valid UTF-8")
+
+
+async def parse_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Record]]:
+    async for number, line in iter_lines(chunks):
+        if isinstance(line, ImportLineError):
+            yield number, line
+        elif line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                yield number, ImportLineError(f"Invalid JSON: {error}")
+            else:
+                yield number, record if isinstance(record, dict) else ImportLineError("Record must be a JSON object")
+
+
+async def parse_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Record]]:
+    """
+    Строки CSV -> записи задач. Поле в кавычках может занимать несколько строк,
+    поэтому запись собирается, пока число кавычек нечетное.
+    """
+    header: Optional[List[str]] = None
+    pending: List[str] = []
+    start = quotes = size = 0
+
+    async for number, line in iter_lines(chunks):
+        if isinstance(line, ImportLineError):
+            yield number, line
+            continue
+        if not pending:
+            if not line.strip():
+                continue
+            start, quotes, size = number, 0, 0
+        pending.append(line)
+        quotes += line.count('"')
+        size += len(line)
+
+        if quotes % 2 and size <= IMPORT_MAX_LINE_BYTES:
+            continue
+        row, pending = next(csv.reader(["\n".join(pending)])), []
+        if size > IMPORT_MAX_LINE_BYTES:
+            yield start, ImportLineError(f"Record is longer than {IMPORT_MAX_LINE_BYTES} bytes")
+            continue
+
+        if header is None:
+            header = [column.strip().lower() for column in row]
+            if "title" not in header:
+                yield start, ImportLineError(f"CSV header must contain title, known columns: {', '.join(CSV_COLUMNS)}")
+                return
+            continue
+
+        values = dict(zip(header, row))
+        yield start, {
+            "type": "task",
+            "title": values.get("title"),
+            "description": values.get("description") or None,
+            "status": values.get("status") or None,
+            "tags": [label.strip() for label in (values.get("tags") or "").split(",") if label.strip()],
+            "created_at": values.get("created_at") or None,
+        }
+
+    if pending:
+        yield start, ImportLineError("Unterminated quoted field")
+
+
+async def gunzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    # Распакованный кусок ограничен CHUNK_SIZE, даже если сжатие очень сильное
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32)
+
+    async for chunk in chunks:
+        data = decompressor.decompress(chunk, CHUNK_SIZE)
+        while data:
+            yield data
+            data = decompressor.decompress(decompressor.unconsumed_tail, CHUNK_SIZE)
+
+    yield decompressor.flush()
+
+
+def _text(record: dict, name: str, max_length: Optional[int] = None, required: bool = True) -> Optional[str]:
+    value = record.get(name)
+
+    if value is None or value == "":
+        if required:
+            raise ImportLineError(f"{name} is required")
+        return None
+    if not isinstance(value, str):
+        raise ImportLineError(f"{name} must be a string")
+    if max_length and len(value) > max_length:
+        raise ImportLineError(f"{name} is longer than {max_length} characters")
+
+    return value
+
+
+def _key(record: dict, name: str) -> Optional[Hashable]:
+    # Внешние id - числа или строки из исходной системы, с id этой БД не совпадают
+    value = record.get(name)
+
+    if value is None or (isinstance(value, (int, str)) and not isinstance(value, bool)):
+        return value
+
+    raise ImportLineError(f"{name} must be an integer or a string")
+
+
+def _created_at(record: dict) -> datetime:
+    value = record.get("created_at")
+
+    if value is None:
+        created_at = datetime.now(timezone.utc)
+    else:
+        try:
+            created_at = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ImportLineError("created_at must be an ISO 8601 datetime")
+
+    # В БД время UTC без зоны и с точностью до секунды, как у server_default
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return created_at.replace(microsecond=0)
+
+
+class BoardImporter:
+    """
+    Импорт записей в существующую доску пачками по batch_size строк.
+
+    Записи - в формате экспорта (board_export): внешние id статусов, тегов, задач и
+    комментариев переводятся в id этой БД, ссылки на еще не встреченные записи -
+    ошибка строки. Статусы и теги ищутся по имени и создаются, если их нет.
+    Каждая пачка - одна транзакция; блокировка записи держится только на время ее вставки.
+    """
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        board_id: int,
+        user_id: int,
+        batch_size: int = IMPORT_BATCH_SIZE,
+        on_progress: Optional[Callable[[ImportResultSchema], None]] = None,
+    ):
+        self.db = db
+        self.board_id = board_id
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.result = ImportResultSchema()
+
+        # name/label -> id и внешний id -> id этой БД
+        self.statuses: Dict[str, int] = {}
+        self.tags: Dict[str, int] = {}
+        self.users: Dict[str, int] = {}
+        self.status_ids: Dict[Hashable, int] = {}
+        self.tag_ids: Dict[Hashable, int] = {}
+        self.task_ids: Dict[Hashable, int] = {}
+        self.comment_ids: Dict[Hashable, int] = {}
+
+        # Текущая пачка. Задачи без внешнего id получают ключ (line, номер строки)
+        self.tasks: List[Tuple[Hashable, dict]] = []
+        self.task_tags: List[Tuple[Hashable, int]] = []
+        self.comments: List[Tuple[Hashable, Hashable, dict]] = []
+        self.attachments: List[Tuple[Hashable, dict]] = []
+        self.pending_task_keys: set = set()
+        self.pending_comment_keys: set = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self.tasks) + len(self.task_tags) + len(self.comments) + len(self.attachments)
+
+    async def run(self, records: AsyncIterator[Tuple[int, Record]]) -> ImportResultSchema:
+        await self.load_catalog()
+
+        async for line, record in records:
+            self.result.lines = line
+            try:
+                if isinstance(record, ImportLineError):
+                    raise record
+                await self.feed(line, record)
+            except ImportLineError as error:
+                self.error(line, str(error))
+
+            if self.pending >= self.batch_size:
+                await self.flush()
+
+        await self.flush()
+        return self.result
+
+    def error(self, line: int, detail: str):
+        self.result.errors_total += 1
+        if len(self.result.errors) < IMPORT_MAX_ERRORS:
+            self.result.errors.append(ImportLineErrorSchema(line=line, detail=detail))
+
+    async def load_catalog(self):
+        statuses = await self.db.execute(
+            select(StatusModel.name, StatusModel.status_id)
+            .where(StatusModel.board_id == self.board_id)
+            .order_by(StatusModel.created_at.desc(), StatusModel.status_id.desc())
+        )
+        # При одинаковых именах побеждает самый ранний статус
+        self.statuses = dict(statuses.tuples().all())
+        tags = await self.db.execute(select(TagModel.label, TagModel.tag_id).where(TagModel.board_id == self.board_id))
+        self.tags = dict(tags.tuples().all())
+
+    async def feed(self, line: int, record: dict):
+        kind = record.get("type")
+        handler = getattr(self, f"feed_{kind}", None) if isinstance(kind, str) else None
+
+        if handler is None:
+            raise ImportLineError(f"Unknown record type: {kind!r}")
+
+        await handler(line, record)
+
+    async def feed_board(self, line: int, record: dict):
+        # Записи доски из экспорта пропускаются: импорт идет в уже существующую доску
+        pass
+
+    async def feed_status(self, line: int, record: dict):
+        key = _key(record, "status_id")
+        status_id = await self.get_or_create_status(_text(record, "name", 50))
+
+        if key is not None:
+            self.status_ids[key] = status_id
+
+    async def feed_tag(self, line: int, record: dict):
+        key = _key(record, "tag_id")
+        tag_id = await self.get_or_create_tag(_text(record, "label", 50))
+
+        if key is not None:
+            self.tag_ids[key] = tag_id
+
+    async def feed_task(self, line: int, record: dict):
+        key = _key(record, "task_id")
+        if key is None:
+            key = ("line", line)
+        elif key in self.task_ids or key in self.pending_task_keys:
+            raise ImportLineError(f"Duplicate task_id: {key!r}")
+
+        title = _text(record, "title", 100)
+        description = _text(record, "description", required=False)
+        created_at = _created_at(record)
+
+        labels = record.get("tags") or []
+        if not isinstance(labels, list) or not all(isinstance(label, str) and 0 < len(label) <= 50 for label in labels):
+            raise ImportLineError("tags must be a list of labels up to 50 characters")
+
+        status_key = _key(record, "status_id")
+        if record.get("status") is not None:
+            status_id = await self.get_or_create_status(_text(record, "status", 50))
+        elif status_key is not None:
+            if status_key not in self.status_ids:
+                raise ImportLineError(f"Unknown status_id: {status_key!r}")
+            status_id = self.status_ids[status_key]
+        else:
+            raise ImportLineError("status or status_id is required")
+
+        for label in dict.fromkeys(labels):
+            self.task_tags.append((key, await self.get_or_create_tag(label)))
+
+        self.pending_task_keys.add(key)
+        self.tasks.append(
+            (
+                key,
+                {
+                    "board_id": self.board_id,
+                    "status_id": status_id,
+                    "title": title,
+                    "description": description,
+                    "created_at": created_at,
+                },
+            )
+        )
+
+    async def feed_task_tag(self, line: int, record: dict):
+        task_key = self.task_key(record)
+        tag_key = _key(record, "tag_id")
+
+        if tag_key not in self.tag_ids:
+            raise ImportLineError(f"Unknown tag_id: {tag_key!r}")
+
+        self.task_tags.append((task_key, self.tag_ids[tag_key]))
+
+    async def feed_comment(self, line: int, record: dict):
+        task_key = self.task_key(record)
+        key = _key(record, "comment_id")
+        if key is None:
+            key = ("line", line)
+        elif key in self.comment_ids or key in self.pending_comment_keys:
+            raise ImportLineError(f"Duplicate comment_id: {key!r}")
+
+        content = _text(record, "content")
+        created_at = _created_at(record)
+        username = _text(record, "username", 50, required=False)
+
+        self.pending_comment_keys.add(key)
+        self.comments.append(
+            (
+                key,
+                task_key,
+                {"user_id": await self.get_user_id(username), "content": content, "created_at": created_at},
+            )
+        )
+
+    async def feed_attachment(self, line: int, record: dict):
+        comment_key = _key(record, "comment_id")
+        if comment_key not in self.comment_ids and comment_key not in self.pending_comment_keys:
+            raise ImportLineError(f"Unknown comment_id: {comment_key!r}")
+
+        size = record.get("size")
+        if size is not None and (not isinstance(size, int) or isinstance(size, bool) or size < 0):
+            raise ImportLineError("size must be a non-negative integer")
+
+        # Метаданные файла хранилища переносятся как есть: в той же установке файл уже лежит под этим хешем
+        self.attachments.append(
+            (
+                comment_key,
+                {
+                    "file_path": _text(record, "file_path", 255),
+                    "filename": _text(record, "filename", 255, required=False),
+                    "content_type": _text(record, "content_type", 100, required=False),
+                    "size": size,
+                    "sha256": _text(record, "sha256", 64, required=False),
+                    "created_at": _created_at(record),
+                },
+            )
+        )
+
+    def task_key(self, record: dict) -> Hashable:
+        key = _key(record, "task_id")
+
+        if key not in self.task_ids and key not in self.pending_task_keys:
+            raise ImportLineError(f"Unknown task_id: {key!r}")
+
+        return key
+
+    async def get_or_create_status(self, name: str) -> int:
+        if name not in self.statuses:
+            self.statuses[name] = await self.db.scalar(
+                insert(StatusModel).values(board_id=self.board_id, name=name).returning(StatusModel.status_id)
+            )
+            self.result.statuses += 1
+            # Каталог фиксируется сразу, чтобы не держать блокировку записи до конца пачки
+            await self.db.commit()
+
+        return self.statuses[name]
+
+    async def get_or_create_tag(self, label: str) -> int:
+        if label not in self.tags:
+            await self.db.execute(
+                sqlite_insert(TagModel)
+                .values(board_id=self.board_id, label=label)
+                .on_conflict_do_nothing(index_elements=[TagModel.board_id, TagModel.label])
+            )
+            self.tags[label] = await self.db.scalar(
+                select(TagModel.tag_id).where(TagModel.board_id == self.board_id, TagModel.label == label)
+            )
+            self.result.tags += 1
+            await self.db.commit()
+
+        return self.tags[label]
+
+    async def get_user_id(self, username: Optional[str]) -> int:
+        # Автор, которого нет в этой БД, заменяется импортирующим пользователем
+        if username is None:
+            return self.user_id
+
+        if username not in self.users:
+            user_id = await self.db.scalar(select(UserModel.user_id).where(UserModel.username == username))
+            self.users[username] = user_id or self.user_id
+
+        return self.users[username]
+
+    async def insert_returning(self, model, id_column, rows: List[dict]) -> List[int]:
+        # SQLite выдает rowid по порядку VALUES, порядок RETURNING не гарантирован - id сортируются
+        return sorted(await self.db.scalars(insert(model).returning(id_column), rows))
+
+    async def flush(self):
+        if not self.pending:
+            return
+
+        # Ключи задач без внешнего id нужны только внутри пачки
+        batch_task_ids: Dict[Hashable, int] = {}
+        if self.tasks:
+            task_ids = await self.insert_returning(TaskModel, TaskModel.task_id, [row for _, row in self.tasks])
+            batch_task_ids = dict(zip((key for key, _ in self.tasks), task_ids))
+
+        def task_id(key: Hashable) -> int:
+            return batch_task_ids[key] if key in batch_task_ids else self.task_ids[key]
+
+        if self.task_tags:
+            await self.db.execute(
+                sqlite_insert(TaskTagModel).on_conflict_do_nothing(),
+                [{"task_id": task_id(key), "tag_id": tag_id} for key, tag_id in self.task_tags],
+            )
+
+        batch_comment_ids: Dict[Hashable, int] = {}
+        if self.comments:
+            comment_ids = await self.insert_returning(
+                CommentModel,
+                CommentModel.comment_id,
+                [{"task_id": task_id(task_key), **row} for _, task_key, row in self.comments],
+            )
+            batch_comment_ids = dict(zip((key for key, _, _ in self.comments), comment_ids))
+
+        if self.attachments:
+            await self.db.execute(
+                insert(AttachmentModel),
+                [
+                    {"comment_id": batch_comment_ids.get(key) or self.comment_ids[key], **row}
+                    for key, row in self.attachments
+                ],
+            )
+
+        await self.db.commit()
+
+        self.task_ids.update((key, value) for key, value in batch_task_ids.items() if not isinstance(key, tuple))
+        self.comment_ids.update((key, value) for key, value in batch_comment_ids.items() if not isinstance(key, tuple))
+        self.result.tasks += len(self.tasks)
+        self.result.task_tags += len(self.task_tags)
+        self.result.comments += len(self.comments)
+        self.result.attachments += len(self.attachments)
+
+        self.tasks, self.task_tags, self.comments, self.attachments = [], [], [], []
+        self.pending_task_keys, self.pending_comment_keys = set(), set()
+
+        if self.on_progress:
+            self.on_progress(self.result)
+
+
+def parse(chunks: AsyncIterator[bytes], format: ImportFormat) -> AsyncIterator[Tuple[int, Record]]:
+    return parse_csv(chunks) if format == "csv" else parse_ndjson(chunks)
+
+
+async def read_file(path: str) -> AsyncIterator[bytes]:
+    # Чтение файла блокирующее, но куски маленькие, а вставка все равно ждет SQLite
+    with sys.stdin.buffer if path == "-" else open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            yield chunk
+
+
+async def main():
+    from db import AsyncSessionLocal
+
+    parser = argparse.ArgumentParser(description="Импорт NDJSON или CSV в существующую доску")
+    parser.add_argument("path", help="файл экспорта или CSV, - для stdin; .gz распаковывается")
+    parser.add_argument("--board-id", type=int, required=True)
+    parser.add_argument("--username", required=True, help="владелец импортированных комментариев без автора")
+    parser.add_argument("--format", choices=["ndjson", "csv"])
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    path = args.path.removesuffix(".gz")
+    format = args.format or ("csv" if path.endswith(".csv") else "ndjson")
+    chunks = read_file(args.path)
+    if args.path.endswith(".gz"):
+        chunks = gunzip_stream(chunks)
+
+    errors_shown = 0
+
+    def progress(result: ImportResultSchema):
+        # Ошибки печатаются по мере появления, затем счетчики после каждой пачки
+        nonlocal errors_shown
+        for error in result.errors[errors_shown:]:
+            print(f"line {error.line}: {error.detail}", file=sys.stderr)
+        errors_shown = len(result.errors)
+        print(
+            f"line {result.lines}: {result.tasks} tasks, {result.comments} comments, {result.errors_total} errors",
+            file=sys.stderr,
+        )
+
+    async with AsyncSessionLocal() as db:
+        user_id = await db.scalar(select(UserModel.user_id).where(UserModel.username == args.username))
+        if user_id is None:
+            parser.error(f"user {args.username} not found")
+        if not await db.scalar(select(exists().where(BoardModel.board_id == args.board_id))):
+            parser.error(f"board {args.board_id} not found")
+
+        importer = BoardImporter(db, args.board_id, user_id, batch_size=args.batch_size, on_progress=progress)
+        result = await importer.run(parse(chunks, format))
+
+    print(result.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,94 +1,455 @@
 # CRUD operations
-from typing import Annotated, List
-from sqlalchemy.orm import Session
+import html
+import re
+import secrets
+from typing import Annotated, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+from sqlalchemy import String, delete, exists, func, insert, literal_column, select, type_coerce, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import immediateload, joinedload, selectinload
+from sqlalchemy.orm.util import identity_key
 from fastapi import Depends, HTTPException, status
 from auth.helpers import get_current_user
-from db import get_db
-from models import BoardAccessModel, StatusModel, TagModel, TaskModel, UserModel, BoardModel, CommentModel
+import attachments
+import audit
+from board_cache import HEADER, STATUSES, BoardHeader, StatusRow, board_cache, invalidate_on_commit
+from board_events import Subscriber, board_events
+from board_export import export_board
+from board_import import IMPORT_BATCH_SIZE, BoardImporter, parse
+from db import DbSession
+from fieldsets import Fieldset, Relation, includes, load_options
+from pagination import Page, paginate, paginate_list
+from models import (
+    AttachmentModel,
+    BoardAccessModel,
+    BoardModel,
+    CommentModel,
+    StatusModel,
+    TagModel,
+    TaskModel,
+    TaskTagModel,
+    UserModel,
+    search_index,
+)
 from schemas import (
     BoardAccessCreateSchema,
     BoardCreateSchema,
     BoardUpdateSchema,
     CommentCreateSchema,
+    ImportFormat,
+    ImportResultSchema,
     StatusCreateSchema,
     StatusUpdateSchema,
     TagCreateSchema,
+    TagMatch,
+    TaskBatchUpdateItemSchema,
+    TaskBatchUpdateResultSchema,
     TaskCreateSchema,
+    TaskSchema,
     TaskUpdateSchema,
+    UserSchema,
+)
+
+
+# Loader strategies matched to the response schemas, so serialization never
+# falls back to lazy loads (many-to-one -> joined, collections -> selectin)
+COMMENT_LOAD_OPTIONS = (
+    joinedload(CommentModel.user),
+    selectinload(CommentModel.attachments),
 )
+# Связи, которые можно выбрать через ?include=; без него грузится все дерево
+TASK_RELATIONS = {
+    # Статусы доски заранее кладутся в сессию из board_cache (CRUD.get_statuses), и
+    # immediateload находит их в identity map без запроса; чужой статус догружается по ключу
+    "status": Relation(immediateload(TaskModel.status)),
+    "comments": Relation(selectinload(TaskModel.comments), COMMENT_LOAD_OPTIONS),
+    "tags": Relation(selectinload(TaskModel.tags)),
+}
+TASK_LOAD_OPTIONS = load_options(TASK_RELATIONS)
+BOARD_ACCESS_LOAD_OPTIONS = (joinedload(BoardAccessModel.user),)
+BOARD_RELATIONS = {
+    "statuses": Relation(selectinload(BoardModel.statuses)),
+    "tasks": Relation(selectinload(BoardModel.tasks), TASK_LOAD_OPTIONS, TaskSchema, TASK_RELATIONS),
+    "shared_with": Relation(selectinload(BoardModel.shared_with), BOARD_ACCESS_LOAD_OPTIONS),
+}
+BOARD_LOAD_OPTIONS = load_options(BOARD_RELATIONS)
+
+
+class BoardPermission(NamedTuple):
+    is_owner: bool
+    full_access: bool
+
+    @property
+    def can_write(self) -> bool:
+        return self.is_owner or self.full_access
 
 
 class CRUD:
     def __init__(
         self,
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[UserModel, Depends(get_current_user)],
+        db: DbSession,
+        current_user: Annotated[UserSchema, Depends(get_current_user)],
     ):
         self.db = db
         self.current_user = current_user
 
+    @property
+    def permissions(self) -> Dict[int, Optional[BoardPermission]]:
+        # Сессия живет один запрос, поэтому права доски кэшируются в ней и общие для всех CRUD запроса
+        return self.db.info.setdefault("board_permissions", {})
+
+    async def get_permission(self, board_id: int) -> Optional[BoardPermission]:
+        # Права всегда читаются из БД, а не из board_cache: кэш других воркеров живет до TTL,
+        # и смена владельца или удаление доски не должны оставлять чужому пользователю запись
+        if board_id not in self.permissions:
+            is_owner, full_access = (
+                await self.db.execute(
+                    select(
+                        exists().where(BoardModel.board_id == board_id, BoardModel.user_id == self.current_user.user_id),
+                        select(BoardAccessModel.full_access)
+                        .where(BoardAccessModel.board_id == board_id, BoardAccessModel.user_id == self.current_user.user_id)
+                        .scalar_subquery(),
+                    )
+                )
+            ).one()
+
+            if is_owner or full_access is not None:
+                self.permissions[board_id] = BoardPermission(is_owner=bool(is_owner), full_access=bool(full_access))
+            else:
+                self.permissions[board_id] = None
+
+        return self.permissions[board_id]
+
+    @property
+    def versions(self) -> Dict[int, int]:
+        # boards.version, по которой запрос строит ETag: из board_cache берутся только записи этой версии
+        return self.db.info.setdefault("board_versions", {})
+
+    async def get_header(self, board_id: int) -> Optional[BoardHeader]:
+        header = board_cache.get_header(board_id, self.versions.get(board_id))
+
+        if header is None:
+            generation = board_cache.generation
+            row = (
+                await self.db.execute(
+                    select(BoardModel.version, *(getattr(BoardModel, field) for field in BoardHeader._fields)).where(
+                        BoardModel.board_id == board_id
+                    )
+                )
+            ).one_or_none()
+            # Отсутствие доски не кэшируется
+            if row is None:
+                return None
+
+            version, *fields = row
+            header = BoardHeader(*fields)
+            board_cache.set(HEADER, board_id, header, version, generation)
+
+        return header
+
+    @property
+    def statuses(self) -> Dict[int, List[Tuple[str, StatusModel]]]:
+        return self.db.info.setdefault("board_statuses", {})
+
+    async def get_statuses(self, board_id: int) -> List[Tuple[str, StatusModel]]:
+        """
+        Статусы доски по (created_at, status_id) парами (created_at из БД, статус). Строки
+        берутся из board_cache, а объекты кладутся в identity map сессии без запроса.
+        Только для чтения: проверки при записи идут по БД.
+        """
+        if board_id not in self.statuses:
+            rows = board_cache.get_statuses(board_id, self.versions.get(board_id))
+
+            if rows is None:
+                generation = board_cache.generation
+                # Версия доски читается тем же запросом, что и статусы, и хранится вместе с ними
+                result = (
+                    await self.db.execute(
+                        select(
+                            BoardModel.version,
+                            StatusModel.status_id,
+                            StatusModel.board_id,
+                            StatusModel.name,
+                            StatusModel.created_at,
+                            type_coerce(StatusModel.created_at, String).label("cursor_created_at"),
+                        )
+                        .select_from(BoardModel)
+                        .outerjoin(StatusModel, StatusModel.board_id == BoardModel.board_id)
+                        .where(BoardModel.board_id == board_id)
+                        .order_by(StatusModel.created_at, StatusModel.status_id)
+                    )
+                ).all()
+                rows = tuple(StatusRow(*row[1:]) for row in result if row.status_id is not None)
+                if result:
+                    board_cache.set(STATUSES, board_id, rows, result[0].version, generation)
+
+            def attach(session) -> List[StatusModel]:
+                # Уже загруженный в сессию статус не перезаписывается: у него могут быть несохраненные изменения
+                return [
+                    session.identity_map.get(identity_key(StatusModel, row.status_id))
+                    or session.merge(row.model(), load=False)
+                    for row in rows
+                ]
+
+            # Список в session.info еще и держит объекты: identity map хранит их по слабым ссылкам
+            models = await self.db.run_sync(attach)
+            self.statuses[board_id] = [(row.cursor_created_at, model) for row, model in zip(rows, models)]
+
+        return self.statuses[board_id]
+
+    def invalidate_board(self, board_id: int):
+        invalidate_on_commit(self.db.info, board_id)
+        self.statuses.pop(board_id, None)
+
+    async def has_access(self, board_id: int) -> bool:
+        return await self.get_permission(board_id) is not None
+
+    async def check_access(self, board_id: int, write: bool = False):
+        permission = await self.get_permission(board_id)
+
+        if permission is None or (write and not permission.can_write):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+
+    def log_action(self, action: str, board_id: int, **details):
+        # В журнал событие уйдет после commit сессии, отдельной фоновой записью (audit.py)
+        audit.record(self.db.info, self.current_user.user_id, action, board_id=board_id, **details)
+
 
 class TagCRUD(CRUD):
-    def get(self, board_id: int, tag_id: int):
-        if self.current_user.has_assess_or_owner_board(board_id):
-            return self.db.query(TagModel).filter(TagModel.tag_id == tag_id).first()
-        else:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Tag not found")
+    async def get(self, board_id: int, tag_id: int):
+        await self.check_access(board_id)
+        record = await self.db.scalar(select(TagModel).where(TagModel.tag_id == tag_id, TagModel.board_id == board_id))
+
+        if record is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
+
+        return record
+
+    async def get_all(self, board_id: int, skip: int = 0, limit: int = 100):
+        await self.check_access(board_id)
+
+        # Счетчик считается по индексу ix_task_tags_tag_id_task_id, сами задачи не читаются
+        task_count = (
+            select(func.count())
+            .where(TaskTagModel.tag_id == TagModel.tag_id)
+            .correlate(TagModel)
+            .scalar_subquery()
+        )
+        return (
+            await self.db.execute(
+                select(TagModel.tag_id, TagModel.label, TagModel.created_at, task_count.label("task_count"))
+                .where(TagModel.board_id == board_id)
+                .order_by(TagModel.label)
+                .offset(skip)
+                .limit(limit)
+            )
+        ).all()
+
+    async def get_or_create(self, board_id: int, label: str) -> TagModel:
+        # Метка уникальна в пределах доски: повторное создание возвращает существующий тег
+        await self.db.execute(
+            sqlite_insert(TagModel)
+            .values(board_id=board_id, label=label)
+            .on_conflict_do_nothing(index_elements=[TagModel.board_id, TagModel.label])
+        )
+        return await self.db.scalar(select(TagModel).where(TagModel.board_id == board_id, TagModel.label == label))
+
+    async def create(self, tag: TagCreateSchema, board_id: int):
+        await self.check_access(board_id, write=True)
+        record = await self.get_or_create(board_id, tag.label)
+        self.log_action("tag.create", board_id, tag_id=record.tag_id, label=record.label)
+        return record
 
-    def get_all(self, tag_id: int, skip: int = 0, limit: int = 100):
-        return self.db.query(TagModel).filter(TagModel.tag_id == tag_id).offset(skip).limit(limit).all()
+    async def delete(self, board_id: int, tag_id: int):
+        await self.check_access(board_id, write=True)
+        await self.get(board_id=board_id, tag_id=tag_id)
 
-    def create(self, tag: TagCreateSchema, board_id: int):
-        db_tag = TagModel(label=tag.label, board_id=board_id)
-        self.db.add(db_tag)
-        self.db.commit()
-        self.db.refresh(db_tag)
-        return db_tag
+        await self.db.execute(delete(TaskTagModel).where(TaskTagModel.tag_id == tag_id))
+        await self.db.execute(delete(TagModel).where(TagModel.tag_id == tag_id))
+        self.log_action("tag.delete", board_id, tag_id=tag_id)
 
 
 class StatusCRUD(CRUD):
-    def get(self, board_id: int, status_id: int):
-        if self.current_user.has_assess_or_owner_board(board_id):
-            record = self.db.query(StatusModel).filter(StatusModel.status_id == status_id).first()
-            if record:
-                return record
-            else:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Status not found")
+    async def get(self, board_id: int, status_id: int):
+        if await self.has_access(board_id):
+            for _, record in await self.get_statuses(board_id):
+                if record.status_id == status_id:
+                    return record
+
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Status not found")
 
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
-    def get_all(self, board_id: int, skip: int = 0, limit: int = 100):
-        return self.db.query(StatusModel).filter(StatusModel.board_id == board_id).offset(skip).limit(limit).all()
+    async def get_for_update(self, board_id: int, status_id: int) -> StatusModel:
+        # Изменение идет по строке из БД, а не из кэша: в другом воркере статус мог уже исчезнуть
+        record = await self.db.scalar(
+            select(StatusModel)
+            .where(StatusModel.status_id == status_id, StatusModel.board_id == board_id)
+            .execution_options(populate_existing=True)
+        )
+        if record is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Status not found")
+
+        return record
+
+    async def get_all(self, board_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+        await self.check_access(board_id)
+
+        return paginate_list(await self.get_statuses(board_id), "status_id", skip=skip, limit=limit, cursor=cursor)
 
-    def create(self, status: StatusCreateSchema, board_id: int):
+    async def create(self, status: StatusCreateSchema, board_id: int):
         db_status = StatusModel(name=status.name, board_id=board_id)
         self.db.add(db_status)
-        self.db.commit()
-        self.db.refresh(db_status)
+        await self.db.flush()
+        self.log_action("status.create", board_id, status_id=db_status.status_id, name=db_status.name)
+        self.invalidate_board(board_id)
         return db_status
 
-    def delete(self, board_id: int, status_id: int):
-        # CHECK IF USER HAS ACCESS TO THE BOARD
-        status = self.get(board_id, status_id)
-        self.db.delete(status)
+    async def delete(self, board_id: int, status_id: int):
+        await self.check_access(board_id, write=True)
+        status = await self.get_for_update(board_id, status_id)
+        await self.db.delete(status)
+        self.log_action("status.delete", board_id, status_id=status_id)
+        self.invalidate_board(board_id)
 
     
-    def update(self, board_id: int, status_id: int, data: StatusUpdateSchema):
-        # CHECK IF USER HAS ACCESS TO THE BOARD
-        status = self.get(board_id, status_id)
+    async def update(self, board_id: int, status_id: int, data: StatusUpdateSchema):
+        await self.check_access(board_id, write=True)
+        status = await self.get_for_update(board_id, status_id)
+        changes = data.model_dump(exclude_unset=True)
         
-        for field, value in data.model_dump(exclude_unset=True).items():
+        for field, value in changes.items():
             setattr(status, field, value)
         
+        self.log_action("status.update", board_id, status_id=status_id, changes=changes)
+        self.invalidate_board(board_id)
         return status
 
+
+class AttachmentCRUD(CRUD):
+    async def check_comment(self, board_id: int, task_id: int, comment_id: int):
+        found = await self.db.scalar(
+            select(
+                exists()
+                .where(CommentModel.comment_id == comment_id, CommentModel.task_id == task_id)
+                .where(TaskModel.task_id == CommentModel.task_id, TaskModel.board_id == board_id)
+            )
+        )
+
+        if not found:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
+
+    async def get(self, board_id: int, task_id: int, comment_id: int, attachment_id: int) -> AttachmentModel:
+        await self.check_access(board_id)
+        await self.check_comment(board_id, task_id, comment_id)
+        record = await self.db.scalar(
+            select(AttachmentModel).where(
+                AttachmentModel.attachment_id == attachment_id, AttachmentModel.comment_id == comment_id
+            )
+        )
+
+        if not record:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Attachment not found")
+
+        return record
+
+    async def get_all(
+        self,
+        board_id: int,
+        task_id: int,
+        comment_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Page:
+        # Список строится только по метаданным из БД, файлы не открываются
+        await self.check_access(board_id)
+        await self.check_comment(board_id, task_id, comment_id)
+
+        return await paginate(
+            self.db,
+            select(AttachmentModel).where(AttachmentModel.comment_id == comment_id),
+            AttachmentModel.created_at,
+            AttachmentModel.attachment_id,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+        )
+
+    async def upload(
+        self,
+        board_id: int,
+        task_id: int,
+        comment_id: int,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        content_type: Optional[str] = None,
+    ) -> AttachmentModel:
+        await self.check_access(board_id, write=True)
+        await self.check_comment(board_id, task_id, comment_id)
+
+        try:
+            stored = await attachments.receive(chunks)
+        except attachments.AttachmentTooLarge as error:
+            raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=str(error))
+
+        filename = attachments.clean_filename(filename)
+        try:
+            record = AttachmentModel(
+                comment_id=comment_id,
+                file_path=attachments.blob_path(stored.sha256),
+                filename=filename,
+                content_type=attachments.content_type_of(content_type, filename),
+                size=stored.size,
+                sha256=stored.sha256,
+            )
+            self.db.add(record)
+            await self.db.flush()
+            self.log_action(
+                "attachment.create",
+                board_id,
+                task_id=task_id,
+                comment_id=comment_id,
+                attachment_id=record.attachment_id,
+                sha256=stored.sha256,
+                size=stored.size,
+            )
+            # Файл встает на место под блокировкой записи SQLite, взятой flush: delete не удалит его до commit в get_db.
+            # Если commit не пройдет, новый файл удалится после rollback
+            attachments.store(self.db.info, stored)
+        finally:
+            attachments.discard(stored)
+
+        return record
+
+    async def delete(self, board_id: int, task_id: int, comment_id: int, attachment_id: int):
+        await self.check_access(board_id, write=True)
+        record = await self.get(board_id, task_id, comment_id, attachment_id)
+
+        await self.db.execute(delete(AttachmentModel).where(AttachmentModel.attachment_id == attachment_id))
+        self.log_action("attachment.delete", board_id, task_id=task_id, comment_id=comment_id, attachment_id=attachment_id)
+        # Файл общий для всех вложений с тем же хешем и удаляется вместе с последней ссылкой -
+        # сразу после commit, чтобы при неудачном commit оставшаяся строка не потеряла файл
+        if record.sha256 and not await self.db.scalar(
+            select(exists().where(AttachmentModel.sha256 == record.sha256))
+        ):
+            attachments.remove_on_commit(self.db.info, record.file_path)
+
+
 class CommentCRUD(CRUD):
-    def get(self, board_id: int, task_id, comment_id: int):
-        if self.current_user.has_assess_or_owner_board(board_id):
-            record = (
-                self.db.query(CommentModel)
-                .filter(CommentModel.comment_id == comment_id, CommentModel.task_id == task_id)
-                .first()
+    def __init__(
+        self,
+        db: DbSession,
+        current_user: Annotated[UserSchema, Depends(get_current_user)],
+    ):
+        self.attachment: AttachmentCRUD = AttachmentCRUD(db=db, current_user=current_user)
+        super().__init__(db, current_user)
+
+    async def get(self, board_id: int, task_id, comment_id: int):
+        if await self.has_access(board_id):
+            record = await self.db.scalar(
+                select(CommentModel)
+                .options(*COMMENT_LOAD_OPTIONS)
+                .where(CommentModel.comment_id == comment_id, CommentModel.task_id == task_id)
             )
             if record:
                 return record
@@ -97,20 +458,34 @@ class CommentCRUD(CRUD):
 
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
-    def get_all(self, board_id: int, task_id: int, skip: int = 0, limit: int = 100):
-        return (
-            self.db.query(CommentModel)
-            .filter(CommentModel.task_id == task_id, CommentModel.task.board_id == board_id)
-            .offset(skip)
-            .limit(limit)
-            .all()
+    async def get_all(
+        self, board_id: int, task_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> Page:
+        await self.check_access(board_id)
+
+        return await paginate(
+            self.db,
+            select(CommentModel)
+            .options(*COMMENT_LOAD_OPTIONS)
+            .join(CommentModel.task)
+            .where(CommentModel.task_id == task_id, TaskModel.board_id == board_id),
+            CommentModel.created_at,
+            CommentModel.comment_id,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
         )
 
-    def create(self, task_id: int, comment: CommentCreateSchema):
-        db_comment = CommentModel(content=comment.content, task_id=task_id, user_id=self.current_user.user_id)
+    async def create(self, task_id: int, comment: CommentCreateSchema):
+        # Связи заполняются сразу: ответ сериализуется без lazy load и refresh
+        db_comment = CommentModel(
+            content=comment.content,
+            task_id=task_id,
+            user=await self.db.get(UserModel, self.current_user.user_id),
+            attachments=[],
+        )
         self.db.add(db_comment)
-        self.db.commit()
-        self.db.refresh(db_comment)
+        await self.db.flush()
         
         return db_comment
 
@@ -118,17 +493,23 @@ class CommentCRUD(CRUD):
 class TaskCRUD(CRUD):
     def __init__(
         self,
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[UserModel, Depends(get_current_user)],
+        db: DbSession,
+        current_user: Annotated[UserSchema, Depends(get_current_user)],
     ):
         self.comment: CommentCRUD = CommentCRUD(db=db, current_user=current_user)
         self.tag: TagCRUD = TagCRUD(db=db, current_user=current_user)
         super().__init__(db, current_user)
 
-    def get(self, board_id: int, task_id: int):
+    async def get(self, board_id: int, task_id: int, fieldset: Optional[Fieldset] = None):
         # Проверяем, есть ли у пользователя доступ к доске или он является ее владельцем
-        if self.current_user.has_assess_or_owner_board(board_id):
-            record = self.db.query(TaskModel).filter(TaskModel.task_id == task_id).first()
+        if await self.has_access(board_id):
+            if includes(fieldset, "status"):
+                await self.get_statuses(board_id)
+            record = await self.db.scalar(
+                select(TaskModel)
+                .options(*load_options(TASK_RELATIONS, fieldset))
+                .where(TaskModel.task_id == task_id, TaskModel.board_id == board_id)
+            )
 
             if record:
                 return record
@@ -137,49 +518,257 @@ class TaskCRUD(CRUD):
 
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
-    def get_all(self, board_id: int, skip: int = 0, limit: int = 100):
-        return self.db.query(TaskModel).filter(TaskModel.board_id == board_id).offset(skip).limit(limit).all()
+    async def get_all(
+        self,
+        board_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        fieldset: Optional[Fieldset] = None,
+    ) -> Page:
+        await self.check_access(board_id)
+        if includes(fieldset, "status"):
+            await self.get_statuses(board_id)
+
+        return await paginate(
+            self.db,
+            select(TaskModel).options(*load_options(TASK_RELATIONS, fieldset)).where(TaskModel.board_id == board_id),
+            TaskModel.created_at,
+            TaskModel.task_id,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+        )
+
+    async def get_board_status(self, board_id: int, status_id: int) -> StatusModel:
+        # Статус проверяется по БД, а не по board_cache: в кэше другого воркера новый статус
+        # еще не виден, а удаленный остался бы, и задача получила бы висячий status_id
+        record = await self.db.scalar(
+            select(StatusModel).where(StatusModel.status_id == status_id, StatusModel.board_id == board_id)
+        )
+        if record is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Statuses not found on board: {[status_id]}",
+            )
 
-    def create(self, board_id: int, task: TaskCreateSchema):
-        db_task = TaskModel(title=task.title, description=task.description, board_id=board_id, status_id=task.status_id)
+        return record
+
+    async def create(self, board_id: int, task: TaskCreateSchema):
+        # Статус сразу становится связью для ответа
+        db_task = TaskModel(
+            title=task.title,
+            description=task.description,
+            board_id=board_id,
+            status=await self.get_board_status(board_id, task.status_id),
+            comments=[],
+            tags=[],
+        )
         self.db.add(db_task)
-        self.db.commit()
-        self.db.refresh(db_task)
+        await self.db.flush()
+        self.log_action("task.create", board_id, task_id=db_task.task_id)
         return db_task
 
-    def add_comment(self, board_id: int, task_id: int, comment: CommentCreateSchema):
-        task = self.get(board_id=board_id, task_id=task_id)
+    async def create_many(self, board_id: int, tasks: List[TaskCreateSchema]) -> List[int]:
+        await self.check_access(board_id, write=True)
 
-        comment_model = self.comment.create(task_id=task.task_id, comment=comment)
-        task.comments.append(comment_model)
-        self.db.commit()
+        if not tasks:
+            return []
 
-    def add_tag(self, board_id: int, task_id: int, tag: TagCreateSchema):
-        task = self.get(board_id=board_id, task_id=task_id)
+        # Статусы проверяются одним запросом на всю пачку
+        status_ids = {task.status_id for task in tasks}
+        board_status_ids = set(
+            await self.db.scalars(
+                select(StatusModel.status_id).where(StatusModel.board_id == board_id, StatusModel.status_id.in_(status_ids))
+            )
+        )
+        unknown_status_ids = status_ids - board_status_ids
 
-        tag_model = self.tag.create(board_id=board_id, tag=tag)
-        task.tags.append(tag_model)
-        self.db.commit()
-        
-    def delete(self, board_id: int, task_id: int):
-        # CHECK IF USER HAS ACCESS TO THE BOARD
-        task = self.get(board_id=board_id, task_id=task_id)
-        self.db.delete(task)
+        if unknown_status_ids:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Statuses not found on board: {sorted(unknown_status_ids)}",
+            )
+
+        # Многострочный INSERT ... RETURNING в одной транзакции. SQLite выдает rowid по порядку VALUES,
+        # а порядок строк RETURNING не гарантирует, поэтому id сортируются, а не берутся как есть
+        task_ids = await self.db.scalars(
+            insert(TaskModel).returning(TaskModel.task_id),
+            [
+                {"board_id": board_id, "title": task.title, "description": task.description, "status_id": task.status_id}
+                for task in tasks
+            ],
+        )
+        task_ids = sorted(task_ids)
+        self.log_action("task.create_many", board_id, task_ids=task_ids)
+
+        return task_ids
+
+    async def update_many(
+        self, board_id: int, items: List[TaskBatchUpdateItemSchema]
+    ) -> List[TaskBatchUpdateResultSchema]:
+        await self.check_access(board_id, write=True)
+
+        task_ids = {item.task_id for item in items}
+        status_ids = {item.status_id for item in items if item.status_id is not None}
+        board_task_ids = set(
+            await self.db.scalars(
+                select(TaskModel.task_id).where(TaskModel.board_id == board_id, TaskModel.task_id.in_(task_ids))
+            )
+        )
+        board_status_ids = set()
+
+        if status_ids:
+            board_status_ids = set(
+                await self.db.scalars(
+                    select(StatusModel.status_id).where(
+                        StatusModel.board_id == board_id, StatusModel.status_id.in_(status_ids)
+                    )
+                )
+            )
+
+        results: List[TaskBatchUpdateResultSchema] = []
+        # Одинаковые изменения объединяются в один UPDATE ... WHERE task_id IN (...)
+        groups: Dict[tuple, List[int]] = {}
+        seen = set()
+
+        for item in items:
+            detail = None
+            if item.task_id in seen:
+                detail = "Duplicate task_id in batch"
+            elif item.task_id not in board_task_ids:
+                detail = "Task not found"
+            elif item.status_id is not None and item.status_id not in board_status_ids:
+                detail = "Status not found"
+
+            seen.add(item.task_id)
+            results.append(TaskBatchUpdateResultSchema(task_id=item.task_id, updated=detail is None, detail=detail))
+
+            if detail is None:
+                values = item.model_dump(exclude_unset=True, exclude={"task_id"})
+                values = tuple(sorted((field, value) for field, value in values.items() if value is not None))
+                if values:
+                    groups.setdefault(values, []).append(item.task_id)
+
+        for values, group_task_ids in groups.items():
+            await self.db.execute(
+                update(TaskModel)
+                .where(TaskModel.board_id == board_id, TaskModel.task_id.in_(group_task_ids))
+                .values(dict(values))
+                .execution_options(synchronize_session=False)
+            )
+
+        updated = [result.task_id for result in results if result.updated]
+        if updated:
+            self.log_action("task.update_many", board_id, task_ids=updated)
+
+        return results
+
+    async def add_comment(self, board_id: int, task_id: int, comment: CommentCreateSchema) -> CommentModel:
+        await self.check_access(board_id, write=True)
+        if not await self.db.scalar(select(exists().where(TaskModel.task_id == task_id, TaskModel.board_id == board_id))):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+
+        comment_model = await self.comment.create(task_id=task_id, comment=comment)
+        self.log_action("comment.create", board_id, task_id=task_id, comment_id=comment_model.comment_id)
+        return comment_model
+
+    async def get_by_tags(
+        self,
+        board_id: int,
+        labels: List[str],
+        match: TagMatch = "all",
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        fieldset: Optional[Fieldset] = None,
+    ) -> Page:
+        await self.check_access(board_id)
+
+        labels = {label.strip() for label in labels if label.strip()}
+        tag_ids = (
+            await self.db.scalars(select(TagModel.tag_id).where(TagModel.board_id == board_id, TagModel.label.in_(labels)))
+        ).all()
+
+        # Для all неизвестная метка означает, что подходящих задач нет
+        if not tag_ids or (match == "all" and len(tag_ids) < len(labels)):
+            return Page()
+
+        tagged = select(TaskTagModel.task_id).where(TaskTagModel.tag_id.in_(tag_ids))
+        if match == "all":
+            tagged = tagged.group_by(TaskTagModel.task_id).having(func.count() == len(tag_ids))
+
+        if includes(fieldset, "status"):
+            await self.get_statuses(board_id)
+
+        return await paginate(
+            self.db,
+            select(TaskModel)
+            .options(*load_options(TASK_RELATIONS, fieldset))
+            .where(TaskModel.board_id == board_id, TaskModel.task_id.in_(tagged)),
+            TaskModel.created_at,
+            TaskModel.task_id,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+        )
+
+    async def add_tag(self, board_id: int, task_id: int, tag: TagCreateSchema):
+        await self.check_access(board_id, write=True)
+        if not await self.db.scalar(select(exists().where(TaskModel.task_id == task_id, TaskModel.board_id == board_id))):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+
+        tag_model = await self.tag.get_or_create(board_id, tag.label)
+        await self.db.execute(
+            sqlite_insert(TaskTagModel).values(task_id=task_id, tag_id=tag_model.tag_id).on_conflict_do_nothing()
+        )
+        self.log_action("task.add_tag", board_id, task_id=task_id, tag_id=tag_model.tag_id)
+        return tag_model
+
+    async def remove_tag(self, board_id: int, task_id: int, tag_id: int):
+        await self.check_access(board_id, write=True)
+        result = await self.db.execute(
+            delete(TaskTagModel).where(
+                TaskTagModel.task_id == task_id,
+                TaskTagModel.tag_id == tag_id,
+                TaskTagModel.tag_id.in_(select(TagModel.tag_id).where(TagModel.board_id == board_id)),
+            )
+        )
+
+        if result.rowcount == 0:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
+
+        self.log_action("task.remove_tag", board_id, task_id=task_id, tag_id=tag_id)
+
+    async def delete(self, board_id: int, task_id: int):
+        await self.check_access(board_id, write=True)
+        task = await self.get(board_id=board_id, task_id=task_id)
+        await self.db.delete(task)
+        self.log_action("task.delete", board_id, task_id=task_id)
     
-    def update(self, board_id: int, task_id: int, data: TaskUpdateSchema):
-        # CHECK IF USER HAS ACCESS TO THE BOARD
-        task = self.get(board_id=board_id, task_id=task_id)
-        
-        for field, value in data.model_dump(exclude_unset=True).items():
-            if value is not None:
+    async def update(self, board_id: int, task_id: int, data: TaskUpdateSchema):
+        await self.check_access(board_id, write=True)
+        task = await self.get(board_id=board_id, task_id=task_id)
+        changes = {field: value for field, value in data.model_dump(exclude_unset=True).items() if value is not None}
+
+        for field, value in changes.items():
+            if field == "status_id":
+                # Связь заменяется статусом из БД: загруженный status остался от прежнего status_id, а ответ покажет новый
+                task.status = await self.get_board_status(board_id, value)
+            else:
                 setattr(task, field, value)
 
+        self.log_action("task.update", board_id, task_id=task_id, changes=changes)
         return task
 
 class BoardAccessCRUD(CRUD):
-    def get(self, board_id: int, access_id: int):
-        if self.current_user.has_assess_or_owner_board(board_id):
-            record = self.db.query(BoardAccessModel).filter(BoardAccessModel.access_id == access_id).first()
+    async def get(self, board_id: int, access_id: int):
+        if await self.has_access(board_id):
+            record = await self.db.scalar(
+                select(BoardAccessModel)
+                .options(*BOARD_ACCESS_LOAD_OPTIONS)
+                .where(BoardAccessModel.access_id == access_id, BoardAccessModel.board_id == board_id)
+            )
 
             if record:
                 return record
@@ -188,17 +777,25 @@ class BoardAccessCRUD(CRUD):
 
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
-    def get_all(self, board_id: int, skip: int = 0, limit: int = 100):
-        return (
-            self.db.query(BoardAccessModel)
-            .filter(BoardAccessModel.board_id == board_id)
-            .offset(skip)
-            .limit(limit)
-            .all()
+    async def get_all(self, board_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+        await self.check_access(board_id)
+
+        return await paginate(
+            self.db,
+            select(BoardAccessModel)
+            .options(*BOARD_ACCESS_LOAD_OPTIONS)
+            .where(BoardAccessModel.board_id == board_id),
+            BoardAccessModel.granted_at,
+            BoardAccessModel.access_id,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
         )
 
-    def create(self, board_id: int, user_id: int):
-        record = self.db.query(BoardAccessModel).filter(BoardAccessModel.board_id == board_id, BoardAccessModel.user_id == user_id).first()
+    async def create(self, board_id: int, user_id: int):
+        record = await self.db.scalar(
+            select(BoardAccessModel).where(BoardAccessModel.board_id == board_id, BoardAccessModel.user_id == user_id)
+        )
         
         if record is not None:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Access already exists")
@@ -206,30 +803,95 @@ class BoardAccessCRUD(CRUD):
         db_board_access = BoardAccessModel(user_id=user_id, board_id=board_id)
         
         self.db.add(db_board_access)
-        self.db.commit()
-        self.db.refresh(db_board_access)
+        await self.db.flush()
+        self.log_action("access.create", board_id, access_id=db_board_access.access_id, user_id=user_id)
+        self.permissions.pop(board_id, None)
         
         return db_board_access
     
-    def delete(self, board_id: int, access_id: int):
-        # CHECK IF USER HAS ACCESS TO THE BOARD
-        self.db.query(BoardAccessModel).filter(BoardAccessModel.board_id == board_id, BoardAccessModel.access_id == access_id).delete()
+    async def delete(self, board_id: int, access_id: int):
+        await self.check_access(board_id, write=True)
+        # user_id нужен ленте доски, чтобы отключить подписки лишившегося доступа пользователя
+        user_id = await self.db.scalar(
+            delete(BoardAccessModel)
+            .where(BoardAccessModel.board_id == board_id, BoardAccessModel.access_id == access_id)
+            .returning(BoardAccessModel.user_id)
+        )
+        self.permissions.pop(board_id, None)
+        self.log_action("access.delete", board_id, access_id=access_id, user_id=user_id)
+
+
+class SearchCRUD(CRUD):
+    # Пользовательский ввод не попадает в MATCH как есть: только слова, каждое в кавычках
+    MAX_TERMS = 16
+    # Последнее слово ищется по префиксу, но не слишком короткому, чтобы не раздувать выборку
+    # (для 3 символов в индексе есть prefix='3')
+    MIN_PREFIX_LENGTH = 3
+
+    @classmethod
+    def match_expression(cls, board_id: int, q: str) -> str:
+        terms = re.findall(r"\w+", q)[: cls.MAX_TERMS]
+        if not terms:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty search query")
+
+        phrases = [f'"{term}"' for term in terms]
+        if len(terms[-1]) >= cls.MIN_PREFIX_LENGTH:
+            phrases[-1] += "*"
+
+        return f'board:"b{board_id}" AND {{title body}}:({" ".join(phrases)})'
+
+    @staticmethod
+    def highlight(snippet: str, start: str, end: str) -> str:
+        # Текст задач и комментариев вводят пользователи: он экранируется, и только потом метки совпадений становятся <mark>
+        return html.escape(snippet).replace(start, "<mark>").replace(end, "</mark>")
+
+    async def search(self, board_id: int, q: str, skip: int = 0, limit: int = 20) -> List[dict]:
+        await self.check_access(board_id)
+
+        # Метки случайные на каждый запрос, чтобы их нельзя было подделать в тексте; html.escape их не меняет
+        start, end = (f"\ue000{secrets.token_hex(8)}\ue001" for _ in range(2))
+        fts = literal_column("search_index")
+        rows = (
+            await self.db.execute(
+                select(
+                    search_index.c.task_id,
+                    search_index.c.comment_id,
+                    TaskModel.title,
+                    func.snippet(fts, -1, start, end, "…", 16).label("snippet"),
+                    search_index.c.rank,
+                )
+                .join(TaskModel, TaskModel.task_id == search_index.c.task_id)
+                .where(fts.op("MATCH")(self.match_expression(board_id, q)), TaskModel.board_id == board_id)
+                .order_by(search_index.c.rank, search_index.c.rowid)
+                .offset(skip)
+                .limit(limit)
+            )
+        ).all()
+
+        return [{**row._mapping, "snippet": self.highlight(row.snippet, start, end)} for row in rows]
 
 
 class BoardCRUD(CRUD):
     def __init__(
         self,
-        db: Annotated[Session, Depends(get_db)],
-        current_user: Annotated[UserModel, Depends(get_current_user)],
+        db: DbSession,
+        current_user: Annotated[UserSchema, Depends(get_current_user)],
     ):
         self.status: StatusCRUD = StatusCRUD(db=db, current_user=current_user)
         self.task: TaskCRUD = TaskCRUD(db=db, current_user=current_user)
         self.access: BoardAccessCRUD = BoardAccessCRUD(db=db, current_user=current_user)
+        self.search: SearchCRUD = SearchCRUD(db=db, current_user=current_user)
         super().__init__(db, current_user)
 
-    def get(self, board_id: int):
-        if self.current_user.has_assess_or_owner_board(board_id):
-            record = self.db.query(BoardModel).filter(BoardModel.board_id == board_id).first()
+    async def get(self, board_id: int, fieldset: Optional[Fieldset] = None):
+        if await self.has_access(board_id):
+            if includes(fieldset, "tasks", "status"):
+                await self.get_statuses(board_id)
+            record = await self.db.scalar(
+                select(BoardModel)
+                .options(*load_options(BOARD_RELATIONS, fieldset))
+                .where(BoardModel.board_id == board_id)
+            )
 
             if record:
                 return record
@@ -238,51 +900,121 @@ class BoardCRUD(CRUD):
 
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
-    def get_all(self, skip: int = 0, limit: int = 100) -> List[BoardModel]:
-        return (
-            self.db.query(BoardModel)
-            .filter(BoardModel.user_id == self.current_user.user_id)
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+    async def get_version(self, board_id: int) -> int:
+        await self.check_access(board_id)
+        version = await self.db.scalar(select(BoardModel.version).where(BoardModel.board_id == board_id))
 
-    def create(self, board: BoardCreateSchema) -> BoardModel:
-        db_board = BoardModel(title=board.title, description=board.description, user_id=self.current_user.user_id)
-        self.db.add(db_board)
-        self.db.commit()
-        self.db.refresh(db_board)
+        if version is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Board not found")
 
-        return db_board
+        self.versions[board_id] = version
+        return version
+
+    async def export(self, board_id: int) -> AsyncIterator[bytes]:
+        # Проверки выполняются до начала ответа, сам экспорт читает БД своим соединением
+        await self.check_access(board_id)
+        if await self.get_header(board_id) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Board not found")
+
+        return export_board(board_id)
+
+    async def subscribe(self, board_id: int) -> Subscriber:
+        await self.check_access(board_id)
+        if await self.get_header(board_id) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Board not found")
 
-    def add_task(self, board_id: int, task: TaskCreateSchema):
-        board = self.get(board_id=board_id)
+        # Подписка живет часами: соединение БД возвращается в пул до начала потока
+        await self.db.commit()
+        return board_events.subscribe(board_id, self.current_user.user_id)
+
+    async def import_file(
+        self,
+        board_id: int,
+        chunks: AsyncIterator[bytes],
+        format: ImportFormat = "ndjson",
+        batch_size: int = IMPORT_BATCH_SIZE,
+    ) -> ImportResultSchema:
+        # Тело читается только после проверок, пачки коммитятся по ходу импорта
+        await self.check_access(board_id, write=True)
+        if await self.get_header(board_id) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Board not found")
+
+        importer = BoardImporter(self.db, board_id, self.current_user.user_id, batch_size=batch_size)
+        result = await importer.run(parse(chunks, format))
+        # Импорт коммитит пачками сам, новые статусы уже в БД
+        board_cache.invalidate(board_id)
+        self.log_action("board.import", board_id, **result.model_dump(exclude={"errors"}))
+        return result
+
+    async def get_all(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        fieldset: Optional[Fieldset] = None,
+    ) -> Page:
+        return await paginate(
+            self.db,
+            select(BoardModel)
+            .options(*load_options(BOARD_RELATIONS, fieldset))
+            .where(BoardModel.user_id == self.current_user.user_id),
+            BoardModel.created_at,
+            BoardModel.board_id,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+        )
 
-        self.task.create(board_id=board.board_id, task=task)
+    async def create(self, board: BoardCreateSchema) -> BoardModel:
+        # Пустые коллекции считаются загруженными, ответ сериализуется без lazy load
+        db_board = BoardModel(
+            title=board.title,
+            description=board.description,
+            user_id=self.current_user.user_id,
+            statuses=[],
+            tasks=[],
+            shared_with=[],
+        )
+        self.db.add(db_board)
+        await self.db.flush()
+        self.log_action("board.create", db_board.board_id)
 
-    def add_status(self, board_id: int, status: StatusCreateSchema):
-        board = self.get(board_id=board_id)
+        return db_board
 
-        self.status.create(board_id=board.board_id, status=status)
+    # Доска существует, раз check_access прошел: дерево доски для создания записи не загружается
+    async def add_task(self, board_id: int, task: TaskCreateSchema) -> TaskModel:
+        await self.check_access(board_id, write=True)
+        return await self.task.create(board_id=board_id, task=task)
 
-    def shared(self, board_id: int, board_access: BoardAccessCreateSchema):
-        board = self.get(board_id=board_id)
+    async def add_status(self, board_id: int, status: StatusCreateSchema) -> StatusModel:
+        await self.check_access(board_id, write=True)
+        return await self.status.create(board_id=board_id, status=status)
 
-        self.access.create(board_id=board.board_id, user_id=board_access.user_id)
+    async def shared(self, board_id: int, board_access: BoardAccessCreateSchema):
+        await self.check_access(board_id, write=True)
+        await self.access.create(board_id=board_id, user_id=board_access.user_id)
 
-    def delete(self, board_id: int):
+    async def delete(self, board_id: int):
         # CHECK IF USER HAS ACCESS TO THE BOARD
-        res = self.db.query(BoardModel).filter(BoardModel.board_id == board_id, BoardModel.user_id == self.current_user.user_id).delete()
+        res = await self.db.execute(
+            delete(BoardModel).where(BoardModel.board_id == board_id, BoardModel.user_id == self.current_user.user_id)
+        )
         
-        if res == 0:
+        if res.rowcount == 0:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Невозможно удалить доску")
+
+        self.permissions.pop(board_id, None)
+        self.log_action("board.delete", board_id)
+        self.invalidate_board(board_id)
     
-    def update(self, board_id: int, data: BoardUpdateSchema):
-        # CHECK IF USER HAS ACCESS TO THE BOARD
-        board = self.get(board_id=board_id)
+    async def update(self, board_id: int, data: BoardUpdateSchema):
+        await self.check_access(board_id, write=True)
+        board = await self.get(board_id=board_id)
+        changes = {field: value for field, value in data.model_dump(exclude_unset=True).items() if value is not None}
         
-        for field, value in data.model_dump(exclude_unset=True).items():
-            if value is not None:
-                setattr(board, field, value)
+        for field, value in changes.items():
+            setattr(board, field, value)
         
-        return board
\ No newline at end of file
+        self.log_action("board.update", board_id, changes=changes)
+        self.invalidate_board(board_id)
+        return board
@@ -1,17 +1,117 @@
 # SQLAlchemy settings
-from sqlalchemy import create_engine
+import os
+from typing import Annotated, Dict
+
+from fastapi import Depends
+
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
+from audit import COMMITTED_EVENTS, audit_log
+from board_events import board_events
+from metrics import instrument_pool, metrics
+from sql_timing import instrument
+
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data.db")
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# PRAGMA, выполняемые на каждом новом соединении SQLite.
+# compat - настройки SQLite по умолчанию (rollback journal), production - WAL и большой кэш.
+# Любую PRAGMA профиля можно переопределить переменной окружения DB_SQLITE_<NAME>.
+# foreign_keys выключен в обоих профилях: в схеме нет ON DELETE, удаление доски с задачами упадет.
+SQLITE_PROFILES: Dict[str, Dict[str, str]] = {
+    "compat": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": "-2000",
+        "mmap_size": "0",
+        "busy_timeout": "0",
+        "foreign_keys": "OFF",
+    },
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": "-65536",
+        "mmap_size": "268435456",
+        "busy_timeout": "5000",
+        "foreign_keys": "OFF",
+    },
+}
+DB_PROFILE = os.getenv("DB_PROFILE", "production")
+
+
+def sqlite_pragmas(profile: str = DB_PROFILE) -> Dict[str, str]:
+    pragmas = dict(SQLITE_PROFILES[profile])
+
+    for name in pragmas:
+        value = os.getenv(f"DB_SQLITE_{name.upper()}")
+        if value is not None:
+            pragmas[name] = value
+
+    return pragmas
+
 
-DATABASE_URL = "sqlite:///./data.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+def engine_options(url: str) -> dict:
+    if not url.startswith("sqlite"):
+        return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT}
+
+    options = {"connect_args": {"check_same_thread": False}}
+    # In-memory SQLite uses a singleton pool that has no size limits
+    if ":memory:" not in url and "mode=memory" not in url:
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+
+    return options
+
+
+def set_sqlite_pragmas(engine: Engine, pragmas: Dict[str, str]):
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+set_sqlite_pragmas(engine, sqlite_pragmas())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the FastAPI routes; the sync engine above is kept for alembic and scripts
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+set_sqlite_pragmas(async_engine.sync_engine, sqlite_pragmas())
+instrument(async_engine.sync_engine)
+instrument_pool(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+audit_log.engine = async_engine
+
 
-def get_db():
-    db = SessionLocal()
+async def get_db():
+    # Единственный commit запроса: CRUD только делает flush
+    db: AsyncSession = AsyncSessionLocal()
     try:
         yield db
-        db.commit()
+        await db.commit()
+    except PoolTimeoutError:
+        metrics.pool_timeouts += 1
+        raise
     finally:
-        db.close()
+        await db.close()
+        # События аудита и ленты доски только закоммиченных изменений, в том числе если запрос потом упал
+        events = db.info.pop(COMMITTED_EVENTS, [])
+        await audit_log.publish(events)
+        board_events.publish(events)
+
+
+# scope="function": commit выполняется до отправки ответа, клиент не увидит ответ раньше, чем данные в БД.
+# Все зависимости должны брать сессию через DbSession, иначе в запросе окажутся две разные сессии
+DbSession = Annotated[AsyncSession, Depends(get_db, scope="function")]
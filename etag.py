@@ -0,0 +1,46 @@
+# Conditional GET по версии доски
+import hashlib
+from typing import Iterable, Optional, Tuple
+
+from fastapi import Response, status
+
+
+# Ответы зависят от того, кто спрашивает: общий кэш их хранить не должен, а свой - перепроверяет по ETag
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+# Содержимое вложения по хешу не меняется, перепроверять его не нужно
+ATTACHMENT_CACHE_CONTROL = "private, max-age=31536000, immutable"
+VARY = "Authorization"
+
+
+def board_etag(board_id: int, version: int, query: Iterable[Tuple[str, str]] = ()) -> str:
+    """
+    Версия доски плюс параметры запроса: fields, include, cursor, skip и limit
+    меняют тело ответа, поэтому ETag одного представления не подходит к другому.
+    """
+    params = sorted(query)
+    if not params:
+        return f'W/"board-{board_id}-v{version}"'
+
+    digest = hashlib.sha1(repr(params).encode()).hexdigest()[:16]
+    return f'W/"board-{board_id}-v{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    # If-None-Match использует слабое сравнение: префикс W/ не учитывается
+    weak = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == weak for tag in if_none_match.split(","))
+
+
+def cache_headers(etag: str, cache_control: str = PRIVATE_CACHE_CONTROL) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control, "Vary": VARY}
+
+
+def not_modified(etag: str, cache_control: str = PRIVATE_CACHE_CONTROL) -> Response:
+    # 304 повторяет заголовки кэширования полного ответа
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag, cache_control))
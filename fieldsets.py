@@ -0,0 +1,172 @@
+# Sparse fieldsets: ?fields= и ?include= для задач и досок
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple, Type, get_type_hints
+
+from fastapi import HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+
+class Relation(NamedTuple):
+    """Связь, которую можно запросить через include."""
+
+    loader: Any
+    # Опции для полной загрузки связи (когда вложенный набор полей не задан)
+    options: Tuple = ()
+    # Для связей, у которых поля тоже можно выбирать через точку: tasks.title, tasks.tags
+    schema: Optional[Type[BaseModel]] = None
+    nested: Optional[Dict[str, "Relation"]] = None
+
+    def load(self, fieldset: Optional["Fieldset"]):
+        options = self.options if fieldset is None else load_options(self.nested, fieldset)
+        return self.loader.options(*options) if options else self.loader
+
+
+class Fieldset(NamedTuple):
+    schema: Type[BaseModel]
+    relations: Dict[str, Relation]
+    # None - все скалярные поля схемы
+    fields: Optional[FrozenSet[str]]
+    # Связь -> вложенный набор полей, None - связь целиком
+    include: Dict[str, Optional["Fieldset"]]
+
+    def dump(self, record) -> dict:
+        data = {}
+
+        for name in self.schema.model_fields:
+            if name in self.relations:
+                if name not in self.include:
+                    continue
+
+                value = getattr(record, name)
+                nested = self.include[name]
+                if nested is None:
+                    adapter = _adapter(self.schema, name)
+                    data[name] = adapter.dump_python(adapter.validate_python(value, from_attributes=True), mode="json")
+                elif isinstance(value, list):
+                    data[name] = [nested.dump(item) for item in value]
+                else:
+                    data[name] = None if value is None else nested.dump(value)
+            elif self.fields is None or name in self.fields:
+                data[name] = getattr(record, name)
+
+        return data
+
+
+@lru_cache
+def _adapter(schema: Type[BaseModel], name: str) -> TypeAdapter:
+    # Аннотации схем содержат forward ref, разрешаем их в пространстве имен схемы
+    return TypeAdapter(get_type_hints(schema)[name])
+
+
+def load_options(relations: Dict[str, Relation], fieldset: Optional[Fieldset] = None) -> tuple:
+    # Без fieldset загружается все дерево, как и раньше
+    if fieldset is None:
+        return tuple(relation.load(None) for relation in relations.values())
+
+    return tuple(relations[name].load(nested) for name, nested in fieldset.include.items())
+
+
+def includes(fieldset: Optional[Fieldset], *path: str) -> bool:
+    """Будет ли загружена связь по пути path, например includes(fieldset, "tasks", "status")"""
+    for name in path:
+        if fieldset is None:
+            return True
+        if name not in fieldset.include:
+            return False
+        fieldset = fieldset.include[name]
+
+    return True
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+
+def _bad_request(detail: str):
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def _build(
+    schema: Type[BaseModel],
+    relations: Dict[str, Relation],
+    fields: Optional[List[str]],
+    include: List[str],
+) -> Fieldset:
+    own_fields = set()
+    nested_fields: Dict[str, List[str]] = {}
+    nested_include: Dict[str, List[str]] = {}
+
+    for name in fields or ():
+        head, _, rest = name.partition(".")
+        if head not in schema.model_fields:
+            raise _bad_request(f"Unknown field: {name}")
+
+        if rest:
+            nested_fields.setdefault(head, []).append(rest)
+            nested_include.setdefault(head, [])
+        else:
+            own_fields.add(head)
+            if head in relations:
+                nested_include.setdefault(head, [])
+
+    for name in include:
+        head, _, rest = name.partition(".")
+        if head not in relations:
+            raise _bad_request(f"Unknown relation: {name}")
+
+        nested_include.setdefault(head, [])
+        if rest:
+            nested_include[head].append(rest)
+
+    included = {}
+    for name, nested in nested_include.items():
+        relation = relations.get(name)
+        if relation is None:
+            raise _bad_request(f"Unknown relation: {name}")
+
+        if not nested and name not in nested_fields:
+            included[name] = None
+        elif relation.nested is None:
+            raise _bad_request(f"Relation {name} does not support nested fields")
+        else:
+            included[name] = _build(relation.schema, relation.nested, nested_fields.get(name), nested)
+
+    return Fieldset(
+        schema=schema,
+        relations=relations,
+        fields=None if fields is None else frozenset(own_fields),
+        include=included,
+    )
+
+
+def parse_fieldset(
+    schema: Type[BaseModel],
+    relations: Dict[str, Relation],
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+) -> Optional[Fieldset]:
+    if fields is None and include is None:
+        return None
+
+    return _build(schema, relations, None if fields is None else _split(fields), _split(include))
+
+
+def fieldset_query(schema: Type[BaseModel], relations: Dict[str, Relation]):
+    def dependency(
+        fields: Optional[str] = Query(None, description="Поля через запятую, для вложенных - через точку: title,tasks.title"),
+        include: Optional[str] = Query(None, description=f"Связи через запятую: {','.join(relations)}"),
+    ) -> Optional[Fieldset]:
+        return parse_fieldset(schema, relations, fields, include)
+
+    return dependency
+
+
+def render(response: Response, result, fieldset: Optional[Fieldset]):
+    # Полный ответ по-прежнему проходит через response_model
+    if fieldset is None:
+        return result
+
+    content = [fieldset.dump(record) for record in result] if isinstance(result, list) else fieldset.dump(result)
+    return JSONResponse(jsonable_encoder(content), headers=dict(response.headers))
@@ -1,4 +1,24 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from audit import audit_log
+from metrics import MetricsMiddleware
+from sql_timing import SqlTimingMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Фоновая запись журнала действий; при остановке очередь дописывается до конца
+    audit_log.start()
+    try:
+        yield
+    finally:
+        await audit_log.stop()
+
+
 # FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+# Последний добавленный middleware - внешний: метрики читают статистику SQL, которую ведет SqlTimingMiddleware
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(SqlTimingMiddleware)
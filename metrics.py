@@ -0,0 +1,256 @@
+# Метрики в текстовом формате Prometheus: задержки по шаблонам маршрутов, пул соединений БД, bcrypt и счетчики модулей
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import Engine, event
+from sqlalchemy.orm import Session
+
+from sql_timing import current_request
+
+
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BCRYPT_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+# Запросы мимо всех маршрутов (404) сводятся в одну метку, иначе сканеры размножат ряды
+UNMATCHED_ROUTE = "unmatched"
+
+# Ключ session.info: начало транзакции сессии, которая еще ждет соединение
+POOL_WAIT_STARTED = "metrics_pool_wait_started"
+
+
+class Histogram:
+    """
+    Счетчики обновляются из потока event loop без блокировок: обработчики запросов,
+    события пула async-движка и замер bcrypt вокруг await выполняются именно там.
+    """
+
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # Последний элемент - +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class RouteMetrics:
+    """Все ряды одного маршрута в одном объекте: на запрос - один поиск по словарю"""
+
+    __slots__ = ("duration", "responses", "exceptions", "db_queries", "db_seconds")
+
+    def __init__(self):
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.responses: Dict[int, int] = {}
+        self.exceptions: Dict[str, int] = {}
+        self.db_queries = 0
+        self.db_seconds = 0.0
+
+
+class Metrics:
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.in_flight = 0
+        self.bcrypt = Histogram(BCRYPT_BUCKETS)
+        self.pool_wait = Histogram(POOL_WAIT_BUCKETS)
+        self.pool_checkout = Histogram(LATENCY_BUCKETS)
+        self.pool_timeouts = 0
+        self.pools: List = []
+
+    def route(self, method: str, path: str) -> RouteMetrics:
+        key = (method, path)
+        route = self.routes.get(key)
+        if route is None:
+            route = self.routes[key] = RouteMetrics()
+        return route
+
+
+metrics = Metrics()
+
+
+def instrument_pool(engine: Engine):
+    """
+    Время удержания соединения - события пула checkout/checkin. События перед ожиданием у пула нет,
+    поэтому ожидание считается по событиям сессии: от начала ее транзакции (autobegin при первом
+    обращении к БД) до after_begin, когда соединение уже получено. Таймауты пула считает get_db.
+    """
+    pool = engine.pool
+    metrics.pools.append(pool)
+
+    @event.listens_for(Session, "after_transaction_create")
+    def on_transaction_create(session, transaction):
+        if transaction.parent is None:
+            session.info[POOL_WAIT_STARTED] = time.perf_counter()
+
+    @event.listens_for(Session, "after_begin")
+    def on_begin(session, transaction, connection):
+        if connection.engine is engine:
+            started = session.info.pop(POOL_WAIT_STARTED, None)
+            if started is not None:
+                metrics.pool_wait.observe(time.perf_counter() - started)
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["metrics_checked_out"] = time.perf_counter()
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        started = connection_record.info.pop("metrics_checked_out", None)
+        if started is not None:
+            metrics.pool_checkout.observe(time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware, подключается внутри SqlTimingMiddleware: число и время SQL запроса берутся оттуда.
+    Шаблон маршрута известен только после роутинга, поэтому ряд выбирается в конце запроса.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+        exception = None
+        metrics.in_flight += 1
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as error:
+            exception = type(error).__name__
+            raise
+        finally:
+            metrics.in_flight -= 1
+            route_template = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            route = metrics.route(scope["method"], route_template)
+            route.duration.observe(time.perf_counter() - started)
+            route.responses[status_code] = route.responses.get(status_code, 0) + 1
+            if exception is not None:
+                route.exceptions[exception] = route.exceptions.get(exception, 0) + 1
+
+            stats = current_request.get()
+            if stats is not None:
+                route.db_queries += stats.statements
+                route.db_seconds += stats.sql_seconds
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _family(lines: List[str], name: str, kind: str, help: str, samples: Iterable[Tuple[Dict[str, object], float]]):
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+
+def _histogram(lines: List[str], name: str, help: str, series: Iterable[Tuple[Dict[str, object], Histogram]]):
+    lines.append(f"# HELP {name} {help}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in series:
+        cumulative = 0
+        for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+
+def _module_families(lines: List[str]):
+    # Импорт при сборе, а не при загрузке: auth и db сами импортируют этот модуль
+    from audit import audit_log
+    from auth.hashing import password_hasher
+    from board_cache import board_cache
+    from board_events import board_events
+
+    _family(
+        lines, "audit_log_events_total", "counter", "Audit events by outcome",
+        [({"outcome": outcome}, getattr(audit_log, outcome)) for outcome in ("enqueued", "written", "dropped", "failed")],
+    )
+    _family(lines, "audit_log_batches_total", "counter", "Audit batches written", [({}, audit_log.batches)])
+    _family(lines, "audit_log_queued", "gauge", "Audit events waiting to be written", [({}, audit_log.queued)])
+
+    _family(lines, "board_cache_hits_total", "counter", "Board cache hits", [({"kind": kind}, n) for kind, n in board_cache.hits.items()])
+    _family(lines, "board_cache_misses_total", "counter", "Board cache misses", [({"kind": kind}, n) for kind, n in board_cache.misses.items()])
+    _family(lines, "board_cache_evictions_total", "counter", "Board cache LRU evictions", [({}, board_cache.evictions)])
+    _family(lines, "board_cache_invalidations_total", "counter", "Board cache invalidations", [({}, board_cache.invalidations)])
+    _family(lines, "board_cache_entries", "gauge", "Board cache entries", [({}, len(board_cache))])
+
+    _family(lines, "board_events_subscribers", "gauge", "Open board event streams", [({}, board_events.subscribers)])
+    _family(
+        lines, "board_events_total", "counter", "Board events by outcome",
+        [({"outcome": outcome}, getattr(board_events, outcome)) for outcome in ("published", "delivered", "dropped")],
+    )
+
+    _family(lines, "password_hash_in_flight", "gauge", "bcrypt operations running or queued", [({}, password_hasher.pending)])
+
+
+def render() -> str:
+    """Снимок всех метрик; словари копируются, потому что запросы продолжают их менять"""
+    lines: List[str] = []
+    routes = [(method, path, route) for (method, path), route in list(metrics.routes.items())]
+
+    _family(lines, "http_requests_in_flight", "gauge", "HTTP requests being processed", [({}, metrics.in_flight)])
+    _histogram(
+        lines, "http_request_duration_seconds", "HTTP request latency by route template",
+        [({"method": method, "route": path}, route.duration) for method, path, route in routes],
+    )
+    _family(
+        lines, "http_responses_total", "counter", "HTTP responses by route template and status",
+        [
+            ({"method": method, "route": path, "status": status}, count)
+            for method, path, route in routes for status, count in list(route.responses.items())
+        ],
+    )
+    _family(
+        lines, "http_exceptions_total", "counter", "Unhandled exceptions by route template",
+        [
+            ({"method": method, "route": path, "exception": name}, count)
+            for method, path, route in routes for name, count in list(route.exceptions.items())
+        ],
+    )
+    _family(
+        lines, "http_db_queries_total", "counter", "SQL statements executed by requests",
+        [({"method": method, "route": path}, route.db_queries) for method, path, route in routes],
+    )
+    _family(
+        lines, "http_db_seconds_total", "counter", "Time spent in SQL by requests",
+        [({"method": method, "route": path}, route.db_seconds) for method, path, route in routes],
+    )
+
+    _histogram(lines, "db_pool_wait_seconds", "Time a session waits for a pooled connection", [({}, metrics.pool_wait)])
+    _histogram(lines, "db_pool_checkout_seconds", "Time a connection stays checked out", [({}, metrics.pool_checkout)])
+    _family(lines, "db_pool_timeouts_total", "counter", "Pool checkouts that timed out", [({}, metrics.pool_timeouts)])
+    _family(lines, "db_pool_checked_out", "gauge", "Connections checked out", [({}, pool.checkedout()) for pool in metrics.pools])
+    _family(lines, "db_pool_size", "gauge", "Connections kept by the pool", [({}, pool.size()) for pool in metrics.pools])
+
+    _histogram(lines, "bcrypt_verify_seconds", "Password verification latency, queueing included", [({}, metrics.bcrypt)])
+
+    _module_families(lines)
+
+    return "\n".join(lines) + "\n"
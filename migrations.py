@@ -0,0 +1,16 @@
+# Схема БД из миграций alembic: для тестов и бенчмарков на временной БД
+import os
+
+from alembic import command
+from alembic.config import Config
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def migrate(url: str, root: str = ROOT):
+    """alembic upgrade head для url; root - дерево с alembic.ini и каталогом alembic"""
+    config = Config(os.path.join(root, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(root, "alembic"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
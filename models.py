@@ -1,12 +1,26 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import ForeignKey, String, Text, DateTime, Boolean, UniqueConstraint, func
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    column,
+    func,
+    table,
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
 class Base(DeclarativeBase):
-    pass
+    # Серверные значения (created_at, version) возвращаются тем же INSERT ... RETURNING, без refresh после commit
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class UserModel(Base):
@@ -23,15 +37,6 @@ class UserModel(Base):
     shared_boards: Mapped[List["BoardAccessModel"]] = relationship(back_populates="user")
     action_logs: Mapped[List["UserActionLogModel"]] = relationship(back_populates="user")
 
-    def has_access_to_board(self, board_id: int):
-        return any([access.board_id == board_id for access in self.shared_boards])
-
-    def is_owner_board(self, board_id: int):
-        return any([board.board_id == board_id for board in self.boards])
-
-    def has_assess_or_owner_board(self, board_id: int):
-        return self.has_access_to_board(board_id) or self.is_owner_board(board_id)
-
 
 class BoardModel(Base):
     __tablename__ = "boards"
@@ -41,12 +46,19 @@ class BoardModel(Base):
     title: Mapped[str] = mapped_column(String(100))
     description: Mapped[Optional[str]] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    # Растет при любом изменении доски и ее содержимого (триггеры в миграции 587201df0630)
+    version: Mapped[int] = mapped_column(Integer, server_default="0")
 
     # Relationships
     user: Mapped["UserModel"] = relationship(back_populates="boards")
     statuses: Mapped[List["StatusModel"]] = relationship(back_populates="board")
     tasks: Mapped[List["TaskModel"]] = relationship(back_populates="board")
     shared_with: Mapped[List["BoardAccessModel"]] = relationship(back_populates="board")
+    tags: Mapped[List["TagModel"]] = relationship(back_populates="board")
+
+    __table_args__ = (
+        Index("ix_boards_user_id_created_at", "user_id", "created_at", "board_id"),
+    )
 
 
 class StatusModel(Base):
@@ -61,6 +73,10 @@ class StatusModel(Base):
     board: Mapped["BoardModel"] = relationship(back_populates="statuses")
     tasks: Mapped[List["TaskModel"]] = relationship(back_populates="status")
 
+    __table_args__ = (
+        Index("ix_statuses_board_id_created_at", "board_id", "created_at", "status_id"),
+    )
+
 
 class TaskModel(Base):
     __tablename__ = "tasks"
@@ -76,7 +92,12 @@ class TaskModel(Base):
     board: Mapped["BoardModel"] = relationship(back_populates="tasks")
     status: Mapped[Optional["StatusModel"]] = relationship(back_populates="tasks")
     comments: Mapped[List["CommentModel"]] = relationship(back_populates="task")
-    tags: Mapped[List["TagModel"]] = relationship(back_populates="task")
+    tags: Mapped[List["TagModel"]] = relationship(secondary="task_tags", back_populates="tasks")
+
+    __table_args__ = (
+        Index("ix_tasks_board_id_created_at", "board_id", "created_at", "task_id"),
+        Index("ix_tasks_status_id", "status_id"),
+    )
 
 
 class BoardAccessModel(Base):
@@ -94,6 +115,8 @@ class BoardAccessModel(Base):
     
     __table_args__ = (
         UniqueConstraint('board_id', 'user_id', name='unique_board_user'),
+        Index("ix_board_access_board_id_granted_at", "board_id", "granted_at", "access_id"),
+        Index("ix_board_access_user_id", "user_id"),
     )
 
 
@@ -111,29 +134,64 @@ class CommentModel(Base):
     user: Mapped["UserModel"] = relationship(back_populates="comments")
     attachments: Mapped[List["AttachmentModel"]] = relationship(back_populates="comment")
 
+    __table_args__ = (
+        Index("ix_comments_task_id_created_at", "task_id", "created_at", "comment_id"),
+        Index("ix_comments_user_id", "user_id"),
+    )
+
 
 class AttachmentModel(Base):
     __tablename__ = "attachments"
 
     attachment_id: Mapped[int] = mapped_column(primary_key=True)
     comment_id: Mapped[int] = mapped_column(ForeignKey("comments.comment_id"))
+    # У загруженных файлов - путь в хранилище относительно ATTACHMENTS_DIR (attachments.py)
     file_path: Mapped[str] = mapped_column(String(255))
+    # Метаданные загруженного файла, у старых записей пустые
+    filename: Mapped[Optional[str]] = mapped_column(String(255))
+    content_type: Mapped[Optional[str]] = mapped_column(String(100))
+    size: Mapped[Optional[int]] = mapped_column(Integer)
+    sha256: Mapped[Optional[str]] = mapped_column(String(64))
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
     # Relationships
     comment: Mapped["CommentModel"] = relationship(back_populates="attachments")
 
+    __table_args__ = (
+        Index("ix_attachments_comment_id_created_at", "comment_id", "created_at", "attachment_id"),
+        # Счетчик ссылок на файл хранилища при удалении
+        Index("ix_attachments_sha256", "sha256"),
+    )
+
 
+# Каталог тегов доски, к задачам привязывается через task_tags
 class TagModel(Base):
     __tablename__ = "tags"
 
     tag_id: Mapped[int] = mapped_column(primary_key=True)
-    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.task_id"))
+    board_id: Mapped[int] = mapped_column(ForeignKey("boards.board_id"))
     label: Mapped[str] = mapped_column(String(50))
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
 
     # Relationships
-    task: Mapped["TaskModel"] = relationship(back_populates="tags")
+    board: Mapped["BoardModel"] = relationship(back_populates="tags")
+    tasks: Mapped[List["TaskModel"]] = relationship(secondary="task_tags", back_populates="tags")
+
+    __table_args__ = (
+        UniqueConstraint("board_id", "label", name="unique_board_tag_label"),
+    )
+
+
+class TaskTagModel(Base):
+    __tablename__ = "task_tags"
+
+    task_id: Mapped[int] = mapped_column(ForeignKey("tasks.task_id"), primary_key=True)
+    tag_id: Mapped[int] = mapped_column(ForeignKey("tags.tag_id"), primary_key=True)
+
+    # Первичный ключ (task_id, tag_id) отдает теги задачи, индекс по tag_id - задачи тега и счетчики
+    __table_args__ = (
+        Index("ix_task_tags_tag_id_task_id", "tag_id", "task_id"),
+    )
 
 
 class UserActionLogModel(Base):
@@ -146,3 +204,21 @@ class UserActionLogModel(Base):
 
     # Relationships
     user: Mapped["UserModel"] = relationship(back_populates="action_logs")
+
+    __table_args__ = (
+        Index("ix_user_action_logs_user_id", "user_id"),
+    )
+
+
+# FTS5-индекс задач и комментариев (миграция c4543d5b0b8f). Виртуальная таблица
+# не входит в metadata, запросы строятся по этому описанию
+search_index = table(
+    "search_index",
+    column("rowid", Integer),
+    column("title", Text),
+    column("body", Text),
+    column("board", Text),
+    column("task_id", Integer),
+    column("comment_id", Integer),
+    column("rank", Float),
+)
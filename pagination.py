@@ -0,0 +1,111 @@
+# Keyset (cursor) pagination
+import base64
+import json
+from typing import Annotated, Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import Select, String, tuple_, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+# Параметры списков в маршрутах: limit < 1 ломает поиск последней записи страницы, а skip < 0 - срез списка
+Skip = Annotated[int, Query(ge=0)]
+Limit = Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)]
+
+
+class Page(list):
+    """Список записей страницы с курсором на следующую страницу"""
+
+    def __init__(self, records=(), next_cursor: Optional[str] = None):
+        super().__init__(records)
+        self.next_cursor = next_cursor
+
+
+def encode_cursor(created_at: str, pk: int) -> str:
+    raw = json.dumps([created_at, pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, pk = json.loads(raw)
+        if not isinstance(created_at, str) or not isinstance(pk, int):
+            raise ValueError(cursor)
+    # TypeError - JSON без пары значений, например число или строка
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    return created_at, pk
+
+
+async def paginate(
+    db: AsyncSession,
+    stmt: Select,
+    created_at: InstrumentedAttribute,
+    pk: InstrumentedAttribute,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Page:
+    """
+    Страница, упорядоченная по (created_at, pk).
+
+    При переданном cursor skip игнорируется и выборка продолжается строго после
+    последней записи предыдущей страницы, иначе работает старый offset/limit.
+    created_at сравнивается в том виде, в котором хранится в БД, чтобы курсор
+    не зависел от формата сериализации datetime.
+    """
+    created_at_raw = type_coerce(created_at, String)
+    stmt = stmt.add_columns(created_at_raw.label("cursor_created_at")).order_by(created_at, pk)
+
+    if cursor is not None:
+        stmt = stmt.where(tuple_(created_at_raw, pk) > tuple_(*decode_cursor(cursor)))
+    elif skip:
+        stmt = stmt.offset(skip)
+
+    rows = (await db.execute(stmt.limit(limit + 1))).all()
+    records: List = [row[0] for row in rows[:limit]]
+    next_cursor = None
+
+    if len(rows) > limit:
+        last_record, last_created_at = rows[limit - 1]
+        next_cursor = encode_cursor(last_created_at, getattr(last_record, pk.key))
+
+    return Page(records, next_cursor=next_cursor)
+
+
+def paginate_list(
+    records: Sequence[Tuple[str, Any]],
+    pk: str,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Page:
+    """
+    Та же страница, что и у paginate, для списка уже прочитанных записей: пары
+    (created_at в виде из БД, запись), упорядоченные по (created_at, pk).
+    """
+    if cursor is not None:
+        after = decode_cursor(cursor)
+        records = [item for item in records if (item[0], getattr(item[1], pk)) > after]
+    elif skip:
+        records = records[skip:]
+
+    next_cursor = None
+    if len(records) > limit:
+        last_created_at, last_record = records[limit - 1]
+        next_cursor = encode_cursor(last_created_at, getattr(last_record, pk))
+
+    return Page([record for _, record in records[:limit]], next_cursor=next_cursor)
+
+
+def set_next_cursor(response: Response, page: Page) -> Page:
+    if page.next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+
+    return page
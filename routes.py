@@ -1,200 +1,558 @@
+import os
 from enum import Enum
-from typing import List, Annotated
-from fastapi import Depends
-from crud import BoardCRUD
+from typing import List, Annotated, Optional
+from fastapi import Depends, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketException, status
+from fastapi.responses import FileResponse, StreamingResponse
+import attachments
+from auth.helpers import get_user_by_token
+from board_events import SSE_MEDIA_TYPE, board_events, sse_stream, websocket_stream
+from board_export import NDJSON_MEDIA_TYPE, gzip_stream
+from board_import import IMPORT_BATCH_SIZE, gunzip_stream
+from crud import BOARD_RELATIONS, TASK_RELATIONS, BoardCRUD
+from db import DbSession
+from etag import ATTACHMENT_CACHE_CONTROL, board_etag, cache_headers, etag_matches, not_modified
+from fieldsets import Fieldset, fieldset_query, render
 from init import app
+from metrics import METRICS_MEDIA_TYPE, render as render_metrics
+from pagination import Limit, Skip, set_next_cursor
 from schemas import (
     BoardAccessCreateSchema,
+    AttachmentSchema,
     BoardAccessSchema,
     BoardSchema,
     BoardCreateSchema,
     BoardUpdateSchema,
     CommentSchema,
     CommentCreateSchema,
+    ImportFormat,
+    ImportResultSchema,
+    SearchHitSchema,
     StatusSchema,
     StatusCreateSchema,
     StatusUpdateSchema,
+    TagCreateSchema,
+    TagMatch,
+    TagSchema,
+    TagUsageSchema,
     TaskSchema,
+    TaskBatchUpdateItemSchema,
+    TaskBatchUpdateResultSchema,
+    TaskBulkCreatedSchema,
     TaskCreateSchema,
     TaskUpdateSchema,
 )
 
+TaskFieldset = Annotated[Optional[Fieldset], Depends(fieldset_query(TaskSchema, TASK_RELATIONS))]
+BoardFieldset = Annotated[Optional[Fieldset], Depends(fieldset_query(BoardSchema, BOARD_RELATIONS))]
+
+
 class Tags:
     board_access: List[str | Enum] = ["Board access"]
     board: List[str | Enum] = ["Board"]
     status: List[str | Enum] = ["Status"]
     task: List[str | Enum] = ["Task"]
     comment: List[str | Enum] = ["Comment"]
+    attachment: List[str | Enum] = ["Attachment"]
+    search: List[str | Enum] = ["Search"]
+    tag: List[str | Enum] = ["Tag"]
 
 
 @app.post("/boards/{board_id}/accesses/", tags=Tags.board_access)
-def create_board_access(
+async def create_board_access(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
     board_id: int,
     board_access: BoardAccessCreateSchema, 
 ):
-    return crud.shared(board_id=board_id, board_access=board_access)
+    return await crud.shared(board_id=board_id, board_access=board_access)
 
 
 @app.get("/boards/{board_id}/accesses/", response_model=List[BoardAccessSchema], tags=Tags.board_access)
-def read_board_accesses(
+async def read_board_accesses(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    response: Response,
     board_id: int,
-    skip: int = 0,
-    limit: int = 100,
+    skip: Skip = 0,
+    limit: Limit = 100,
+    cursor: Optional[str] = None,
 ):
-    return crud.access.get_all(board_id, skip=skip, limit=limit)
+    return set_next_cursor(response, await crud.access.get_all(board_id, skip=skip, limit=limit, cursor=cursor))
 
 
 @app.delete("/boards/{board_id}/accesses/", tags=Tags.board_access)
-def delete_board_access(
+async def delete_board_access(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
     board_id: int,
     access_id: int,
 ):
-    return crud.access.delete(board_id=board_id, access_id=access_id)
+    return await crud.access.delete(board_id=board_id, access_id=access_id)
 
 
 @app.post("/boards/", response_model=BoardSchema, tags=Tags.board)
-def create_board(board: BoardCreateSchema, crud: Annotated[BoardCRUD, Depends(BoardCRUD)]):
-    return crud.create(board)
+async def create_board(board: BoardCreateSchema, crud: Annotated[BoardCRUD, Depends(BoardCRUD)]):
+    return await crud.create(board)
 
 
 @app.get("/boards/", response_model=List[BoardSchema], tags=Tags.board)
-def read_boards(
+async def read_boards(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    fieldset: BoardFieldset,
+    skip: Skip = 0,
+    limit: Limit = 100,
+    cursor: Optional[str] = None,
 ):
-    return crud.get_all(skip=skip, limit=limit)
+    page = await crud.get_all(skip=skip, limit=limit, cursor=cursor, fieldset=fieldset)
+    return render(response, set_next_cursor(response, page), fieldset)
 
 
 @app.get("/boards/{board_id}", response_model=BoardSchema, tags=Tags.board)
-def read_board(board_id: int, crud: Annotated[BoardCRUD, Depends(BoardCRUD)]):
-    return crud.get(board_id)
+async def read_board(
+    board_id: int,
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    response: Response,
+    request: Request,
+    fieldset: BoardFieldset,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    etag = board_etag(board_id, await crud.get_version(board_id), request.query_params.multi_items())
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    response.headers.update(cache_headers(etag))
+    return render(response, await crud.get(board_id, fieldset=fieldset), fieldset)
+
+
+@app.get("/boards/{board_id}/export", response_class=StreamingResponse, tags=Tags.board)
+async def export_board(
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    board_id: int,
+    gzip: bool = False,
+):
+    chunks = await crud.export(board_id)
+    filename = f"board-{board_id}.ndjson"
+
+    if gzip:
+        return StreamingResponse(
+            gzip_stream(chunks),
+            media_type="application/gzip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}.gz"'},
+        )
+
+    return StreamingResponse(
+        chunks,
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/boards/{board_id}/events", response_class=StreamingResponse, tags=Tags.board)
+async def board_events_sse(crud: Annotated[BoardCRUD, Depends(BoardCRUD)], board_id: int):
+    subscriber = await crud.subscribe(board_id)
+
+    return StreamingResponse(
+        sse_stream(board_events, subscriber),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/boards/{board_id}/events")
+async def board_events_websocket(
+    websocket: WebSocket,
+    db: DbSession,
+    board_id: int,
+    token: Optional[str] = None,
+):
+    # Браузер не передает заголовки в WebSocket, поэтому токен можно передать параметром token
+    authorization = websocket.headers.get("authorization", "")
+    if token is None and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+
+    try:
+        if token is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+        crud = BoardCRUD(db=db, current_user=await get_user_by_token(db, token))
+        subscriber = await crud.subscribe(board_id)
+    except HTTPException as e:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+
+    await websocket_stream(websocket, board_events, subscriber)
+
+
+@app.post("/boards/{board_id}/import", response_model=ImportResultSchema, tags=Tags.board)
+async def import_board(
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    board_id: int,
+    request: Request,
+    format: ImportFormat = "ndjson",
+    gzip: bool = False,
+    batch_size: Annotated[int, Query(ge=1, le=10000)] = IMPORT_BATCH_SIZE,
+):
+    # Тело - файл экспорта или CSV как есть, без multipart; разбирается по мере получения
+    chunks = request.stream()
+    if gzip:
+        chunks = gunzip_stream(chunks)
+
+    return await crud.import_file(board_id, chunks, format=format, batch_size=batch_size)
 
 
 @app.delete("/boards/{board_id}", tags=Tags.board)
-def delete_board(board_id: int, crud: Annotated[BoardCRUD, Depends(BoardCRUD)]):
-    return crud.delete(board_id=board_id)
+async def delete_board(board_id: int, crud: Annotated[BoardCRUD, Depends(BoardCRUD)]):
+    return await crud.delete(board_id=board_id)
 
 
 @app.put("/boards/{board_id}", response_model=BoardSchema, tags=Tags.board)
-def update_board(
+async def update_board(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
     board_id: int,
     board: BoardUpdateSchema,
 ):
-    return crud.update(board_id=board_id, data=board)
+    return await crud.update(board_id=board_id, data=board)
 
 
 @app.post("/boards/{board_id}/statuses/", response_model=StatusSchema, tags=Tags.status)
-def create_status(
+async def create_status(
     status: StatusCreateSchema,
     board_id: int,
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
 ):
-    return crud.add_status(board_id=board_id, status=status)
+    return await crud.add_status(board_id=board_id, status=status)
 
 
 @app.get("/boards/{board_id}/statuses/", response_model=List[StatusSchema], tags=Tags.status)
-def read_statuses(
+async def read_statuses(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    response: Response,
+    request: Request,
     board_id: int,
-    skip: int = 0,
-    limit: int = 100,
+    skip: Skip = 0,
+    limit: Limit = 100,
+    cursor: Optional[str] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ):
-    return crud.status.get_all(board_id=board_id, skip=skip, limit=limit)
+    etag = board_etag(board_id, await crud.get_version(board_id), request.query_params.multi_items())
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
+    response.headers.update(cache_headers(etag))
+    return set_next_cursor(response, await crud.status.get_all(board_id=board_id, skip=skip, limit=limit, cursor=cursor))
 
-@app.get("/boards/{board_id}/statuses/{status_id}", response_model=List[StatusSchema], tags=Tags.status)
-def read_status(
+
+@app.get("/boards/{board_id}/statuses/{status_id}", response_model=StatusSchema, tags=Tags.status)
+async def read_status(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
     board_id: int,
     status_id: int,
 ):
-    return crud.status.get(board_id=board_id, status_id=status_id)
+    return await crud.status.get(board_id=board_id, status_id=status_id)
 
 
-@app.delete("/boards/{board_id}/statuses/{status_id}", response_model=List[StatusSchema], tags=Tags.status)
-def delete_status_by_id(
+@app.delete("/boards/{board_id}/statuses/{status_id}", tags=Tags.status)
+async def delete_status_by_id(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
     board_id: int,
     status_id: int,
 ):
-    return crud.status.delete(board_id=board_id, status_id=status_id)
+    return await crud.status.delete(board_id=board_id, status_id=status_id)
 
 
-@app.put("/boards/{board_id}/statuses/{status_id}", response_model=List[StatusSchema], tags=Tags.status)
-def update_status(
+@app.put("/boards/{board_id}/statuses/{status_id}", response_model=StatusSchema, tags=Tags.status)
+async def update_status(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
     board_id: int,
     status_id: int,
     status: StatusUpdateSchema,
 ):
-    return crud.status.update(board_id=board_id, status_id=status_id, data=status)
+    return await crud.status.update(board_id=board_id, status_id=status_id, data=status)
 
 
 @app.post("/boards/{board_id}/tasks/", response_model=TaskSchema, tags=Tags.task)
-def create_task(
+async def create_task(
     task: TaskCreateSchema,
     board_id: int,
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
 ):
-    return crud.add_task(board_id, task)
+    return await crud.add_task(board_id, task)
+
+
+@app.post("/boards/{board_id}/tasks/bulk", response_model=TaskBulkCreatedSchema, tags=Tags.task)
+async def create_tasks_bulk(
+    tasks: List[TaskCreateSchema],
+    board_id: int,
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+):
+    return TaskBulkCreatedSchema(task_ids=await crud.task.create_many(board_id=board_id, tasks=tasks))
+
+
+@app.patch("/boards/{board_id}/tasks/batch", response_model=List[TaskBatchUpdateResultSchema], tags=Tags.task)
+async def update_tasks_batch(
+    items: List[TaskBatchUpdateItemSchema],
+    board_id: int,
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+):
+    return await crud.task.update_many(board_id=board_id, items=items)
 
 
 @app.get("/boards/{board_id}/tasks/", response_model=List[TaskSchema], tags=Tags.task)
-def read_tasks(
+async def read_tasks(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    response: Response,
+    request: Request,
     board_id: int,
-    skip: int = 0,
-    limit: int = 100,
+    fieldset: TaskFieldset,
+    skip: Skip = 0,
+    limit: Limit = 100,
+    cursor: Optional[str] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ):
-    return crud.task.get_all(board_id=board_id, skip=skip, limit=limit)
+    etag = board_etag(board_id, await crud.get_version(board_id), request.query_params.multi_items())
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
+    response.headers.update(cache_headers(etag))
+    page = await crud.task.get_all(board_id=board_id, skip=skip, limit=limit, cursor=cursor, fieldset=fieldset)
+    return render(response, set_next_cursor(response, page), fieldset)
 
-@app.get("/boards/{board_id}/tasks/{task_id}", response_model=List[TaskSchema], tags=Tags.task)
-def read_task(
+
+@app.get("/boards/{board_id}/tasks/{task_id}", response_model=TaskSchema, tags=Tags.task)
+async def read_task(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    response: Response,
     board_id: int,
     task_id: int,
+    fieldset: TaskFieldset,
 ):
-    return crud.task.get(board_id=board_id, task_id=task_id)
+    return render(response, await crud.task.get(board_id=board_id, task_id=task_id, fieldset=fieldset), fieldset)
 
 
-@app.delete("/boards/{board_id}/tasks/{task_id}", response_model=List[TaskSchema], tags=Tags.task)
-def delete_task(
+@app.delete("/boards/{board_id}/tasks/{task_id}", tags=Tags.task)
+async def delete_task(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
     board_id: int,
     task_id: int,
 ):
-    return crud.task.delete(board_id=board_id, task_id=task_id)
+    return await crud.task.delete(board_id=board_id, task_id=task_id)
 
 
-@app.put("/boards/{board_id}/tasks/{task_id}", response_model=List[TaskSchema], tags=Tags.task)
-def update_task(
+@app.put("/boards/{board_id}/tasks/{task_id}", response_model=TaskSchema, tags=Tags.task)
+async def update_task(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
     board_id: int,
     task_id: int,
     task: TaskUpdateSchema,
 ):
-    return crud.task.update(board_id=board_id, task_id=task_id, data=task)
+    return await crud.task.update(board_id=board_id, task_id=task_id, data=task)
 
 
 @app.post("/boards/{board_id}/tasks/{task_id}/comments/", response_model=CommentSchema, tags=Tags.comment)
-def create_comment(
+async def create_comment(
     board_id: int, task_id: int, comment: CommentCreateSchema, crud: Annotated[BoardCRUD, Depends(BoardCRUD)]
 ):
-    return crud.task.add_comment(board_id=board_id, task_id=task_id, comment=comment)
+    return await crud.task.add_comment(board_id=board_id, task_id=task_id, comment=comment)
 
 
 @app.get("/boards/{board_id}/tasks/{task_id}/comments/", response_model=List[CommentSchema], tags=Tags.comment)
-def read_comments(
+async def read_comments(
     crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    response: Response,
     board_id: int,
     task_id: int,
-    skip: int = 0,
-    limit: int = 100,
+    skip: Skip = 0,
+    limit: Limit = 100,
+    cursor: Optional[str] = None,
 ):
-    return crud.task.comment.get_all(board_id=board_id, task_id=task_id, skip=skip, limit=limit)
+    return set_next_cursor(
+        response,
+        await crud.task.comment.get_all(board_id=board_id, task_id=task_id, skip=skip, limit=limit, cursor=cursor),
+    )
+
+
+@app.post(
+    "/boards/{board_id}/tasks/{task_id}/comments/{comment_id}/attachments/",
+    response_model=AttachmentSchema,
+    tags=Tags.attachment,
+)
+async def upload_attachment(
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    request: Request,
+    board_id: int,
+    task_id: int,
+    comment_id: int,
+    filename: Annotated[str, Query(min_length=1, max_length=255)],
+    content_type: Annotated[Optional[str], Header()] = None,
+    content_length: Annotated[Optional[int], Header()] = None,
+):
+    # Тело - сам файл, без multipart: пишется на диск по частям, не попадая в память целиком
+    if content_length is not None and content_length > attachments.ATTACHMENT_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"File is larger than {attachments.ATTACHMENT_MAX_BYTES} bytes",
+        )
+
+    return await crud.task.comment.attachment.upload(
+        board_id, task_id, comment_id, request.stream(), filename=filename, content_type=content_type
+    )
+
+
+@app.get(
+    "/boards/{board_id}/tasks/{task_id}/comments/{comment_id}/attachments/",
+    response_model=List[AttachmentSchema],
+    tags=Tags.attachment,
+)
+async def read_attachments(
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    response: Response,
+    board_id: int,
+    task_id: int,
+    comment_id: int,
+    skip: Skip = 0,
+    limit: Limit = 100,
+    cursor: Optional[str] = None,
+):
+    return set_next_cursor(
+        response,
+        await crud.task.comment.attachment.get_all(
+            board_id, task_id, comment_id, skip=skip, limit=limit, cursor=cursor
+        ),
+    )
+
+
+@app.get(
+    "/boards/{board_id}/tasks/{task_id}/comments/{comment_id}/attachments/{attachment_id}",
+    response_class=FileResponse,
+    tags=Tags.attachment,
+)
+async def download_attachment(
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    board_id: int,
+    task_id: int,
+    comment_id: int,
+    attachment_id: int,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    record = await crud.task.comment.attachment.get(board_id, task_id, comment_id, attachment_id)
+    if record.sha256 is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File is not stored")
+
+    # Содержимое вложения не меняется: хеш - сильный ETag, кэшировать можно бессрочно
+    etag = f'"{record.sha256}"'
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, ATTACHMENT_CACHE_CONTROL)
+    headers = {
+        **cache_headers(etag, ATTACHMENT_CACHE_CONTROL),
+        "Content-Disposition": attachments.content_disposition(record.filename or "file"),
+        "X-Content-Type-Options": "nosniff",
+    }
+
+    if attachments.ATTACHMENTS_ACCEL_REDIRECT:
+        headers["X-Accel-Redirect"] = attachments.ATTACHMENTS_ACCEL_REDIRECT + record.file_path
+        return Response(media_type=record.content_type, headers=headers)
+
+    # Range и If-Range обрабатывает FileResponse; без Range сервер с http.response.pathsend отдает файл сам
+    path = attachments.full_path(record.file_path)
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File is missing")
+
+    return FileResponse(path, media_type=record.content_type, headers=headers, stat_result=stat_result)
+
+
+@app.delete("/boards/{board_id}/tasks/{task_id}/comments/{comment_id}/attachments/{attachment_id}", tags=Tags.attachment)
+async def delete_attachment(
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    board_id: int,
+    task_id: int,
+    comment_id: int,
+    attachment_id: int,
+):
+    return await crud.task.comment.attachment.delete(board_id, task_id, comment_id, attachment_id)
+
+
+@app.post("/boards/{board_id}/tasks/{task_id}/tags/", response_model=TagSchema, tags=Tags.tag)
+async def add_task_tag(
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    board_id: int,
+    task_id: int,
+    tag: TagCreateSchema,
+):
+    return await crud.task.add_tag(board_id=board_id, task_id=task_id, tag=tag)
+
+
+@app.delete("/boards/{board_id}/tasks/{task_id}/tags/{tag_id}", tags=Tags.tag)
+async def remove_task_tag(
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    board_id: int,
+    task_id: int,
+    tag_id: int,
+):
+    return await crud.task.remove_tag(board_id=board_id, task_id=task_id, tag_id=tag_id)
+
+
+@app.post("/boards/{board_id}/tags/", response_model=TagSchema, tags=Tags.tag)
+async def create_tag(
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    board_id: int,
+    tag: TagCreateSchema,
+):
+    return await crud.task.tag.create(tag=tag, board_id=board_id)
+
+
+@app.get("/boards/{board_id}/tags/", response_model=List[TagUsageSchema], tags=Tags.tag)
+async def read_tags(
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    board_id: int,
+    skip: Skip = 0,
+    limit: Limit = 100,
+):
+    return await crud.task.tag.get_all(board_id=board_id, skip=skip, limit=limit)
+
+
+@app.get("/boards/{board_id}/tags/tasks", response_model=List[TaskSchema], tags=Tags.tag)
+async def read_tasks_by_tags(
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    response: Response,
+    board_id: int,
+    tag: Annotated[List[str], Query(min_length=1)],
+    fieldset: TaskFieldset,
+    match: TagMatch = "all",
+    skip: Skip = 0,
+    limit: Limit = 100,
+    cursor: Optional[str] = None,
+):
+    page = await crud.task.get_by_tags(
+        board_id=board_id,
+        labels=tag,
+        match=match,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        fieldset=fieldset,
+    )
+    return render(response, set_next_cursor(response, page), fieldset)
+
+
+@app.delete("/boards/{board_id}/tags/{tag_id}", tags=Tags.tag)
+async def delete_tag(
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    board_id: int,
+    tag_id: int,
+):
+    return await crud.task.tag.delete(board_id=board_id, tag_id=tag_id)
+
+
+@app.get("/boards/{board_id}/search", response_model=List[SearchHitSchema], tags=Tags.search)
+async def search_board(
+    crud: Annotated[BoardCRUD, Depends(BoardCRUD)],
+    board_id: int,
+    q: Annotated[str, Query(min_length=1, max_length=200)],
+    skip: Skip = 0,
+    limit: int = Query(20, ge=1, le=100),
+):
+    return await crud.search.search(board_id=board_id, q=q, skip=skip, limit=limit)
+
+
+@app.get("/metrics", response_class=Response, include_in_schema=False)
+async def read_metrics():
+    # Формат Prometheus; эндпоинт для сборщика метрик, наружу его отдавать не нужно
+    return Response(render_metrics(), media_type=METRICS_MEDIA_TYPE)
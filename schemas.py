@@ -1,6 +1,6 @@
 from datetime import datetime
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 
 
 # Схема для пользователя
@@ -91,8 +91,23 @@ class TaskUpdateSchema(TaskBaseSchema):
     status_id: Optional[int] = None
 
 
+class TaskBulkCreatedSchema(BaseModel):
+    task_ids: List[int]
+
+
+class TaskBatchUpdateItemSchema(TaskUpdateSchema):
+    task_id: int
+
+
+class TaskBatchUpdateResultSchema(BaseModel):
+    task_id: int
+    updated: bool
+    detail: Optional[str] = None
+
+
 class TaskSchema(TaskBaseSchema):
     task_id: int
+    status_id: int
     created_at: datetime
 
     status: "StatusSchema"
@@ -103,6 +118,20 @@ class TaskSchema(TaskBaseSchema):
         from_attributes = True
 
 
+# Схема для результата поиска
+class SearchHitSchema(BaseModel):
+    task_id: int
+    # None - совпадение в самой задаче
+    comment_id: Optional[int] = None
+    title: str
+    # HTML: текст экранирован, совпадения в <mark></mark>
+    snippet: str
+    rank: float
+
+    class Config:
+        from_attributes = True
+
+
 # Схема для доступа к доске
 class BoardAccessBaseSchema(BaseModel):
     user_id: int
@@ -153,6 +182,11 @@ class AttachmentCreateSchema(AttachmentBaseSchema):
 
 class AttachmentSchema(AttachmentBaseSchema):
     attachment_id: int
+    # Пустые у вложений, созданных до хранилища файлов
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+    size: Optional[int] = None
+    sha256: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -161,8 +195,7 @@ class AttachmentSchema(AttachmentBaseSchema):
 
 # Схема для тега
 class TagBaseSchema(BaseModel):
-    label: str
-    # task_id: int
+    label: str = Field(min_length=1, max_length=50)
 
 
 class TagCreateSchema(TagBaseSchema):
@@ -177,6 +210,38 @@ class TagSchema(TagBaseSchema):
         from_attributes = True
 
 
+class TagUsageSchema(TagSchema):
+    task_count: int
+
+
+# all - у задачи есть все теги (AND), any - хотя бы один (OR)
+TagMatch = Literal["all", "any"]
+
+
+# Схема для результата импорта доски
+ImportFormat = Literal["ndjson", "csv"]
+
+
+class ImportLineErrorSchema(BaseModel):
+    line: int
+    detail: str
+
+
+class ImportResultSchema(BaseModel):
+    # Номер последней прочитанной строки
+    lines: int = 0
+    # Созданные записи; статусы и теги - только новые, найденные по имени не считаются
+    statuses: int = 0
+    tags: int = 0
+    tasks: int = 0
+    task_tags: int = 0
+    comments: int = 0
+    attachments: int = 0
+    errors_total: int = 0
+    # Первые IMPORT_MAX_ERRORS ошибок
+    errors: List[ImportLineErrorSchema] = []
+
+
 # Схема для лога действий пользователя
 class UserActionLogBaseSchema(BaseModel):
     action_description: str
@@ -0,0 +1,186 @@
+# SQL одного HTTP-запроса: число и время запросов к БД, заголовок Server-Timing, журнал медленных запросов и бюджет
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Tuple
+
+from sqlalchemy import Engine, event
+
+
+SQL_TIMING_ENABLED = os.getenv("SQL_TIMING_ENABLED", "1") == "1"
+# Пороги журнала в миллисекундах: запрос целиком и отдельный SQL
+SQL_SLOW_REQUEST_MS = float(os.getenv("SQL_SLOW_REQUEST_MS", 500))
+SQL_SLOW_STATEMENT_MS = float(os.getenv("SQL_SLOW_STATEMENT_MS", 100))
+# Бюджет запросов к БД на HTTP-запрос (0 - без бюджета). Превышение пишется в журнал, а в строгом
+# режиме приложение после ответа выбрасывает QueryBudgetExceeded - так тесты ловят N+1
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", 0))
+SQL_QUERY_BUDGET_STRICT = os.getenv("SQL_QUERY_BUDGET_STRICT", "0") == "1"
+SQL_LOG_MAX_LENGTH = 1000
+
+# Потоки событий открыты минутами, их длительность - не медленный запрос
+STREAMING_MEDIA_TYPES = (b"text/event-stream",)
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"\?(?:, \?)+")
+_ROWS = re.compile(r"\(\?(?:, \.\.\.)?\)(?:, \(\?(?:, \.\.\.)?\))+")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def normalize_sql(statement: str) -> str:
+    """Форма запроса без значений: литералы и списки параметров IN и VALUES схлопываются"""
+    sql = _WHITESPACE.sub(" ", statement).strip()
+    sql = _LITERAL.sub("?", sql)
+    sql = _PLACEHOLDERS.sub("?, ...", sql)
+    sql = _ROWS.sub("(?, ...), ...", sql)
+    return sql[:SQL_LOG_MAX_LENGTH]
+
+
+class RequestStats:
+    __slots__ = ("method", "path", "scope", "statements", "sql_seconds", "budget", "strict", "executed")
+
+    def __init__(self, scope: dict, budget: int, strict: bool):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.scope = scope
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.budget = budget
+        self.strict = strict
+        # Тексты SQL копятся только под строгим бюджетом - для сообщения об ошибке
+        self.executed = [] if budget and strict else None
+
+    @property
+    def route(self) -> str:
+        # Шаблон маршрута появляется в scope после роутинга: /boards/{board_id}, а не /boards/42
+        route = self.scope.get("route")
+        return getattr(route, "path", self.path)
+
+    @property
+    def over_budget(self) -> bool:
+        return bool(self.budget) and self.statements > self.budget
+
+    def server_timing(self, seconds: float) -> bytes:
+        return (
+            f'db;dur={self.sql_seconds * 1000:.1f};desc="{self.statements} queries", app;dur={seconds * 1000:.1f}'
+        ).encode()
+
+
+# Статистика текущего HTTP-запроса: контекст наследуют задачи запроса и greenlet'ы SQLAlchemy
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("sql_timing_request", default=None)
+_budget_override: ContextVar[Optional[Tuple[int, bool]]] = ContextVar("sql_timing_budget", default=None)
+
+
+@contextmanager
+def query_budget(limit: int, strict: bool = True) -> Iterator[None]:
+    """
+    Бюджет для запросов, выполненных внутри блока, - для тестов с приложением в том же процессе:
+
+        with query_budget(3):
+            await client.get("/boards/1/tasks/")
+    """
+    token = _budget_override.set((limit, strict))
+    try:
+        yield
+    finally:
+        _budget_override.reset(token)
+
+
+def instrument(engine: Engine):
+    """Счетчики на событиях движка; вне HTTP-запроса (скрипты, фоновая запись журнала) они ничего не делают"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_request.get()
+        if stats is None:
+            return
+
+        stats.statements += 1
+        if stats.executed is not None:
+            stats.executed.append(statement)
+        conn.info.setdefault("sql_timing_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_request.get()
+        if stats is None:
+            return
+
+        elapsed = time.perf_counter() - conn.info["sql_timing_started"].pop()
+        stats.sql_seconds += elapsed
+        if elapsed * 1000 >= SQL_SLOW_STATEMENT_MS:
+            logger.warning(
+                "Slow SQL %.1f ms in %s %s: %s", elapsed * 1000, stats.method, stats.route, normalize_sql(statement)
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # Упавший запрос не доходит до after_cursor_execute, его отметка времени снимается здесь
+        connection = exception_context.connection
+        if current_request.get() is not None and connection is not None:
+            started = connection.info.get("sql_timing_started")
+            if started:
+                started.pop()
+
+
+class SqlTimingMiddleware:
+    """
+    ASGI middleware: Server-Timing считается на момент отправки заголовков, поэтому у потоковых
+    ответов (экспорт, вложения) в него не входит SQL, выполненный во время отдачи тела.
+    Журнал медленных запросов и проверка бюджета выполняются после ответа и видят все.
+    Строгий бюджет не прерывает запрос на середине, а роняет его после ответа: в тестах
+    исключение получает клиент (httpx.ASGITransport, TestClient), а данные остаются согласованными.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SQL_TIMING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope, *(_budget_override.get() or (SQL_QUERY_BUDGET, SQL_QUERY_BUDGET_STRICT)))
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        streaming = False
+
+        async def send_with_timing(message):
+            nonlocal streaming
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                streaming = any(name == b"content-type" and value.startswith(STREAMING_MEDIA_TYPES) for name, value in headers)
+                headers.append((b"server-timing", stats.server_timing(time.perf_counter() - started)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            if not streaming and elapsed_ms >= SQL_SLOW_REQUEST_MS:
+                logger.warning(
+                    "Slow request %s %s: %.1f ms, %d queries, %.1f ms in SQL",
+                    stats.method, stats.route, elapsed_ms, stats.statements, stats.sql_seconds * 1000,
+                )
+            if stats.over_budget and not stats.strict:
+                logger.warning(
+                    "Query budget exceeded in %s %s: %d queries, budget %d",
+                    stats.method, stats.route, stats.statements, stats.budget,
+                )
+
+        if stats.over_budget and stats.strict:
+            statements = "\n".join(f"  {normalize_sql(statement)}" for statement in stats.executed)
+            raise QueryBudgetExceeded(
+                f"{stats.method} {stats.route} made {stats.statements} queries, budget {stats.budget}:\n{statements}"
+            )
@@ -0,0 +1,91 @@
+"""
+Общие фикстуры: временная БД со схемой из миграций и приложение через httpx.ASGITransport.
+
+ASGITransport вызывает приложение в задаче теста, поэтому контекст (sql_timing.query_budget)
+доходит до обработчиков, а исключения приложения - до теста.
+"""
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# БД и хранилище вложений задаются до импорта приложения: db.py читает их при импорте
+DIRECTORY = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DIRECTORY, 'test.db')}"
+os.environ["ATTACHMENTS_DIR"] = os.path.join(DIRECTORY, "attachments")
+
+from migrations import migrate  # noqa: E402
+
+migrate(os.environ["DATABASE_URL"])
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app import app  # noqa: E402
+from auth.helpers import create_access_token  # noqa: E402
+from board_cache import board_cache  # noqa: E402
+from db import engine  # noqa: E402
+from models import BoardModel, CommentModel, StatusModel, TagModel, TaskModel, TaskTagModel, UserModel  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def clear_board_cache():
+    # Попадание в кэш статусов меняет число запросов, тесты начинают с холодного кэша
+    board_cache.clear()
+    yield
+    board_cache.clear()
+
+
+def create_user() -> tuple:
+    """(user_id, заголовки); пароль не нужен, токен выдается напрямую - без bcrypt"""
+    username = f"user-{uuid.uuid4().hex[:12]}"
+    with engine.begin() as conn:
+        user_id = conn.execute(insert(UserModel).values(username=username, password="x")).inserted_primary_key[0]
+
+    return user_id, {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+def create_board(user_id: int, tasks: int = 1, comments: int = 1, tags: int = 1, statuses: int = 1) -> dict:
+    """Доска с задачами, у каждой задачи comments комментариев и tags тегов; возвращает id созданного"""
+    with engine.begin() as conn:
+        board_id = conn.execute(insert(BoardModel).values(user_id=user_id, title="board")).inserted_primary_key[0]
+        status_ids = [
+            conn.execute(insert(StatusModel).values(board_id=board_id, name=f"status {s}")).inserted_primary_key[0]
+            for s in range(statuses)
+        ]
+        tag_ids = [
+            conn.execute(insert(TagModel).values(board_id=board_id, label=f"tag{t}")).inserted_primary_key[0]
+            for t in range(tags)
+        ]
+        task_ids = [
+            conn.execute(
+                insert(TaskModel).values(board_id=board_id, status_id=status_ids[t % statuses], title=f"task {t}")
+            ).inserted_primary_key[0]
+            for t in range(tasks)
+        ]
+        if comments:
+            conn.execute(
+                insert(CommentModel),
+                [{"task_id": task_id, "user_id": user_id, "content": f"comment {c}"} for task_id in task_ids for c in range(comments)],
+            )
+        if tag_ids:
+            conn.execute(insert(TaskTagModel), [{"task_id": task_id, "tag_id": tag_id} for task_id in task_ids for tag_id in tag_ids])
+
+    return {"board_id": board_id, "status_ids": status_ids, "task_ids": task_ids, "tag_ids": tag_ids}
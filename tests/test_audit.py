@@ -0,0 +1,154 @@
+"""
+Гарантии журнала действий (audit.AuditLog): stop() дописывает принятые события, очередь
+ограничена политикой overflow, события откатанной транзакции в журнал не попадают.
+"""
+import uuid
+
+import pytest
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+
+import audit
+from audit import COMMITTED_EVENTS, AuditLog
+from conftest import create_board, create_user
+from db import AsyncSessionLocal, async_engine, engine
+from models import UserActionLogModel, UserModel
+
+
+pytestmark = pytest.mark.anyio
+
+
+def new_action() -> str:
+    return f"test.{uuid.uuid4().hex[:12]}"
+
+
+def logged(action: str) -> int:
+    with engine.connect() as conn:
+        return conn.scalar(
+            select(func.count())
+            .select_from(UserActionLogModel)
+            .where(UserActionLogModel.action_description.contains(f'"action": "{action}"'))
+        )
+
+
+def events(user_id: int, action: str, count: int) -> list:
+    info = {}
+    for i in range(count):
+        audit.record(info, user_id, action, n=i)
+    return info[audit.PENDING_EVENTS]
+
+
+def audit_log(**options) -> AuditLog:
+    log = AuditLog(**options)
+    log.engine = async_engine
+    return log
+
+
+async def test_stop_drains_accepted_events():
+    user_id, _ = create_user()
+    action = new_action()
+    # Ни размер пачки, ни интервал не наступят: все события допишет stop()
+    log = audit_log(batch_size=1000, flush_interval=3600)
+    log.start()
+
+    await log.publish(events(user_id, action, 25))
+    assert logged(action) == 0
+
+    await log.stop()
+    assert logged(action) == 25
+    assert (log.enqueued, log.written, log.dropped, log.failed) == (25, 25, 0, 0)
+
+
+async def test_events_after_stop_are_written_immediately():
+    user_id, _ = create_user()
+    action = new_action()
+    log = audit_log(flush_interval=3600)
+    log.start()
+    await log.stop()
+
+    await log.publish(events(user_id, action, 3))
+    assert logged(action) == 3
+
+
+async def test_block_overflow_keeps_every_event():
+    user_id, _ = create_user()
+    action = new_action()
+    log = audit_log(batch_size=2, flush_interval=0.01, queue_size=2, overflow="block")
+    log.start()
+
+    # Очередь на 2 события: publish ждет, пока фоновая запись освободит место
+    await log.publish(events(user_id, action, 20))
+    await log.stop()
+
+    assert logged(action) == 20
+    assert (log.enqueued, log.dropped) == (20, 0)
+
+
+async def test_drop_overflow_discards_and_counts():
+    user_id, _ = create_user()
+    action = new_action()
+    log = audit_log(batch_size=1000, flush_interval=3600, queue_size=5, overflow="drop")
+    log.start()
+
+    # publish не уступает управление при drop: запись не успеет ничего забрать, лишнее отбрасывается
+    await log.publish(events(user_id, action, 12))
+    await log.stop()
+
+    assert (log.enqueued, log.dropped, log.written) == (5, 7, 5)
+    assert logged(action) == 5
+
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        AuditLog(overflow="spill")
+
+
+async def test_rolled_back_session_publishes_nothing():
+    user_id, _ = create_user()
+
+    async with AsyncSessionLocal() as db:
+        # Событие пишется внутри транзакции с изменениями, как в CRUD.log_action
+        await db.execute(update(UserModel).where(UserModel.user_id == user_id).values(password="y"))
+        audit.record(db.info, user_id, "test.rolled_back")
+        await db.rollback()
+        assert db.info.get(COMMITTED_EVENTS, []) == []
+
+        await db.execute(update(UserModel).where(UserModel.user_id == user_id).values(password="z"))
+        audit.record(db.info, user_id, "test.committed")
+        await db.commit()
+        assert [audit_event.action for audit_event in db.info[COMMITTED_EVENTS]] == ["test.committed"]
+
+
+async def test_failed_commit_leaves_no_log_entry(client):
+    user_id, headers = create_user()
+    board = create_board(user_id)
+    title = f"task {uuid.uuid4().hex}"
+
+    def fail_commit(session):
+        raise RuntimeError("commit failed")
+
+    event.listen(Session, "before_commit", fail_commit)
+    try:
+        with pytest.raises(RuntimeError, match="commit failed"):
+            await client.post(
+                f"/boards/{board['board_id']}/tasks/",
+                json={"title": title, "status_id": board["status_ids"][0]},
+                headers=headers,
+            )
+    finally:
+        event.remove(Session, "before_commit", fail_commit)
+
+    with engine.connect() as conn:
+        entries = conn.scalar(
+            select(func.count())
+            .select_from(UserActionLogModel)
+            .where(UserActionLogModel.user_id == user_id, UserActionLogModel.action_description.contains('"task.create"'))
+        )
+    assert entries == 0
+
+    # Тот же запрос с успешным commit попадает в журнал
+    response = await client.post(
+        f"/boards/{board['board_id']}/tasks/", json={"title": title, "status_id": board["status_ids"][0]}, headers=headers
+    )
+    assert response.status_code == 200
+    assert logged("task.create") >= 1
@@ -0,0 +1,82 @@
+"""
+board_cache живет в памяти одного воркера: запись из другого процесса (здесь - прямой SQL мимо CRUD)
+его не сбрасывает. Записи проверяются по БД, а ответы с ETag не собираются из записи другой версии доски.
+"""
+import pytest
+from sqlalchemy import delete, insert, update
+
+from board_cache import board_cache
+from conftest import create_board, create_user
+from db import engine
+from models import StatusModel
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def board(client):
+    user_id, headers = create_user()
+    board = create_board(user_id, statuses=2)
+    # Статусы доски попадают в кэш
+    response = await client.get(f"/boards/{board['board_id']}/statuses/", headers=headers)
+    assert response.status_code == 200
+    assert board_cache.get_statuses(board["board_id"]) is not None
+
+    return {**board, "headers": headers}
+
+
+def elsewhere(statement):
+    with engine.begin() as conn:
+        return conn.execute(statement)
+
+
+async def test_create_task_with_status_missing_from_cache(client, board):
+    status_id = elsewhere(insert(StatusModel).values(board_id=board["board_id"], name="new")).inserted_primary_key[0]
+
+    response = await client.post(
+        f"/boards/{board['board_id']}/tasks/", json={"title": "t", "status_id": status_id}, headers=board["headers"]
+    )
+
+    assert response.status_code == 200
+    assert response.json()["status"]["name"] == "new"
+
+
+async def test_create_task_with_status_deleted_elsewhere(client, board):
+    status_id = board["status_ids"][1]
+    elsewhere(delete(StatusModel).where(StatusModel.status_id == status_id))
+
+    response = await client.post(
+        f"/boards/{board['board_id']}/tasks/", json={"title": "t", "status_id": status_id}, headers=board["headers"]
+    )
+
+    assert response.status_code == 400
+
+
+async def test_update_task_with_status_deleted_elsewhere(client, board):
+    status_id = board["status_ids"][1]
+    elsewhere(delete(StatusModel).where(StatusModel.status_id == status_id))
+
+    response = await client.put(
+        f"/boards/{board['board_id']}/tasks/{board['task_ids'][0]}", json={"status_id": status_id}, headers=board["headers"]
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("url", ["/boards/{board_id}/statuses/", "/boards/{board_id}/tasks/", "/boards/{board_id}"])
+async def test_etag_never_labels_a_stale_body(client, board, url):
+    url = url.format(board_id=board["board_id"])
+    before = await client.get(url, headers=board["headers"])
+    assert "renamed" not in before.text
+
+    elsewhere(update(StatusModel).where(StatusModel.status_id == board["status_ids"][0]).values(name="renamed"))
+
+    after = await client.get(url, headers=board["headers"])
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+    assert "renamed" in after.text
+
+    # Кэш заполнен уже новой версией: повторный запрос с ее ETag - 304
+    cached = await client.get(url, headers={**board["headers"], "If-None-Match": after.headers["etag"]})
+    assert cached.status_code == 304
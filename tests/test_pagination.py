@@ -0,0 +1,53 @@
+"""Курсорная пагинация: поврежденный курсор - 400, а не 500."""
+import base64
+
+import pytest
+
+from conftest import create_board, create_user
+from pagination import NEXT_CURSOR_HEADER
+
+
+pytestmark = pytest.mark.anyio
+
+
+def b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "NQ",  # 5
+        b64(b'"2024-01-01"'),
+        b64(b"[]"),
+        b64(b'["2024-01-01", 1, 2]'),
+        b64(b'{"a": 1}'),
+        b64(b'[1, "2024-01-01"]'),
+        b64(b"not json"),
+        "!!!",
+    ],
+)
+async def test_invalid_cursor(client, cursor):
+    user_id, headers = create_user()
+    board = create_board(user_id)
+
+    response = await client.get(f"/boards/{board['board_id']}/tasks/", params={"cursor": cursor}, headers=headers)
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+async def test_cursor_walks_every_task(client):
+    user_id, headers = create_user()
+    board = create_board(user_id, tasks=7)
+
+    task_ids, params = [], {"limit": 3}
+    while True:
+        response = await client.get(f"/boards/{board['board_id']}/tasks/", params=params, headers=headers)
+        assert response.status_code == 200
+        task_ids += [task["task_id"] for task in response.json()]
+        if NEXT_CURSOR_HEADER not in response.headers:
+            break
+        params = {"limit": 3, "cursor": response.headers[NEXT_CURSOR_HEADER]}
+
+    assert task_ids == board["task_ids"]
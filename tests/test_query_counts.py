@@ -0,0 +1,71 @@
+"""
+Число запросов к БД на чтение: связи грузятся стратегиями из crud.py (joined/selectin), а не
+lazy load на каждую строку, поэтому число запросов не зависит от числа задач, комментариев и тегов.
+Число берется из заголовка Server-Timing, который выставляет sql_timing.SqlTimingMiddleware.
+"""
+import re
+
+import pytest
+
+from board_cache import board_cache
+from conftest import create_board, create_user
+
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+# Запросы прогретого запроса (токен уже в кэше), включая проверку прав; board_cache холодный
+EXPECTED_QUERIES = {
+    "/boards/": 7,
+    "/boards/{board_id}": 10,
+    "/boards/{board_id}/tasks/": 7,
+    "/boards/{board_id}/tasks/{task_id}": 6,
+    "/boards/{board_id}/tasks/{task_id}/comments/": 3,
+    "/boards/{board_id}/statuses/": 3,
+    "/boards/{board_id}/tags/": 2,
+    "/boards/{board_id}/tags/tasks?tag=tag0": 7,
+    "/boards/{board_id}/accesses/": 2,
+}
+
+SMALL = dict(tasks=1, comments=1, tags=1, statuses=1)
+LARGE = dict(tasks=25, comments=4, tags=3, statuses=3)
+
+pytestmark = pytest.mark.anyio
+
+
+async def count_queries(client, url: str, headers: dict) -> int:
+    board_cache.clear()
+    response = await client.get(url, headers=headers)
+    assert response.status_code == 200, response.text
+
+    return int(QUERIES.search(response.headers["server-timing"]).group(1))
+
+
+async def board_queries(client, shape: dict, url: str) -> int:
+    user_id, headers = create_user()
+    board = create_board(user_id, **shape)
+    # Первый запрос пользователя ищет его в БД по токену, дальше токен берется из кэша
+    await client.get("/users/me", headers=headers)
+
+    return await count_queries(client, url.format(board_id=board["board_id"], task_id=board["task_ids"][0]), headers)
+
+
+@pytest.mark.parametrize("url", EXPECTED_QUERIES)
+async def test_query_count(client, url):
+    assert await board_queries(client, SMALL, url) == EXPECTED_QUERIES[url]
+
+
+@pytest.mark.parametrize("url", EXPECTED_QUERIES)
+async def test_query_count_does_not_grow_with_rows(client, url):
+    assert await board_queries(client, LARGE, url) == await board_queries(client, SMALL, url)
+
+
+async def test_board_list_query_count_does_not_grow_with_boards(client):
+    counts = []
+    for boards in (1, 5):
+        user_id, headers = create_user()
+        for _ in range(boards):
+            create_board(user_id, **LARGE)
+        await client.get("/users/me", headers=headers)
+        counts.append(await count_queries(client, "/boards/", headers))
+
+    assert counts[0] == counts[1] == EXPECTED_QUERIES["/boards/"]
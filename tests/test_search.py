@@ -0,0 +1,27 @@
+"""Поиск по доске: snippet - HTML, в котором экранирован пользовательский текст и размечены только совпадения."""
+import pytest
+
+from conftest import create_board, create_user
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_snippet_escapes_user_text(client):
+    user_id, headers = create_user()
+    board = create_board(user_id)
+    payload = '<img src=x onerror="alert(1)"> needle & <mark>fake</mark>'
+    response = await client.post(
+        f"/boards/{board['board_id']}/tasks/",
+        json={"title": "task", "description": payload, "status_id": board["status_ids"][0]},
+        headers=headers,
+    )
+    assert response.status_code == 200
+
+    response = await client.get(f"/boards/{board['board_id']}/search", params={"q": "needle"}, headers=headers)
+
+    assert response.status_code == 200
+    [hit] = response.json()
+    assert hit["snippet"] == (
+        "&lt;img src=x onerror=&quot;alert(1)&quot;&gt; <mark>needle</mark> &amp; &lt;mark&gt;fake&lt;/mark&gt;"
+    )
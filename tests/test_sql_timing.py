@@ -0,0 +1,73 @@
+"""Бюджет запросов к БД на HTTP-запрос (sql_timing.query_budget) на горячих эндпоинтах задач."""
+import logging
+
+import pytest
+
+from conftest import create_board, create_user
+from sql_timing import QueryBudgetExceeded, query_budget
+
+
+# Прогретый запрос на холодном board_cache, как в test_query_counts
+READ_TASKS_QUERIES = 7
+CREATE_TASK_QUERIES = 5
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def board(client):
+    user_id, headers = create_user()
+    board = create_board(user_id, tasks=20, comments=3, tags=2)
+    await client.get("/users/me", headers=headers)
+
+    return {**board, "headers": headers}
+
+
+async def test_read_tasks_within_budget(client, board):
+    with query_budget(READ_TASKS_QUERIES):
+        response = await client.get(f"/boards/{board['board_id']}/tasks/", headers=board["headers"])
+
+    assert response.status_code == 200
+    assert len(response.json()) == 20
+
+
+async def test_create_task_within_budget(client, board):
+    with query_budget(CREATE_TASK_QUERIES):
+        response = await client.post(
+            f"/boards/{board['board_id']}/tasks/",
+            json={"title": "new", "status_id": board["status_ids"][0]},
+            headers=board["headers"],
+        )
+
+    assert response.status_code == 200
+
+
+async def test_strict_budget_fails_the_request(client, board):
+    with query_budget(READ_TASKS_QUERIES - 1):
+        with pytest.raises(QueryBudgetExceeded) as error:
+            await client.get(f"/boards/{board['board_id']}/tasks/", headers=board["headers"])
+
+    message = str(error.value)
+    assert message.startswith(f"GET /boards/{{board_id}}/tasks/ made {READ_TASKS_QUERIES} queries, budget {READ_TASKS_QUERIES - 1}")
+    # Каждый выполненный SQL перечислен в сообщении, значения параметров схлопнуты
+    assert len(message.splitlines()) == 1 + READ_TASKS_QUERIES
+
+
+async def test_soft_budget_only_logs(client, board, caplog):
+    # Конфигурация логирования alembic выключает уже созданные логгеры
+    logging.getLogger("sql_timing").disabled = False
+
+    with caplog.at_level(logging.WARNING, logger="sql_timing"):
+        with query_budget(1, strict=False):
+            response = await client.get(f"/boards/{board['board_id']}/tasks/", headers=board["headers"])
+
+    assert response.status_code == 200
+    assert "Query budget exceeded in GET /boards/{board_id}/tasks/" in caplog.text
+
+
+async def test_budget_applies_only_inside_the_block(client, board):
+    with query_budget(1):
+        pass
+
+    response = await client.get(f"/boards/{board['board_id']}/tasks/", headers=board["headers"])
+    assert response.status_code == 200